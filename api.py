@@ -0,0 +1,245 @@
+# api.py
+# API JSON da lista priorizada (rotas Flask servidas junto com o app Dash)
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from datetime import date
+
+from flask import Response, jsonify, request
+
+from armazenamento import carregar_dataset, dataset_existe
+from historico import CONDICOES, tendencia_analista, tendencia_condicao, historico_maquina, removidas_por_analista
+from parametros import DEFAULT_DIAS_COLETA
+
+# Listas avaliadas e respostas serializadas mantidas por processo
+MAX_LISTAS_EM_CACHE = 8
+MAX_RESPOSTAS_EM_CACHE = 64
+
+POR_PAGINA_PADRAO = 500
+POR_PAGINA_MAXIMO = 5000
+
+# Alarmes e limites aceitos em config["analistas"][analista]
+ALARMES_VALIDOS = {"A1", "A2"}
+LIMITES_ANALISTA = ["dias_alarmes", "dias_insights", "dias_notas"]
+
+_listas = OrderedDict()
+_respostas = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+class ErroRequisicao(Exception):
+    """Parâmetro inválido na requisição (vira resposta 400)."""
+
+
+def _cache_obter(cache: OrderedDict, chave):
+    with _cache_lock:
+        if chave in cache:
+            cache.move_to_end(chave)
+            return cache[chave]
+    return None
+
+
+def _cache_gravar(cache: OrderedDict, chave, valor, limite: int):
+    with _cache_lock:
+        cache[chave] = valor
+        while len(cache) > limite:
+            cache.popitem(last=False)
+
+
+def _inteiro(nome: str, padrao, minimo=None, maximo=None):
+    valor = request.args.get(nome)
+    if valor in (None, ""):
+        return padrao
+    try:
+        valor = int(valor)
+    except ValueError:
+        raise ErroRequisicao(f"'{nome}' deve ser um número inteiro")
+    if minimo is not None and valor < minimo:
+        raise ErroRequisicao(f"'{nome}' deve ser >= {minimo}")
+    if maximo is not None:
+        valor = min(valor, maximo)
+    return valor
+
+
+def _numero(nome: str, valor, minimo, inteiro: bool):
+    """Valida um número vindo do JSON de 'config' (bool não conta como número)."""
+    tipos = int if inteiro else (int, float)
+    if isinstance(valor, bool) or not isinstance(valor, tipos):
+        raise ErroRequisicao(f"'{nome}' deve ser um número{' inteiro' if inteiro else ''}")
+    if valor < minimo:
+        raise ErroRequisicao(f"'{nome}' deve ser >= {minimo}")
+    return valor
+
+
+def validar_config(config: dict) -> dict:
+    """
+    Confere a configuração já mesclada (JSON + parâmetros próprios) antes
+    de qualquer avaliação: os valores do JSON não passam por _inteiro.
+    """
+    _numero("dias_coleta", config["dias_coleta"], 0, inteiro=True)
+    if config["top_k"] is not None:
+        _numero("top_k", config["top_k"], 1, inteiro=True)
+
+    analistas = config["analistas"]
+    if not isinstance(analistas, dict):
+        raise ErroRequisicao("'analistas' deve ser um objeto {analista: limites}")
+    for analista, filtro in analistas.items():
+        if filtro is None:
+            continue
+        if not isinstance(filtro, dict):
+            raise ErroRequisicao(f"'analistas.{analista}' deve ser um objeto")
+        alarmes = filtro.get("alarmes")
+        if alarmes is not None and (
+            not isinstance(alarmes, list)
+            or not all(isinstance(a, str) and a.upper() in ALARMES_VALIDOS for a in alarmes)
+        ):
+            raise ErroRequisicao(f"'analistas.{analista}.alarmes' deve ser uma lista com A1 e/ou A2")
+        for limite in LIMITES_ANALISTA:
+            if filtro.get(limite) is not None:
+                _numero(f"analistas.{analista}.{limite}", filtro[limite], 0, inteiro=False)
+    return config
+
+
+def ler_config() -> dict:
+    """
+    Configuração no mesmo formato da CLI ({"dias_coleta", "top_k", "analistas"}),
+    recebida como JSON no parâmetro 'config'. 'dias_coleta' e 'top_k' também
+    podem vir como parâmetros próprios. A configuração mesclada é validada
+    (ErroRequisicao -> 400).
+    """
+    texto = request.args.get("config")
+    try:
+        config = json.loads(texto) if texto else {}
+    except ValueError:
+        raise ErroRequisicao("'config' não é um JSON válido")
+    if not isinstance(config, dict):
+        raise ErroRequisicao("'config' deve ser um objeto JSON")
+
+    config["dias_coleta"] = _inteiro("dias_coleta", config.get("dias_coleta"), minimo=0)
+    config["top_k"] = _inteiro("top_k", config.get("top_k"), minimo=1)
+    if config["dias_coleta"] is None:
+        config["dias_coleta"] = DEFAULT_DIAS_COLETA
+    if config.get("analistas") is None:
+        config["analistas"] = {}
+    return validar_config(config)
+
+
+def hash_config(config: dict) -> str:
+    canonico = json.dumps(config, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha1(canonico.encode("utf-8")).hexdigest()[:16]
+
+
+def gerar_etag(*partes) -> str:
+    return hashlib.sha1("|".join(str(p) for p in partes).encode("utf-8")).hexdigest()[:24]
+
+
+def obter_lista(dataset_id: str, config: dict, chave_config: str):
+    """
+    Lista final (mesmas colunas do Excel) para dataset + configuração. As
+    regras dependem da data de hoje, então a chave inclui o dia.
+    """
+    chave = (dataset_id, chave_config, date.today().isoformat())
+    df_final = _cache_obter(_listas, chave)
+    if df_final is None:
+        # pandas só é carregado na primeira avaliação (boot leve)
+        from pipeline import avaliar_regras
+
+        base, maquinas = carregar_dataset(dataset_id)
+        df_final, _df_final_exibir, _resumo, _detalhes = avaliar_regras(
+            base, maquinas, config["analistas"], config["dias_coleta"], config["top_k"]
+        )
+        _cache_gravar(_listas, chave, df_final, MAX_LISTAS_EM_CACHE)
+    return df_final
+
+
+def register_api(server):
+    """Registra as rotas da API JSON no servidor Flask do app."""
+
+    @server.route("/api/datasets/<dataset_id>/lista")
+    def api_lista(dataset_id):
+        # Antes do ETag: um dataset inexistente nunca responde 304
+        if not dataset_existe(dataset_id):
+            return jsonify({"erro": f"dataset '{dataset_id}' não encontrado"}), 404
+        try:
+            config = ler_config()
+            pagina = _inteiro("pagina", 1, minimo=1)
+            por_pagina = _inteiro("por_pagina", POR_PAGINA_PADRAO, minimo=1, maximo=POR_PAGINA_MAXIMO)
+        except ErroRequisicao as e:
+            return jsonify({"erro": str(e)}), 400
+        colunas = [c for c in request.args.get("colunas", "").split(",") if c.strip()]
+
+        # O id do dataset já é um hash do conteúdo; com a configuração, o dia
+        # e a página ele identifica a resposta. Se o cliente já tem essa
+        # versão, responde 304 sem avaliar nem serializar nada.
+        chave_config = hash_config(config)
+        etag = gerar_etag(dataset_id, chave_config, date.today().isoformat(), pagina, por_pagina, ",".join(colunas))
+        if request.if_none_match.contains(etag):
+            resposta = Response(status=304)
+            resposta.set_etag(etag)
+            return resposta
+
+        corpo = _cache_obter(_respostas, etag)
+        if corpo is None:
+            try:
+                df_final = obter_lista(dataset_id, config, chave_config)
+            except FileNotFoundError:
+                return jsonify({"erro": f"dataset '{dataset_id}' não encontrado"}), 404
+
+            desconhecidas = [c for c in colunas if c not in df_final.columns]
+            if desconhecidas:
+                return jsonify({"erro": f"colunas desconhecidas: {', '.join(desconhecidas)}"}), 400
+
+            total = len(df_final)
+            inicio = (pagina - 1) * por_pagina
+            pagina_df = df_final.iloc[inicio:inicio + por_pagina]
+            if colunas:
+                pagina_df = pagina_df[colunas]
+
+            meta = {
+                "dataset_id": dataset_id,
+                "config": config,
+                "total": total,
+                "pagina": pagina,
+                "por_pagina": por_pagina,
+                "paginas": -(-total // por_pagina),
+                "colunas": list(pagina_df.columns),
+            }
+            # to_json já converte NaN em null; o envelope é montado em volta
+            linhas = pagina_df.to_json(orient="records", force_ascii=False)
+            corpo = json.dumps(meta, ensure_ascii=False)[:-1] + ', "linhas": ' + linhas + "}"
+            corpo = corpo.encode("utf-8")
+            _cache_gravar(_respostas, etag, corpo, MAX_RESPOSTAS_EM_CACHE)
+
+        resposta = Response(corpo, mimetype="application/json")
+        resposta.set_etag(etag)
+        resposta.headers["Cache-Control"] = "no-cache"
+        return resposta
+
+    # ======================================================
+    # HISTÓRICO DE EXECUÇÕES
+    # ======================================================
+
+    @server.route("/api/historico/analistas/<analista>")
+    def api_historico_analista(analista):
+        desde, ate = request.args.get("desde"), request.args.get("ate")
+        return jsonify({
+            "analista": analista,
+            "execucoes": tendencia_analista(analista, desde, ate),
+            "removidas_coleta": removidas_por_analista(analista, desde),
+        })
+
+    @server.route("/api/historico/condicoes/<condicao>")
+    def api_historico_condicao(condicao):
+        condicao = condicao.upper()
+        if condicao not in CONDICOES.values():
+            return jsonify({"erro": f"condição deve ser uma de: {', '.join(CONDICOES.values())}"}), 400
+        return jsonify({
+            "condicao": condicao,
+            "execucoes": tendencia_condicao(condicao, request.args.get("analista"), request.args.get("desde")),
+        })
+
+    @server.route("/api/historico/maquinas/<maquina>")
+    def api_historico_maquina(maquina):
+        return jsonify({"maquina": maquina, "execucoes": historico_maquina(maquina, request.args.get("desde"))})
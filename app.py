@@ -2,20 +2,31 @@
 # App de Priorização de Monitoramento e Manutenção
 # Plotly Dash
 
+import logging
+
 from dash import Dash
 
 from layout import layout
 from callbacks import register_callbacks
+from api import register_api
+from uploads import register_uploads
+from perfil import register_perfis
 
 # ======================================================
 # APP
 # ======================================================
 
+# Mensagens dos módulos (logger = logging.getLogger(__name__)) vão para a saída do worker
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(process)d %(name)s %(levelname)s: %(message)s")
+
 app = Dash(__name__)
 app.title = "Priorização de Monitoramento"
 app.layout = layout
 
 register_callbacks(app)
+register_api(app.server)
+register_uploads(app.server)
+register_perfis(app.server)
 
 # ======================================================
 # RUN
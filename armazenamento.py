@@ -0,0 +1,328 @@
+# armazenamento.py
+# Armazenamento local das bases processadas, compartilhado entre workers
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import date, datetime
+
+# pandas e pyarrow são importados nas funções que gravam/leem tabelas: o
+# módulo é importado no boot (DIR_DADOS, estado recente) e não deve
+# carregá-los antes do primeiro processamento
+
+# Diretório local onde as bases processadas ficam gravadas (um por dataset)
+DIR_DADOS = os.environ.get(
+    "PRIORIZACAO_DIR_DADOS",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "dados"),
+)
+
+# Último dataset processado e configurações aplicadas por sessão do navegador
+# (restaurados após reinício); os estados mais antigos são apagados
+DIR_ESTADOS = os.path.join(DIR_DADOS, "estados")
+MAX_ESTADOS_EM_DISCO = 500
+
+# Resultados de avaliação mantidos em disco (os mais antigos são apagados)
+MAX_RESULTADOS_EM_DISCO = 64
+
+# Listas baixadas guardadas como referência da comparação (uma por dia)
+DIR_REFERENCIAS = os.path.join(DIR_DADOS, "referencias")
+MAX_REFERENCIAS = 30
+
+# Datasets abertos por processo (os mais recentes ficam mapeados)
+MAX_DATASETS_EM_CACHE = 4
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _dir_dataset(dataset_id: str) -> str:
+    return os.path.join(DIR_DADOS, "datasets", dataset_id)
+
+
+def dataset_existe(dataset_id: str) -> bool:
+    """True se o id tem o formato de gerar_dataset_id e o dataset está gravado."""
+    return bool(re.fullmatch(r"[0-9a-f]{16}", str(dataset_id))) and os.path.isdir(_dir_dataset(dataset_id))
+
+
+def _normalizar_colunas_mistas(df: "pd.DataFrame") -> "pd.DataFrame":
+    """
+    Colunas object com tipos misturados (ex.: SPOTNAME com números e textos
+    vindos do Excel) não viram coluna Arrow; converte esses valores para str,
+    preservando os vazios.
+    """
+    df = df.copy()
+    for coluna in df.columns:
+        if df[coluna].dtype != object:
+            continue
+        tipos = {type(v) for v in df[coluna].dropna()}
+        if len(tipos) > 1:
+            df[coluna] = df[coluna].where(df[coluna].isna(), df[coluna].astype(str))
+    return df
+
+
+def _gravar_arrow(df: "pd.DataFrame", caminho: str):
+    """Grava em Arrow IPC sem compressão, que pode ser mapeado em memória."""
+    import pyarrow as pa
+
+    tabela = pa.Table.from_pandas(_normalizar_colunas_mistas(df), preserve_index=False)
+    with pa.OSFile(caminho, "wb") as destino:
+        with pa.ipc.new_file(destino, tabela.schema) as escritor:
+            escritor.write_table(tabela)
+
+
+def _ler_arrow(caminho: str) -> "pd.DataFrame":
+    """
+    Mapeia o arquivo em memória e monta o DataFrame sobre os buffers do
+    mapeamento: colunas de texto (dtype str, apoiado em Arrow) e numéricas
+    sem nulos não são copiadas, e o cache de páginas do sistema é
+    compartilhado por todos os processos que leem o mesmo dataset.
+    """
+    import pyarrow as pa
+
+    fonte = pa.memory_map(caminho, "r")
+    return pa.ipc.open_file(fonte).read_all().to_pandas()
+
+
+def gerar_dataset_id(base: "pd.DataFrame") -> str:
+    """Identificador determinístico derivado do conteúdo da base processada."""
+    import pandas as pd
+
+    hashes = pd.util.hash_pandas_object(base, index=False).to_numpy()
+    conteudo = hashlib.sha1(hashes.tobytes())
+    conteudo.update("|".join(base.columns).encode("utf-8"))
+    return conteudo.hexdigest()[:16]
+
+
+def _publicar(destino: str, tabelas: dict, meta: dict):
+    """
+    Grava as tabelas em Arrow num diretório temporário e publica com rename,
+    para que nenhum worker leia um diretório pela metade.
+    """
+    pasta_pai = os.path.dirname(destino)
+    temporario = os.path.join(pasta_pai, f".tmp-{uuid.uuid4().hex}")
+    os.makedirs(temporario)
+    try:
+        for nome, tabela in tabelas.items():
+            _gravar_arrow(tabela, os.path.join(temporario, f"{nome}.arrow"))
+        with open(os.path.join(temporario, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({**meta, "criado_em": datetime.now().isoformat(timespec="seconds")}, f)
+        os.rename(temporario, destino)
+    except OSError:
+        # Outro worker publicou o mesmo conteúdo primeiro
+        shutil.rmtree(temporario, ignore_errors=True)
+        if not os.path.isdir(destino):
+            raise
+
+
+def salvar_dataset(base: "pd.DataFrame", maquinas: "pd.DataFrame", extras: dict = None) -> str:
+    """
+    Grava base e tabela de máquinas uma única vez, com chave pelo conteúdo.
+    'extras' ({nome: frame}) são tabelas auxiliares gravadas junto (ver
+    carregar_tabela_extra).
+    """
+    extras = extras or {}
+    dataset_id = gerar_dataset_id(base)
+    destino = _dir_dataset(dataset_id)
+    if os.path.isdir(destino):
+        return dataset_id
+
+    _publicar(destino, {"base": base, "maquinas": maquinas, **extras}, {
+        "dataset_id": dataset_id,
+        "linhas": len(base),
+        "maquinas": len(maquinas),
+        "extras": sorted(extras),
+    })
+    return dataset_id
+
+
+def carregar_dataset(dataset_id: str):
+    """
+    Retorna (base, maquinas) do dataset, mapeados em memória. Cada processo
+    mantém o resultado em cache; as chamadas não devem modificar os frames.
+    """
+    with _cache_lock:
+        if dataset_id in _cache:
+            _cache.move_to_end(dataset_id)
+            return _cache[dataset_id]
+
+    if not dataset_existe(dataset_id):
+        raise FileNotFoundError(f"Dataset {dataset_id} não encontrado em {DIR_DADOS}")
+    pasta = _dir_dataset(dataset_id)
+
+    dataset = (
+        _ler_arrow(os.path.join(pasta, "base.arrow")),
+        _ler_arrow(os.path.join(pasta, "maquinas.arrow")),
+    )
+    with _cache_lock:
+        _cache[dataset_id] = dataset
+        while len(_cache) > MAX_DATASETS_EM_CACHE:
+            _cache.popitem(last=False)
+    return dataset
+
+
+def carregar_tabela_extra(dataset_id: str, nome: str):
+    """Tabela auxiliar gravada com o dataset, ou None se ele não a tem."""
+    caminho = os.path.join(_dir_dataset(dataset_id), f"{nome}.arrow")
+    if not dataset_existe(dataset_id) or not os.path.isfile(caminho):
+        return None
+    return _ler_arrow(caminho)
+
+
+def _dir_resultado(chave: str) -> str:
+    return os.path.join(DIR_DADOS, "resultados", chave)
+
+
+def chave_resultado(dataset_id: str, filtros: dict, dias_coleta, top_k) -> str:
+    """
+    Identifica o resultado de uma avaliação: dataset, parâmetros e o dia
+    (as regras contam dias a partir de hoje).
+    """
+    conteudo = json.dumps(
+        [dataset_id, filtros or {}, dias_coleta, top_k, date.today().isoformat()],
+        sort_keys=True, ensure_ascii=False, default=str,
+    )
+    return hashlib.sha1(conteudo.encode("utf-8")).hexdigest()[:20]
+
+
+def _limpar_resultados_antigos():
+    pasta = os.path.join(DIR_DADOS, "resultados")
+    try:
+        resultados = sorted(
+            (os.path.join(pasta, nome) for nome in os.listdir(pasta) if not nome.startswith(".")),
+            key=os.path.getmtime,
+        )
+    except OSError:
+        return
+    for caminho in resultados[:-MAX_RESULTADOS_EM_DISCO]:
+        shutil.rmtree(caminho, ignore_errors=True)
+
+
+def salvar_resultado(chave: str, df_final: "pd.DataFrame", condicoes: "pd.DataFrame"):
+    """
+    Grava a lista final de uma avaliação e as condições de cada linha, para
+    que qualquer worker sirva tabelas, detalhes e downloads sem o navegador
+    precisar guardar a lista inteira.
+    """
+    destino = _dir_resultado(chave)
+    if os.path.isdir(destino):
+        return
+    _publicar(destino, {
+        "lista": df_final.reset_index(drop=True),
+        "condicoes": condicoes.reset_index(drop=True),
+    }, {"chave": chave, "linhas": len(df_final)})
+    _limpar_resultados_antigos()
+
+
+def carregar_resultado(chave: str):
+    """Retorna (lista, condicoes) gravados por salvar_resultado."""
+    pasta = _dir_resultado(chave)
+    if not re.fullmatch(r"[0-9a-f]{20}", str(chave)) or not os.path.isdir(pasta):
+        raise FileNotFoundError(f"Resultado {chave} não encontrado; aplique as regras novamente")
+    return (
+        _ler_arrow(os.path.join(pasta, "lista.arrow")),
+        _ler_arrow(os.path.join(pasta, "condicoes.arrow")),
+    )
+
+
+def salvar_lista_referencia(df_final: "pd.DataFrame", dia: date = None):
+    """
+    Grava a lista baixada como referência do dia (a última do dia vale),
+    usada por carregar_lista_referencia nos dias seguintes.
+    """
+    dia = dia or date.today()
+    os.makedirs(DIR_REFERENCIAS, exist_ok=True)
+    destino = os.path.join(DIR_REFERENCIAS, f"{dia.isoformat()}.arrow")
+    temporario = f"{destino}.{uuid.uuid4().hex}"
+    _gravar_arrow(df_final.reset_index(drop=True), temporario)
+    os.replace(temporario, destino)
+
+    referencias = sorted(n for n in os.listdir(DIR_REFERENCIAS) if re.fullmatch(r"\d{4}-\d{2}-\d{2}\.arrow", n))
+    for nome in referencias[:-MAX_REFERENCIAS]:
+        os.remove(os.path.join(DIR_REFERENCIAS, nome))
+
+
+def carregar_lista_referencia(antes_de: date = None):
+    """(dia, lista) da referência mais recente anterior a 'antes_de' (hoje), ou None."""
+    antes_de = antes_de or date.today()
+    try:
+        nomes = os.listdir(DIR_REFERENCIAS)
+    except OSError:
+        return None
+    dias = sorted(
+        date.fromisoformat(nome[:-len(".arrow")]) for nome in nomes
+        if re.fullmatch(r"\d{4}-\d{2}-\d{2}\.arrow", nome)
+    )
+    anteriores = [dia for dia in dias if dia < antes_de]
+    if not anteriores:
+        return None
+    dia = anteriores[-1]
+    return dia, _ler_arrow(os.path.join(DIR_REFERENCIAS, f"{dia.isoformat()}.arrow"))
+
+
+def _arquivo_estado(sessao: str):
+    """Arquivo do estado da sessão, ou None se o id não é um id de sessão."""
+    if not re.fullmatch(r"[A-Za-z0-9_-]{1,64}", str(sessao)):
+        return None
+    return os.path.join(DIR_ESTADOS, f"{sessao}.json")
+
+
+def _limpar_estados_antigos():
+    try:
+        estados = sorted(
+            (os.path.join(DIR_ESTADOS, nome) for nome in os.listdir(DIR_ESTADOS) if nome.endswith(".json")),
+            key=os.path.getmtime,
+        )
+    except OSError:
+        return
+    for caminho in estados[:-MAX_ESTADOS_EM_DISCO]:
+        try:
+            os.remove(caminho)
+        except OSError:
+            pass
+
+
+def salvar_estado_recente(sessao: str, dataset_id: str, linhas: int, filtros: dict = None,
+                          dias_coleta=None, top_k=None):
+    """
+    Registra o dataset mais recente da sessão do navegador e as
+    configurações aplicadas a ele. A base em si já está gravada em Arrow;
+    aqui fica só o ponteiro e os parâmetros (JSON pequeno, gravado com
+    replace atômico). Sem sessão válida, nada é gravado.
+    """
+    destino = _arquivo_estado(sessao)
+    if destino is None:
+        return
+    estado = {
+        "dataset_id": dataset_id,
+        "linhas": linhas,
+        "filtros": filtros,
+        "dias_coleta": dias_coleta,
+        "top_k": top_k,
+        "atualizado_em": datetime.now().isoformat(timespec="seconds"),
+    }
+    os.makedirs(DIR_ESTADOS, exist_ok=True)
+    temporario = f"{destino}.{uuid.uuid4().hex}"
+    with open(temporario, "w", encoding="utf-8") as f:
+        json.dump(estado, f, ensure_ascii=False)
+    os.replace(temporario, destino)
+    _limpar_estados_antigos()
+
+
+def carregar_estado_recente(sessao: str):
+    """Estado da sessão salvo por salvar_estado_recente, ou None se não há dataset válido."""
+    origem = _arquivo_estado(sessao)
+    if origem is None:
+        return None
+    try:
+        with open(origem, encoding="utf-8") as f:
+            estado = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not dataset_existe(estado.get("dataset_id")):
+        return None
+    return estado
@@ -0,0 +1,164 @@
+// avaliacao.js
+// Avaliação das regras (cond1–cond4, filtro de coleta e contagem por analista)
+// no navegador, sobre o snapshot binário montado por indicadores.montar_snapshot.
+// Segue a mesma lógica de indicadores.pontos_na_lista.
+
+(function () {
+    var FLAG_A1 = 1, FLAG_A2 = 2, FLAG_INSIGHTS = 4, FLAG_NOTA = 8, FLAG_CONF = 16;
+
+    // Snapshot decodificado uma única vez por store recebido
+    var ultimoSnapshot = null;
+    var decodificado = null;
+
+    function bytes(b64) {
+        var texto = atob(b64);
+        var saida = new Uint8Array(texto.length);
+        for (var i = 0; i < texto.length; i++) {
+            saida[i] = texto.charCodeAt(i);
+        }
+        return saida;
+    }
+
+    function decodificar(snapshot) {
+        if (snapshot !== ultimoSnapshot) {
+            decodificado = {
+                analista: new Int32Array(bytes(snapshot.analista).buffer),
+                maquina: new Int32Array(bytes(snapshot.maquina).buffer),
+                flags: bytes(snapshot.flags),
+                diasAnalise: new Float32Array(bytes(snapshot.dias_analise).buffer),
+                diasNota: new Float32Array(bytes(snapshot.dias_nota).buffer),
+                diasColeta: new Float32Array(bytes(snapshot.dias_coleta).buffer),
+            };
+            ultimoSnapshot = snapshot;
+        }
+        return decodificado;
+    }
+
+    function valor(v, padrao) {
+        return (v === null || v === undefined || v === "") ? padrao : Number(v);
+    }
+
+    // Limites por código de analista (mesmos defaults de config_por_analista_de_filtros)
+    function limitesPorAnalista(snapshot, filtros) {
+        var n = snapshot.analistas.length;
+        var p = snapshot.padroes;
+        var limites = {
+            usaA1: new Uint8Array(n), usaA2: new Uint8Array(n),
+            alarmes: new Float64Array(n), insights: new Float64Array(n), notas: new Float64Array(n),
+        };
+        snapshot.analistas.forEach(function (analista, i) {
+            var f = (filtros || {})[analista] || {alarmes: ["A1", "A2"]};
+            var alarmes = (f.alarmes || []).map(function (a) { return String(a).toUpperCase(); });
+            limites.usaA1[i] = alarmes.indexOf("A1") !== -1 ? 1 : 0;
+            limites.usaA2[i] = alarmes.indexOf("A2") !== -1 ? 1 : 0;
+            limites.alarmes[i] = valor(f.dias_alarmes, p.dias_alarmes);
+            limites.insights[i] = valor(f.dias_insights, p.dias_insights);
+            limites.notas[i] = valor(f.dias_notas, p.dias_notas);
+        });
+        return limites;
+    }
+
+    // Pontos na lista final por analista ({analista: quantidade})
+    function contarPontos(snapshot, filtros, diasColeta) {
+        var d = decodificar(snapshot);
+        var lim = limitesPorAnalista(snapshot, filtros);
+        var corteColeta = valor(diasColeta, snapshot.padroes.dias_coleta);
+        var n = snapshot.n;
+        var maquinaQualificada = new Uint8Array(snapshot.n_maquinas);
+        var maquinaColetaOk = new Uint8Array(snapshot.n_maquinas);
+
+        for (var i = 0; i < n; i++) {
+            var coleta = d.diasColeta[i];
+            // NaN falha nas duas comparações, como no numpy
+            if (coleta <= corteColeta) {
+                maquinaColetaOk[d.maquina[i]] = 1;
+            }
+            var a = d.analista[i];
+            if (a < 0) {
+                continue;
+            }
+            var flags = d.flags[i];
+            var analise = d.diasAnalise[i];
+            var semAnalise = analise !== analise;
+            var alarme = ((flags & FLAG_A1) && lim.usaA1[a]) || ((flags & FLAG_A2) && lim.usaA2[a]);
+            if ((alarme && (semAnalise || analise > lim.alarmes[a]))
+                    || ((flags & FLAG_INSIGHTS) && (semAnalise || analise > lim.insights[a]))
+                    || ((flags & FLAG_NOTA) && d.diasNota[i] > lim.notas[a])
+                    || (flags & FLAG_CONF)) {
+                maquinaQualificada[d.maquina[i]] = 1;
+            }
+        }
+
+        var contagem = new Int32Array(snapshot.analistas.length);
+        for (var j = 0; j < n; j++) {
+            var m = d.maquina[j];
+            if (d.analista[j] >= 0 && maquinaQualificada[m] && maquinaColetaOk[m]) {
+                contagem[d.analista[j]]++;
+            }
+        }
+
+        var resultado = {};
+        snapshot.analistas.forEach(function (analista, k) {
+            resultado[analista] = contagem[k];
+        });
+        return resultado;
+    }
+
+    // JSON com as chaves ordenadas, para comparar parâmetros vindos do servidor
+    function canonico(valor) {
+        if (valor === undefined) {
+            return "null";
+        }
+        if (valor === null || typeof valor !== "object") {
+            return JSON.stringify(valor);
+        }
+        if (Array.isArray(valor)) {
+            return "[" + valor.map(canonico).join(",") + "]";
+        }
+        return "{" + Object.keys(valor).sort().map(function (k) {
+            return JSON.stringify(k) + ":" + canonico(valor[k]);
+        }).join(",") + "}";
+    }
+
+    var avaliacao = {
+        contar_pontos: contarPontos,
+
+        // [estilo do aviso, download desligado, zip desligado]: com as contagens
+        // no navegador, a lista (df-final) só muda pelo botão de atualizar
+        sincronia: function (dfFinal, filtros, diasColeta, topK, modo) {
+            var noNavegador = (modo || []).indexOf("navegador") !== -1 && !topK;
+            var p = (dfFinal && dfFinal.parametros) || null;
+            var atrasada = noNavegador && p !== null && (
+                canonico(p.filtros) !== canonico(filtros)
+                || canonico(p.dias_coleta) !== canonico(diasColeta)
+                || canonico(p.top_k) !== canonico(topK)
+            );
+            var estilo = atrasada
+                ? {display: "block", color: "#b26a00", fontWeight: "bold", marginBottom: "10px"}
+                : {display: "none"};
+            return [estilo, atrasada, atrasada];
+        },
+
+        // Linhas da tabela-analista no formato do resumo de aplicar_regras
+        tabela_analista: function (filtros, diasColeta, topK, modo, snapshot) {
+            var noUpdate = window.dash_clientside.no_update;
+            // Top-K depende da prioridade calculada no servidor
+            if (!snapshot || (modo || []).indexOf("navegador") === -1 || topK) {
+                return [noUpdate, noUpdate];
+            }
+            var contagem = contarPontos(snapshot, filtros, diasColeta);
+            var linhas = Object.keys(contagem)
+                .filter(function (analista) { return contagem[analista] > 0; })
+                .sort(function (x, y) { return x < y ? -1 : (x > y ? 1 : 0); })
+                .map(function (analista) {
+                    return {"ANALISTA RESPONSÁVEL": analista, "QUANTIDADE DE PONTOS": contagem[analista]};
+                });
+            var colunas = ["ANALISTA RESPONSÁVEL", "QUANTIDADE DE PONTOS"].map(function (c) {
+                return {name: c, id: c};
+            });
+            return [linhas, colunas];
+        },
+    };
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {avaliacao: avaliacao});
+})();
@@ -0,0 +1,131 @@
+// uploads.js
+// Envio dos arquivos em partes (gzip quando o navegador suporta) para /api/uploads.
+// Cada área .upload-arquivo tem data-destino = id do dcc.Store que recebe a
+// referência do arquivo ({upload_id, nome, tamanho}) quando o envio termina.
+
+(function () {
+    var TAMANHO_PARTE = 4 * 1024 * 1024;
+    var TENTATIVAS = 3;
+    var EXTENSOES = ".csv,.xlsx,.xls";
+
+    function novoId() {
+        var bytes = new Uint8Array(16);
+        window.crypto.getRandomValues(bytes);
+        return Array.prototype.map.call(bytes, function (b) {
+            return ("0" + b.toString(16)).slice(-2);
+        }).join("");
+    }
+
+    async function comprimir(parte) {
+        if (!window.CompressionStream) {
+            return null;
+        }
+        var fluxo = parte.stream().pipeThrough(new CompressionStream("gzip"));
+        return await new Response(fluxo).blob();
+    }
+
+    async function enviarParte(uploadId, parte, offset) {
+        var corpo = parte;
+        var cabecalhos = {"Content-Type": "application/octet-stream"};
+        var comprimida = await comprimir(parte);
+        if (comprimida && comprimida.size < parte.size) {
+            corpo = comprimida;
+            cabecalhos["Content-Encoding"] = "gzip";
+        }
+
+        for (var tentativa = 1; ; tentativa++) {
+            try {
+                var resposta = await fetch(
+                    "/api/uploads/" + uploadId + "/partes?offset=" + offset,
+                    {method: "PUT", headers: cabecalhos, body: corpo}
+                );
+                if (resposta.ok) {
+                    return;
+                }
+                var erro = await resposta.json().catch(function () { return {}; });
+                throw new Error(erro.erro || ("HTTP " + resposta.status));
+            } catch (e) {
+                if (tentativa >= TENTATIVAS) {
+                    throw e;
+                }
+            }
+        }
+    }
+
+    function mostrarProgresso(area, texto, percentual) {
+        area.querySelector(".upload-arquivo-texto").textContent = texto;
+        var barra = area.querySelector(".upload-arquivo-progresso");
+        barra.style.display = percentual === null ? "none" : "block";
+        if (percentual !== null) {
+            barra.value = percentual;
+        }
+    }
+
+    async function enviarArquivo(area, arquivo) {
+        var uploadId = novoId();
+        var destino = area.getAttribute("data-destino");
+        try {
+            var offset = 0;
+            do {
+                var parte = arquivo.slice(offset, offset + TAMANHO_PARTE);
+                await enviarParte(uploadId, parte, offset);
+                offset += parte.size;
+                mostrarProgresso(area, "Enviando " + arquivo.name + "...",
+                                 arquivo.size ? Math.round(100 * offset / arquivo.size) : 100);
+            } while (offset < arquivo.size);
+
+            var resposta = await fetch("/api/uploads/" + uploadId + "/concluir", {
+                method: "POST",
+                headers: {"Content-Type": "application/json"},
+                body: JSON.stringify({nome: arquivo.name, tamanho: arquivo.size}),
+            });
+            var recebido = await resposta.json();
+            if (!resposta.ok) {
+                throw new Error(recebido.erro || ("HTTP " + resposta.status));
+            }
+            mostrarProgresso(area, "Clique ou arraste para trocar o arquivo", null);
+            window.dash_clientside.set_props(destino, {data: recebido});
+        } catch (e) {
+            mostrarProgresso(area, "Falha ao enviar " + arquivo.name + ": " + e.message, null);
+        }
+    }
+
+    function areaDoEvento(evento) {
+        return evento.target.closest ? evento.target.closest(".upload-arquivo") : null;
+    }
+
+    // Os componentes são montados pelo Dash depois do carregamento, então os
+    // eventos são tratados por delegação no documento.
+    document.addEventListener("click", function (evento) {
+        var area = areaDoEvento(evento);
+        if (!area) {
+            return;
+        }
+        var entrada = document.createElement("input");
+        entrada.type = "file";
+        entrada.accept = EXTENSOES;
+        entrada.addEventListener("change", function () {
+            if (entrada.files.length) {
+                enviarArquivo(area, entrada.files[0]);
+            }
+        });
+        entrada.click();
+    });
+
+    document.addEventListener("dragover", function (evento) {
+        if (areaDoEvento(evento)) {
+            evento.preventDefault();
+        }
+    });
+
+    document.addEventListener("drop", function (evento) {
+        var area = areaDoEvento(evento);
+        if (!area) {
+            return;
+        }
+        evento.preventDefault();
+        if (evento.dataTransfer.files.length) {
+            enviarArquivo(area, evento.dataTransfer.files[0]);
+        }
+    });
+})();
@@ -0,0 +1,204 @@
+# blocos.py
+# Leitura em blocos de .csv grandes (mosaic e notas) com agregação incremental por chave
+#
+# O groupby do mosaic de algumas plantas (milhões de análises) não cabe na
+# memória do container. Nesses arquivos a tabela nunca é carregada inteira:
+# cada bloco é reduzido aos pares únicos (chave, valor) com a linha da
+# primeira ocorrência, e esses pares são dobrados no acumulado. No fim, o
+# acumulado vira o mesmo texto de concat_values (valores únicos na ordem em
+# que aparecem, separados por ' | '), então a base sai igual à do caminho em
+# memória. A memória fica limitada pelos pares únicos, não pelas linhas.
+#
+# Só .csv: um .xlsx tem no máximo ~1 milhão de linhas e continua lido inteiro.
+
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from execucao import chave_texto, como_texto, concatenar_por_chave, obter_backend
+from helpers import ler_tabela
+from parametros import LIMITE_MB_EM_MEMORIA, LINHAS_POR_BLOCO
+
+logger = logging.getLogger(__name__)
+
+# Pares pendentes acumulados antes de compactar o estado de uma coluna
+FATOR_COMPACTACAO = 4
+
+
+class TabelaEmBlocos:
+    """
+    Um .csv lido em blocos de 'linhas_por_bloco' linhas. Os tipos das colunas
+    são decididos sobre o arquivo inteiro (uma passada só com as colunas
+    pedidas), para que cada bloco tenha o mesmo tipo que a coluna teria com o
+    arquivo carregado inteiro (ex.: uma coluna de inteiros com uma célula
+    vazia vira float em todos os blocos, não só no bloco da célula vazia).
+
+    'filename' é o nome original do arquivo: uploads ficam gravados sem
+    extensão (dados/uploads/<id>/arquivo), então o formato vem dele.
+    """
+
+    def __init__(self, caminho: str, linhas_por_bloco: int = LINHAS_POR_BLOCO, filename: str = None):
+        self.caminho = caminho
+        self.filename = filename or caminho
+        self.linhas_por_bloco = linhas_por_bloco
+        self._tipos = {}
+
+    def __repr__(self):
+        return f"TabelaEmBlocos({self.caminho!r}, linhas_por_bloco={self.linhas_por_bloco})"
+
+    @property
+    def columns(self) -> list:
+        return list(pd.read_csv(self.caminho, encoding="utf-8", nrows=0).columns)
+
+    def _ler(self, colunas: list, dtype=None):
+        return pd.read_csv(
+            self.caminho, encoding="utf-8", usecols=colunas, dtype=dtype,
+            chunksize=self.linhas_por_bloco,
+        )
+
+    def tipos(self, colunas: list) -> dict:
+        """Tipo de cada coluna como o read_csv do arquivo inteiro daria."""
+        faltando = [c for c in colunas if c not in self._tipos]
+        if faltando:
+            vistos = {c: set() for c in faltando}
+            for bloco in self._ler(faltando):
+                for coluna in faltando:
+                    vistos[coluna].add(bloco[coluna].dtype)
+            for coluna, tipos in vistos.items():
+                self._tipos[coluna] = _unificar_tipos(tipos)
+        return {c: self._tipos[c] for c in colunas}
+
+    def blocos(self, colunas: list):
+        """Itera os blocos (DataFrames) só com as colunas pedidas."""
+        yield from self._ler(colunas, self.tipos(colunas))
+
+    def carregar(self, colunas: list = None) -> pd.DataFrame:
+        """O arquivo inteiro em memória (mesmo resultado de ler_tabela)."""
+        tabela = ler_tabela(self.caminho, self.filename)
+        return tabela if colunas is None else tabela[colunas]
+
+
+def _unificar_tipos(tipos: set):
+    """
+    Combina os tipos vistos nos blocos como o parser combina as partes de um
+    arquivo: inteiros com floats (células vazias) viram float; qualquer texto
+    faz a coluna toda ser lida como texto.
+    """
+    tipos = {np.dtype(t) if not isinstance(t, pd.api.extensions.ExtensionDtype) else t for t in tipos}
+    if len(tipos) == 1:
+        (tipo,) = tipos
+        if pd.api.types.is_numeric_dtype(tipo):
+            return tipo
+    if tipos and all(pd.api.types.is_integer_dtype(t) or pd.api.types.is_float_dtype(t) for t in tipos):
+        return np.float64
+    return str
+
+
+def abrir_tabela(caminho: str, filename: str):
+    """
+    Como ler_tabela, mas um .csv maior que LIMITE_MB_EM_MEMORIA volta como
+    TabelaEmBlocos (lido em blocos durante o processamento).
+    """
+    if filename.endswith(".csv") and os.path.getsize(caminho) > LIMITE_MB_EM_MEMORIA * 1024 * 1024:
+        logger.info("abrir_tabela: %s (%.0f MB) será lido em blocos", filename, os.path.getsize(caminho) / 1024 / 1024)
+        return TabelaEmBlocos(caminho, filename=filename)
+    return ler_tabela(caminho, filename)
+
+
+# ======================================================
+# AGREGAÇÃO INCREMENTAL
+# ======================================================
+
+class _ParesUnicos:
+    """
+    Acumulado de uma coluna: pares (chave, valor) únicos com a linha global
+    da primeira ocorrência. Valores nulos também entram (como um par com
+    valor nulo) para que chaves só com nulos recebam "" no fim.
+    """
+
+    def __init__(self, limite_pendentes: int):
+        self.limite_pendentes = limite_pendentes
+        self.estado = None
+        self.pendentes = []
+        self.linhas_pendentes = 0
+
+    @staticmethod
+    def _reduzir(tabela: pa.Table) -> pa.Table:
+        return (
+            tabela.group_by(["chave", "valor"], use_threads=False)
+            .aggregate([("linha", "min")])
+            .rename_columns(["chave", "valor", "linha"])
+        )
+
+    def dobrar(self, chaves: pa.Array, valores: pa.Array, primeira_linha: int):
+        tabela = pa.table({
+            "chave": chaves,
+            "valor": valores,
+            "linha": np.arange(primeira_linha, primeira_linha + len(chaves), dtype=np.int64),
+        })
+        pares = self._reduzir(tabela.filter(pc.is_valid(tabela["chave"])))
+        self.pendentes.append(pares)
+        self.linhas_pendentes += len(pares)
+        if self.linhas_pendentes > self.limite_pendentes:
+            self._compactar()
+
+    def _compactar(self):
+        partes = ([self.estado] if self.estado is not None else []) + self.pendentes
+        if partes:
+            self.estado = self._reduzir(pa.concat_tables(partes))
+        self.pendentes = []
+        self.linhas_pendentes = 0
+
+    def concatenar(self):
+        """(chaves, textos) como concatenar_por_chave sobre a tabela inteira."""
+        self._compactar()
+        if self.estado is None:
+            vazio = pa.array([], type=pa.string())
+            return vazio, vazio
+        # Ordenar pela primeira ocorrência reproduz a ordem de concat_values
+        ordenado = self.estado.sort_by("linha")
+        return concatenar_por_chave(ordenado["chave"].combine_chunks(), ordenado["valor"].combine_chunks())
+
+
+def mapear_concatenado_em_blocos(chaves: pd.Series, fonte: TabelaEmBlocos, chave: str,
+                                 colunas: dict, preparar=None, lidas: list = None,
+                                 backend: str = None) -> pd.DataFrame:
+    """
+    Mesmo resultado de execucao.mapear_concatenado sobre a tabela inteira,
+    lendo a fonte em blocos. 'colunas' é {coluna: coluna de saída} e pode
+    citar colunas criadas por preparar(bloco) (ex.: data formatada); nesse
+    caso 'lidas' lista as colunas do arquivo que preparar usa.
+
+    Chaves não textuais (o map do pandas casa 1 com 1.0) ficam com o
+    caminho em memória, usando o backend informado.
+    """
+    lidas = [chave] + [c for c in (lidas or colunas) if c != chave]
+    if not (chave_texto(chaves) and fonte.tipos([chave])[chave] is str):
+        logger.info("mapear_concatenado_em_blocos: chave '%s' não textual, lendo %s inteiro", chave, fonte.caminho)
+        tabela = fonte.carregar(lidas)
+        if preparar is not None:
+            tabela = preparar(tabela)
+        return obter_backend(backend).mapear_concatenado(chaves, tabela, chave, colunas)
+
+    acumulados = {coluna: _ParesUnicos(FATOR_COMPACTACAO * fonte.linhas_por_bloco) for coluna in colunas}
+    linha = 0
+    for bloco in fonte.blocos(lidas):
+        if preparar is not None:
+            bloco = preparar(bloco)
+        chaves_bloco = como_texto(bloco[chave])
+        for coluna, acumulado in acumulados.items():
+            acumulado.dobrar(chaves_bloco, como_texto(bloco[coluna]), linha)
+        linha += len(bloco)
+    logger.info("mapear_concatenado_em_blocos: %d linhas de %s agregadas por '%s'", linha, fonte.caminho, chave)
+
+    chaves_base = como_texto(chaves)
+    resultado = {}
+    for coluna, saida in colunas.items():
+        grupos, textos = acumulados[coluna].concatenar()
+        posicao = pc.index_in(chaves_base, value_set=grupos)
+        resultado[saida] = pc.take(textos, posicao).to_pandas().set_axis(chaves.index)
+    return pd.DataFrame(resultado, index=chaves.index)
@@ -1,11 +1,49 @@
 # callbacks.py
 # Callbacks da aplicação
+#
+# Módulos que carregam pandas/numpy/pyarrow (pipeline, helpers, indicadores,
+# exportacao) são importados dentro dos callbacks que os usam: o boot do
+# worker e a primeira página não pagam por eles (ver orcamento_importacao.py).
 
-import pandas as pd
-from dash import dcc, html, Input, Output, State, ALL
+import logging
+
+from dash import dcc, html, Input, Output, State, ALL, ClientsideFunction, no_update
 from dash.exceptions import PreventUpdate
 
-from helpers import parse_contents, concat_values, days_diff, days_since_last_sync, resolver_status_ordem, clean_insights, gerar_badge_input
+from armazenamento import salvar_dataset, carregar_dataset, carregar_tabela_extra, salvar_estado_recente, carregar_estado_recente, chave_resultado, salvar_resultado, carregar_resultado, salvar_lista_referencia, carregar_lista_referencia
+from tarefas import registrar_geracao, avaliacao_obsoleta, vez_da_sessao
+from historico import registrar_execucao
+from uploads import ler_upload, abrir_upload
+from perfil import perfilavel
+from layout import linha_filtro_analista
+from parametros import DEFAULT_DIAS_COLETA
+
+logger = logging.getLogger(__name__)
+
+
+def valores_grade(texto) -> list:
+    """Converte '7, 15, 30' em [7.0, 15.0, 30.0]. Texto vazio vira lista vazia."""
+    if not texto or not str(texto).strip():
+        return []
+    return [float(v) for v in str(texto).replace(";", ",").split(",") if v.strip()]
+
+
+# Linhas da comparação enviadas à tela (o Excel traz todas)
+MAX_LINHAS_MUDANCAS = 5000
+
+
+def lista_anterior(arquivo):
+    """
+    Lista para a comparação: o arquivo enviado ou, sem ele, a última lista
+    baixada antes de hoje. Retorna (descrição, lista) ou (None, None).
+    """
+    if arquivo:
+        return arquivo["nome"], ler_upload(arquivo)
+    referencia = carregar_lista_referencia()
+    if referencia is None:
+        return None, None
+    dia, lista = referencia
+    return f"lista baixada em {dia:%d/%m/%Y}", lista
 
 
 def register_callbacks(app):
@@ -58,17 +96,20 @@ def register_callbacks(app):
         Output("status-upload-ordem-notas", "children"),
         Output("status-upload-ordem-planos", "children"),
         Output("status-upload-insights", "children"),
-        Input("upload-base", "filename"),
-        Input("upload-mosaic", "filename"),
-        Input("upload-notas", "filename"),
-        Input("upload-ordem-notas", "filename"),
-        Input("upload-ordem-planos", "filename"),
-        Input("upload-insights", "filename"),
+        Input("upload-base", "data"),
+        Input("upload-mosaic", "data"),
+        Input("upload-notas", "data"),
+        Input("upload-ordem-notas", "data"),
+        Input("upload-ordem-planos", "data"),
+        Input("upload-insights", "data"),
     )
     def mostrar_status(f1, f2, f3, f4, f5, f6):
         def status(f):
             if f:
-                return html.Div(f"✔ {f}", style={"color": "green", "fontWeight": "bold"})
+                return html.Div(
+                    f"✔ {f['nome']} ({f['tamanho'] / 1024 / 1024:.1f} MB)",
+                    style={"color": "green", "fontWeight": "bold"},
+                )
             return html.Div("❌ Não enviado", style={"color": "red"})
 
         return status(f1), status(f2), status(f3), status(f4), status(f5), status(f6)
@@ -82,140 +123,41 @@ def register_callbacks(app):
         Output("loading-output", "children"),
         Output("filtros-analistas-container", "children", allow_duplicate=True),
         Output("filtros-por-analista", "data", allow_duplicate=True),
+        Output("diagnostico-cruzamentos", "data"),
         Input("btn-processar-uploads", "n_clicks"),
-        State("upload-base", "contents"),
-        State("upload-mosaic", "contents"),
-        State("upload-notas", "contents"),
-        State("upload-ordem-notas", "contents"),
-        State("upload-ordem-planos", "contents"),
-        State("upload-insights", "contents"),
-        State("upload-base", "filename"),
-        State("upload-mosaic", "filename"),
-        State("upload-notas", "filename"),
-        State("upload-ordem-notas", "filename"),
-        State("upload-ordem-planos", "filename"),
-        State("upload-insights", "filename"),
+        State("upload-base", "data"),
+        State("upload-mosaic", "data"),
+        State("upload-notas", "data"),
+        State("upload-ordem-notas", "data"),
+        State("upload-ordem-planos", "data"),
+        State("upload-insights", "data"),
+        State("sessao-id", "data"),
         prevent_initial_call=True,
     )
+    @perfilavel("processar_base")
     def processar_base(
         n_clicks,
-        c_base, c_mosaic, c_notas, c_ordem_notas, c_ordem_planos, c_insights,
-        f_base, f_mosaic, f_notas, f_ordem_notas, f_ordem_planos, f_insights,
+        u_base, u_mosaic, u_notas, u_ordem_notas, u_ordem_planos, u_insights,
+        sessao,
     ):
-        if not n_clicks or not all([c_base, c_mosaic, c_notas, c_ordem_notas, c_ordem_planos, c_insights]):
+        # Os arquivos já estão no servidor (ver uploads.py); chegam só as referências
+        if not n_clicks or not all([u_base, u_mosaic, u_notas, u_ordem_notas, u_ordem_planos, u_insights]):
             raise PreventUpdate
 
-        base = parse_contents(c_base, f_base)
-        mosaic = parse_contents(c_mosaic, f_mosaic)
-        notas = parse_contents(c_notas, f_notas)
-        ordem_notas = parse_contents(c_ordem_notas, f_ordem_notas)
-        ordem_planos = parse_contents(c_ordem_planos, f_ordem_planos)
-        insights = parse_contents(c_insights, f_insights)
+        import pandas as pd
+        from helpers import montar_tabela_maquinas
+        from pipeline import ingerir_arquivos, COLUNAS_MOSAIC
 
-        # --- normalização ---
-        notas["ORDEM_NORM"] = (
-            notas["Ordem"].astype(str).str.replace(r"\.0$", "", regex=True)
-        )
-        ordem_notas["Ordem"] = ordem_notas["Ordem"].astype(str)
-
-        mosaic["DATA_ANALISE_FMT"] = pd.to_datetime(
-            mosaic["analysisCreatedAt"], errors="coerce", format="ISO8601"
-        ).dt.strftime("%d/%m/%Y")
-
-        # Limpa insights removendo lixo 'See more (N)'
-        insights_clean = clean_insights(insights)
-
-        # --- mapeamentos (otimizado com cache de groupby) ---
-        status_grouped = mosaic.groupby("spotId")["status"].apply(concat_values)
-        data_analise_grouped = mosaic.groupby("spotId")["DATA_ANALISE_FMT"].apply(concat_values)
-        analysis_status_grouped = mosaic.groupby("spotId")["analysisStatus"].apply(concat_values)
-        spot_last_sync_grouped = mosaic.groupby("spotId")["spotLastSync"].apply(concat_values)
-        
-        base["STATUS DO PONTO DE MONITORAMENTO"] = base["SPOT ID"].map(status_grouped)
-        base["DATA DA ÚLTIMA ANÁLISE"] = base["SPOT ID"].map(data_analise_grouped)
-
-        # Mapear analysisStatus e processar para labels legíveis
-        def processar_analysis_status(status_str):
-            if pd.isna(status_str) or str(status_str).strip() in ["", "-"]:
-                return "NUNCA ANALISADO"
-            status_lower = str(status_str).lower().strip()
-            if status_lower == "a1":
-                return "ALERTA"
-            elif status_lower == "a2":
-                return "INTERVENÇÃO"
-            elif status_lower == "no-alert":
-                return "NORMAL"
-            else:
-                return status_str
-        
-        base["STATUS DA ÚLTIMA ANÁLISE"] = base["SPOT ID"].map(analysis_status_grouped).apply(processar_analysis_status)
+        base = ler_upload(u_base)
+        # Mosaic e notas em .csv muito grandes são agregados em blocos
+        mosaic = abrir_upload(u_mosaic)
+        notas = abrir_upload(u_notas)
+        ordem_notas = ler_upload(u_ordem_notas)
+        ordem_planos = ler_upload(u_ordem_planos)
+        insights = ler_upload(u_insights)
 
-        # Mapear data da última coleta usando cache
-        # Mapear dados do mosaic para a base
-        # NÃO converter data para formato brasileiro - manter ISO para facilitar parse
-        base["DATA DA ÚLTIMA COLETA"] = base["SPOT ID"].map(spot_last_sync_grouped)
-        
-        # Cache groupby para notas
-        notas_grouped = notas.groupby("Local de instalação")["Nota"].apply(concat_values)
-        ordem_norm_grouped = notas.groupby("Local de instalação")["ORDEM_NORM"].apply(concat_values)
-        conclusao_grouped = notas.groupby("Local de instalação")["Conclusão desejada"].apply(concat_values)
-
-        base["INSIGHTS"] = base["MÁQUINA"].isin(insights_clean).map(
-            lambda x: "SIM" if x else "NÃO"
-        )
-
-        base["NOTA M4"] = base["SUBCONJUNTO"].map(notas_grouped)
-        base["ORDEM DA NOTA M4"] = base["SUBCONJUNTO"].map(ordem_norm_grouped)
-        base["DATA DE CONCLUSÃO DESEJADA DA NOTA M4"] = base["SUBCONJUNTO"].map(conclusao_grouped)
-
-        # --- status da ordem: usa função dedicada com reindex seguro ---
-        base["STATUS DO SISTEMA DA ORDEM M4"] = resolver_status_ordem(base, ordem_notas)
-
-        # Cache groupby para planos
-        ordem_planos_ordem_grouped = ordem_planos.groupby("Local de instalação")["Ordem"].apply(concat_values)
-        ordem_planos_status_grouped = ordem_planos.groupby("Local de instalação")["Status do sistema"].apply(concat_values)
-
-        base["NÚMERO DA ORDEM DO PLANO AV"] = base["MÁQUINA"].map(ordem_planos_ordem_grouped)
-        base["STATUS DO SISTEMA DA ORDEM DO PLANO AV"] = base["MÁQUINA"].map(ordem_planos_status_grouped)
-
-        # Criar coluna de link do spot com formato markdown clicável
-        from datetime import datetime, timedelta
-        hoje = datetime.now()
-        data_fim = hoje.strftime("%Y-%m-%dT%H:%M:%S-03:00")
-        data_inicio = (hoje - timedelta(days=7)).strftime("%Y-%m-%dT00:00:00-03:00")
-        
-        base["LINK DO SPOT"] = base["SPOT ID"].apply(
-            lambda spot_id: f"[🔗 Abrir](https://dyp.dynamox.solutions/654a51b9314e921d5e082ee3/spot-viewer/{spot_id}/{data_inicio}/{data_fim}?tab=telemetry)"
-        )
-
-        # Renomear e reorganizar colunas
-        base = base.rename(columns={
-            "SPOT NAME": "SPOTNAME",
-        })
-
-        # Remover SPOT ID da visualização (mas manter temporariamente para criar link)
-        # Reordenar colunas conforme solicitado
-        colunas_ordem = [
-            "MÁQUINA",
-            "SUBCONJUNTO", 
-            "SPOTNAME",
-            "ANALISTA RESPONSÁVEL",
-            "STATUS DO PONTO DE MONITORAMENTO",
-            "DATA DA ÚLTIMA ANÁLISE",
-            "STATUS DA ÚLTIMA ANÁLISE",
-            "INSIGHTS",
-            "NOTA M4",
-            "ORDEM DA NOTA M4",
-            "DATA DE CONCLUSÃO DESEJADA DA NOTA M4",
-            "STATUS DO SISTEMA DA ORDEM M4",
-            "NÚMERO DA ORDEM DO PLANO AV",
-            "STATUS DO SISTEMA DA ORDEM DO PLANO AV",
-            "DATA DA ÚLTIMA COLETA",
-            "LINK DO SPOT",
-        ]
-        
-        # Reordenar e manter só as colunas necessárias (sem SPOTID_TEMP para exibição)
-        base = base[colunas_ordem]
+        base, spot_ids, diagnostico = ingerir_arquivos(base, mosaic, notas, ordem_notas, ordem_planos, insights)
+        maquinas = montar_tabela_maquinas(base)
         
         print(f"DEBUG processar_base: Retornando {len(base)} linhas, {len(base.columns)} colunas")
         print(f"DEBUG processar_base: Colunas: {list(base.columns)}")
@@ -238,67 +180,156 @@ def register_callbacks(app):
         }
         
         # Criar controles UI
-        filtros_children = []
-        for analista in analistas:
-            filtros_children.append(
-                html.Div([
-                    html.Div(
-                        f"{analista}:",
-                        style={"fontWeight": "bold", "minWidth": "120px", "display": "flex", "alignItems": "center"}
-                    ),
-                    html.Div([
-                        dcc.Checklist(
-                            id={"type": "filtro-alarme-analista", "analista": analista},
-                            options=[
-                                {"label": " A1", "value": "A1"},
-                                {"label": " A2", "value": "A2"},
-                            ],
-                            value=["A1", "A2"],
-                            inline=True,
-                        ),
-                    ], style={"minWidth": "100px"}),
-                    html.Div([
-                        html.Label("Alarmes:", style={"marginRight": "5px", "fontSize": "12px"}),
-                        dcc.Input(
-                            id={"type": "dias-alarmes-analista", "analista": analista},
-                            type="number",
-                            value=DEFAULT_DIAS_ALARMES,
-                            style={"width": "60px"},
-                            debounce=True,
-                        ),
-                    ], style={"marginRight": "15px"}),
-                    html.Div([
-                        html.Label("Insights:", style={"marginRight": "5px", "fontSize": "12px"}),
-                        dcc.Input(
-                            id={"type": "dias-insights-analista", "analista": analista},
-                            type="number",
-                            value=DEFAULT_DIAS_INSIGHTS,
-                            style={"width": "60px"},
-                            debounce=True,
-                        ),
-                    ], style={"marginRight": "15px"}),
-                    html.Div([
-                        html.Label("Notas:", style={"marginRight": "5px", "fontSize": "12px"}),
-                        dcc.Input(
-                            id={"type": "dias-notas-analista", "analista": analista},
-                            type="number",
-                            value=DEFAULT_DIAS_NOTAS,
-                            style={"width": "60px"},
-                            debounce=True,
-                        ),
-                    ]),
-                ], style={
-                    "display": "flex",
-                    "alignItems": "center",
-                    "gap": "10px",
-                    "marginBottom": "10px",
-                    "padding": "10px",
-                    "backgroundColor": "#f5f5f5",
-                    "borderRadius": "5px",
-                })
+        filtros_children = [linha_filtro_analista(analista) for analista in analistas]
+
+        # A base fica gravada no servidor; o navegador guarda só o identificador.
+        # Mosaic e SPOT IDs vão junto para permitir atualizações por delta
+        # (um mosaic lido em blocos não cabe na memória, então fica sem delta).
+        extras = {"spots": spot_ids.to_frame()}
+        if isinstance(mosaic, pd.DataFrame):
+            extras["mosaic"] = mosaic[COLUNAS_MOSAIC]
+        dataset_id = salvar_dataset(base, maquinas, extras)
+        salvar_estado_recente(sessao, dataset_id, len(base))
+
+        return (
+            {"dataset_id": dataset_id, "linhas": len(base)},
+            "",
+            html.Div(filtros_children),
+            filtros_default,
+            diagnostico,
+        )
+
+    # ======================================================
+    # DIAGNÓSTICO DOS CRUZAMENTOS
+    # ======================================================
+
+    @app.callback(
+        Output("painel-diagnostico", "children"),
+        Input("diagnostico-cruzamentos", "data"),
+    )
+    def mostrar_diagnostico(diagnostico):
+        if not diagnostico:
+            return html.Div("Processe os arquivos para ver a cobertura dos cruzamentos.",
+                            style={"fontSize": "12px", "color": "#666"})
+
+        from pipeline import ETAPAS_CRUZAMENTO
+
+        linhas = []
+        for etapa, rotulo in ETAPAS_CRUZAMENTO.items():
+            cobertura = diagnostico.get(etapa)
+            if cobertura is None:
+                continue
+            faltando = cobertura["sem_correspondencia"]
+            cor = "red" if cobertura["erro"] else ("#b26a00" if faltando else "green")
+            texto = f"{rotulo}: {faltando} de {cobertura['linhas']}"
+            if faltando:
+                texto += f" ({cobertura['chaves_sem_correspondencia']} distintos)"
+            itens = [html.Div(texto, style={"color": cor, "fontWeight": "bold"})]
+            if cobertura["erro"]:
+                itens.append(html.Div(f"❌ {cobertura['erro']}", style={"color": "red"}))
+            if cobertura["amostra"]:
+                itens.append(html.Div(
+                    "Exemplos: " + ", ".join(cobertura["amostra"]),
+                    style={"fontSize": "12px", "color": "#666"},
+                ))
+            linhas.append(html.Div(itens, style={"marginBottom": "8px"}))
+        return linhas
+
+    # ======================================================
+    # DELTA DO MOSAIC
+    # ======================================================
+
+    @app.callback(
+        Output("df-base", "data", allow_duplicate=True),
+        Output("status-upload-mosaic-delta", "children"),
+        Input("upload-mosaic-delta", "data"),
+        State("df-base", "data"),
+        State("sessao-id", "data"),
+        State("filtros-aplicados", "data"),
+        State("dias-coleta-atualizada", "value"),
+        State("top-k-maquinas", "value"),
+        prevent_initial_call=True,
+    )
+    def aplicar_delta(arquivo, data, sessao, filtros_aplicados, dias_coleta, top_k):
+        if not arquivo:
+            raise PreventUpdate
+        filename = arquivo["nome"]
+        if not data:
+            return no_update, html.Div(
+                "❌ Processe os arquivos completos antes de enviar um delta", style={"color": "red"}
             )
 
-        return base.to_dict("records"), "", html.Div(filtros_children), filtros_default
+        from helpers import montar_tabela_maquinas
+        from pipeline import aplicar_delta_mosaic
+
+        base, _maquinas = carregar_dataset(data["dataset_id"])
+        mosaic = carregar_tabela_extra(data["dataset_id"], "mosaic")
+        spots = carregar_tabela_extra(data["dataset_id"], "spots")
+        if mosaic is None or spots is None:
+            return no_update, html.Div(
+                "❌ Esta base foi gravada sem o mosaic (base antiga ou mosaic lido em blocos); reprocesse com os arquivos completos",
+                style={"color": "red"},
+            )
+
+        try:
+            delta = ler_upload(arquivo)
+            base, mosaic, linhas = aplicar_delta_mosaic(base, spots["SPOT ID"], mosaic, delta)
+        except Exception as e:
+            logger.exception("aplicar_delta: erro no delta %s", filename)
+            return no_update, html.Div(f"❌ Erro no delta: {e}", style={"color": "red"})
+
+        logger.info("aplicar_delta: %d linhas no delta, %d pontos atualizados", len(delta), linhas)
+
+        # Ordem e máquinas não mudam; só os dias de coleta da tabela de máquinas
+        maquinas = montar_tabela_maquinas(base)
+        dataset_id = salvar_dataset(base, maquinas, {"mosaic": mosaic, "spots": spots})
+        # O dataset novo herda os limites, a coleta e o Top-K em uso: o
+        # gerar_filtros_analistas disparado pelo df-base novo remonta as
+        # linhas dos analistas a partir deste estado, não dos padrões
+        salvar_estado_recente(sessao, dataset_id, len(base), filtros_aplicados or None, dias_coleta, top_k)
+
+        return (
+            {"dataset_id": dataset_id, "linhas": len(base)},
+            html.Div(f"✓ {filename}: {linhas} pontos atualizados", style={"color": "green"}),
+        )
+
+    # ======================================================
+    # RESTAURAR ÚLTIMA BASE (REINÍCIO / DEPLOY)
+    # ======================================================
+
+    @app.callback(
+        Output("df-base", "data", allow_duplicate=True),
+        Output("dias-coleta-atualizada", "value"),
+        Output("top-k-maquinas", "value"),
+        Input("url", "pathname"),
+        Input("sessao-id", "data"),  # Lido do sessionStorage ao abrir a página
+        State("df-base", "data"),
+        prevent_initial_call="initial_duplicate",
+    )
+    def restaurar_ultima_base(_pathname, sessao, data):
+        # Só na abertura da página, e só se esta sessão do navegador (a aba,
+        # que mantém o sessao-id ao recarregar) tem base processada salva. A
+        # base é mapeada do disco sob demanda, sem refazer o processar_base.
+        if data or not sessao:
+            raise PreventUpdate
+        estado = carregar_estado_recente(sessao)
+        if not estado:
+            raise PreventUpdate
+
+        from fatos import COLUNAS_FATOS
+
+        base, _maquinas = carregar_dataset(estado["dataset_id"])
+        if any(coluna not in base.columns for coluna in COLUNAS_FATOS):
+            # Base gravada antes das tabelas de fatos (ver fatos.py): reprocessar
+            logger.info("restaurar_ultima_base: dataset %s sem %s, ignorado", estado["dataset_id"], COLUNAS_FATOS)
+            raise PreventUpdate
+        logger.info("restaurar_ultima_base: dataset %s (%d linhas)", estado["dataset_id"], len(base))
+
+        return (
+            {"dataset_id": estado["dataset_id"], "linhas": len(base)},
+            estado["dias_coleta"] if estado.get("dias_coleta") is not None else no_update,
+            estado.get("top_k") if estado.get("top_k") else no_update,
+        )
 
     # ======================================================
     # GERAR FILTROS DINÂMICOS POR ANALISTA
@@ -309,17 +340,19 @@ def register_callbacks(app):
         Output("filtros-por-analista", "data"),
         Input("df-base", "data"),
         Input("btn-processar-uploads", "n_clicks"),  # Trigger extra
+        State("sessao-id", "data"),
+        State("filtros-por-analista", "data"),
     )
-    def gerar_filtros_analistas(data, n_clicks):
-        print(f"DEBUG: gerar_filtros_analistas chamado. Data: {type(data)}, len: {len(data) if data else 0}, n_clicks: {n_clicks}")
+    def gerar_filtros_analistas(data, n_clicks, sessao, filtros_em_edicao):
+        print(f"DEBUG: gerar_filtros_analistas chamado. Data: {data}, n_clicks: {n_clicks}")
         
         if not data:
             return html.Div("⚠️ Aguardando upload dos arquivos para gerar filtros...", 
                           style={"color": "#666", "fontStyle": "italic", "padding": "10px"}), {}
 
         try:
-            df = pd.DataFrame(data)
-            print(f"DEBUG: DataFrame criado. Shape: {df.shape}, Colunas: {list(df.columns)}")
+            df, _maquinas = carregar_dataset(data["dataset_id"])
+            print(f"DEBUG: DataFrame carregado. Shape: {df.shape}, Colunas: {list(df.columns)}")
         except Exception as e:
             print(f"DEBUG ERRO ao criar DataFrame: {e}")
             return html.Div(f"❌ Erro ao processar dados: {str(e)}", 
@@ -351,85 +384,19 @@ def register_callbacks(app):
             for analista in analistas
         }
 
+        # Base restaurada após reinício ou atualizada por delta: volta com os
+        # limites salvos para ela
+        estado = carregar_estado_recente(sessao)
+        if estado and estado["dataset_id"] == data["dataset_id"] and estado.get("filtros"):
+            for analista in analistas:
+                filtros_default[analista].update(estado["filtros"].get(analista) or {})
+
+            # No delta, edições ainda não aplicadas (modo em lote) continuam nas linhas
+            for analista in analistas:
+                filtros_default[analista].update((filtros_em_edicao or {}).get(analista) or {})
+
         # Criar controles para cada analista
-        children = []
-        for analista in analistas:
-            children.append(
-                html.Div([
-                    # Nome do analista
-                    html.Div(
-                        f"{analista}:",
-                        style={
-                            "fontWeight": "bold",
-                            "minWidth": "120px",
-                            "display": "flex",
-                            "alignItems": "center",
-                        }
-                    ),
-                    
-                    # Checkboxes A1/A2
-                    html.Div([
-                        dcc.Checklist(
-                            id={"type": "filtro-alarme-analista", "analista": analista},
-                            options=[
-                                {"label": " A1", "value": "A1"},
-                                {"label": " A2", "value": "A2"},
-                            ],
-                            value=["A1", "A2"],
-                            inline=True,
-                        ),
-                    ], style={"minWidth": "100px"}),
-                    
-                    # Input dias alarmes
-                    html.Div([
-                        html.Label("Alarmes:", style={"fontSize": "11px", "marginRight": "5px"}),
-                        dcc.Input(
-                            id={"type": "dias-alarmes-analista", "analista": analista},
-                            type="number",
-                            value=DEFAULT_DIAS_ALARMES,
-                            min=0,
-                            debounce=True,
-                            style={"width": "60px"},
-                        ),
-                    ], style={"display": "flex", "alignItems": "center", "gap": "5px"}),
-                    
-                    # Input dias insights
-                    html.Div([
-                        html.Label("Insights:", style={"fontSize": "11px", "marginRight": "5px"}),
-                        dcc.Input(
-                            id={"type": "dias-insights-analista", "analista": analista},
-                            type="number",
-                            value=DEFAULT_DIAS_INSIGHTS,
-                            min=0,
-                            debounce=True,
-                            style={"width": "60px"},
-                        ),
-                    ], style={"display": "flex", "alignItems": "center", "gap": "5px"}),
-                    
-                    # Input dias notas
-                    html.Div([
-                        html.Label("Notas:", style={"fontSize": "11px", "marginRight": "5px"}),
-                        dcc.Input(
-                            id={"type": "dias-notas-analista", "analista": analista},
-                            type="number",
-                            value=DEFAULT_DIAS_NOTAS,
-                            min=0,
-                            debounce=True,
-                            style={"width": "60px"},
-                        ),
-                    ], style={"display": "flex", "alignItems": "center", "gap": "5px"}),
-                    
-                ], style={
-                    "display": "flex",
-                    "gap": "15px",
-                    "marginBottom": "12px",
-                    "alignItems": "center",
-                    "padding": "10px",
-                    "backgroundColor": "white",
-                    "borderRadius": "5px",
-                    "border": "1px solid #e0e0e0",
-                })
-            )
+        children = [linha_filtro_analista(analista, filtros_default[analista]) for analista in analistas]
 
         container = html.Div(children, style={
             "border": "2px solid #ddd",
@@ -442,294 +409,482 @@ def register_callbacks(app):
         return container, filtros_default
 
     # ======================================================
-    # APLICAÇÃO DAS REGRAS
+    # FILTROS EM EDIÇÃO E CONFIRMAÇÃO (MODO EM LOTE)
     # ======================================================
 
-    @app.callback(
-        Output("tabela-final", "data"),
-        Output("tabela-final", "columns"),
-        Output("tabela-analista", "data"),
-        Output("tabela-analista", "columns"),
-        Output("df-final", "data"),
-        Input("df-base", "data"),
-        Input("dias-coleta-atualizada", "value"),
+    # Cada edição só atualiza o store no navegador, sem ida ao servidor
+    app.clientside_callback(
+        """
+        function(alarmes, diasAlarmes, diasInsights, diasNotas, ids) {
+            const filtros = {};
+            ids.forEach(function(id, i) {
+                filtros[id.analista] = {
+                    alarmes: alarmes[i] || [],
+                    dias_alarmes: diasAlarmes[i],
+                    dias_insights: diasInsights[i],
+                    dias_notas: diasNotas[i],
+                };
+            });
+            return filtros;
+        }
+        """,
+        Output("filtros-por-analista", "data", allow_duplicate=True),
         Input({"type": "filtro-alarme-analista", "analista": ALL}, "value"),
         Input({"type": "dias-alarmes-analista", "analista": ALL}, "value"),
         Input({"type": "dias-insights-analista", "analista": ALL}, "value"),
         Input({"type": "dias-notas-analista", "analista": ALL}, "value"),
         State({"type": "filtro-alarme-analista", "analista": ALL}, "id"),
+        prevent_initial_call=True,
     )
-    def aplicar_regras(data,
-                       dias_coleta,
-                       filtros_alarme_values, 
-                       dias_alarmes_values,
-                       dias_insights_values,
-                       dias_notas_values,
-                       filtros_ids):
-        # Se não há dados ainda (uploads incompletos), bloqueia normalmente.
+
+    # Fora do modo em lote, toda edição é confirmada na hora. No modo em
+    # lote, só o botão (ou a troca de base/analistas) confirma, e
+    # aplicar_regras roda uma única vez para todas as edições pendentes.
+    app.clientside_callback(
+        """
+        function(filtros, nClicks, modo, aplicados) {
+            const ctx = window.dash_clientside.callback_context;
+            const gatilhos = ctx.triggered.map(function(t) { return t.prop_id; });
+            const emLote = (modo || []).indexOf("lote") !== -1;
+            const mesmosAnalistas = JSON.stringify(Object.keys(filtros || {}).sort())
+                === JSON.stringify(Object.keys(aplicados || {}).sort());
+            if (emLote && mesmosAnalistas
+                    && gatilhos.indexOf("btn-aplicar-limites.n_clicks") === -1
+                    && gatilhos.indexOf("modo-aplicacao-lote.value") === -1) {
+                return window.dash_clientside.no_update;
+            }
+            return filtros;
+        }
+        """,
+        Output("filtros-aplicados", "data"),
+        Input("filtros-por-analista", "data"),
+        Input("btn-aplicar-limites", "n_clicks"),
+        Input("modo-aplicacao-lote", "value"),
+        State("filtros-aplicados", "data"),
+    )
+
+    # ======================================================
+    # PRÉVIA DE IMPACTO POR ANALISTA
+    # ======================================================
+
+    @app.callback(
+        Output({"type": "previa-analista", "analista": ALL}, "children"),
+        Input("filtros-por-analista", "data"),
+        Input("dias-coleta-atualizada", "value"),
+        State("df-base", "data"),
+        State({"type": "previa-analista", "analista": ALL}, "id"),
+    )
+    def previa_impacto(filtros, dias_coleta, data, ids):
+        # Só os filtros e o dataset_id vêm do navegador; os indicadores por
+        # ponto ficam em cache no servidor (ver indicadores_do_dataset)
+        if not data or not ids:
+            raise PreventUpdate
+
+        if dias_coleta is None:
+            dias_coleta = DEFAULT_DIAS_COLETA
+
+        from indicadores import contar_pontos_por_analista, indicadores_do_dataset
+        from pipeline import config_por_analista_de_filtros
+
+        indicadores = indicadores_do_dataset(data["dataset_id"])
+
+        config_por_analista = config_por_analista_de_filtros(filtros, indicadores["analistas"])
+        contagem = contar_pontos_por_analista(indicadores, config_por_analista, dias_coleta)
+
+        previas = []
+        for id_previa in ids:
+            qtd = contagem.get(id_previa["analista"], 0)
+            if qtd >= 400:
+                cor = "#ff4444"
+            elif qtd >= 300:
+                cor = "#f9a825"
+            else:
+                cor = "#4caf50"
+            previas.append(html.Span(
+                f"Prévia: {qtd} pontos",
+                style={"color": cor, "fontWeight": "bold"},
+            ))
+        return previas
+
+    # ======================================================
+    # PRÉVIA POR CONDIÇÃO (HISTOGRAMAS ACUMULADOS)
+    # ======================================================
+
+    @app.callback(
+        Output("histogramas-analista", "data"),
+        Input("df-base", "data"),
+        Input("dias-coleta-atualizada", "value"),
+    )
+    def montar_histogramas_analistas(data, dias_coleta):
         if not data:
             raise PreventUpdate
 
-        # CRÍTICO: Fazer cópia para evitar modificar o objeto em cache
-        df = pd.DataFrame(data).copy()
-        
-        # Usar valor padrão se dias_coleta for None
         if dias_coleta is None:
-            dias_coleta = 7
-        
-        print(f"DEBUG aplicar_regras: dias_coleta={dias_coleta}, len(data)={len(data)}")
+            dias_coleta = DEFAULT_DIAS_COLETA
 
-        # Criar dicionários de configurações por analista
-        config_por_analista = {}
-        
         from layout import DEFAULT_DIAS_ALARMES, DEFAULT_DIAS_INSIGHTS, DEFAULT_DIAS_NOTAS
-        
-        if filtros_ids and filtros_alarme_values:
-            num_analistas = len(filtros_ids)
-            
-            # Se os inputs de dias estiverem vazios, usar defaults
-            if len(dias_alarmes_values) == 0:
-                dias_alarmes_values = [DEFAULT_DIAS_ALARMES] * num_analistas
-            if len(dias_insights_values) == 0:
-                dias_insights_values = [DEFAULT_DIAS_INSIGHTS] * num_analistas
-            if len(dias_notas_values) == 0:
-                dias_notas_values = [DEFAULT_DIAS_NOTAS] * num_analistas
-            
-            # Verificar se todas as listas têm o mesmo tamanho
-            if (len(filtros_alarme_values) >= num_analistas and 
-                len(dias_alarmes_values) >= num_analistas and
-                len(dias_insights_values) >= num_analistas and
-                len(dias_notas_values) >= num_analistas):
-                
-                for i, filtro_id in enumerate(filtros_ids):
-                    analista = filtro_id["analista"]
-                    config_por_analista[analista] = {
-                        "filtro_alarme": filtros_alarme_values[i] if filtros_alarme_values[i] else [],
-                        "dias_alarmes": dias_alarmes_values[i] if dias_alarmes_values[i] is not None else DEFAULT_DIAS_ALARMES,
-                        "dias_insights": dias_insights_values[i] if dias_insights_values[i] is not None else DEFAULT_DIAS_INSIGHTS,
-                        "dias_notas": dias_notas_values[i] if dias_notas_values[i] is not None else DEFAULT_DIAS_NOTAS,
-                    }
-            else:
-                print(f"DEBUG aplicar_regras: Tamanhos incompatíveis - ids:{len(filtros_ids)}, alarmes:{len(filtros_alarme_values)}, dias_alarmes:{len(dias_alarmes_values)}, dias_insights:{len(dias_insights_values)}, dias_notas:{len(dias_notas_values)}")
-                # Usar configuração padrão para todos
-                for filtro_id in filtros_ids:
-                    analista = filtro_id["analista"]
-                    config_por_analista[analista] = {
-                        "filtro_alarme": ["A1", "A2"],
-                        "dias_alarmes": DEFAULT_DIAS_ALARMES,
-                        "dias_insights": DEFAULT_DIAS_INSIGHTS,
-                        "dias_notas": DEFAULT_DIAS_NOTAS,
-                    }
-
-        dias_col = df["DATA DA ÚLTIMA ANÁLISE"].apply(days_diff)
-        
-        # PRÉ-CALCULAR dias de nota para todos os pontos (uma única vez)
-        print("DEBUG: Calculando dias de notas vencidas...")
-        dias_nota_col_global = df["DATA DE CONCLUSÃO DESEJADA DA NOTA M4"].apply(days_diff)
-        print("DEBUG: Dias de notas calculados")
+        from indicadores import indicadores_do_dataset, montar_histogramas
 
-        # Criar dicionários para armazenar condições por índice
-        condicoes_por_index = {idx: {"cond1": False, "cond2": False, "cond3": False, "cond4": False, "dias_alarm": None, "dias_nota": None} 
-                               for idx in df.index}
+        histogramas = montar_histogramas(indicadores_do_dataset(data["dataset_id"]), dias_coleta)
+        histogramas["padroes"] = {
+            "dias_alarmes": DEFAULT_DIAS_ALARMES,
+            "dias_insights": DEFAULT_DIAS_INSIGHTS,
+            "dias_notas": DEFAULT_DIAS_NOTAS,
+        }
+        return histogramas
+
+    # Consulta O(1) nos acumulados a cada edição, direto no navegador
+    app.clientside_callback(
+        """
+        function(filtros, histogramas, ids) {
+            if (!histogramas) {
+                return ids.map(function() { return ""; });
+            }
+            const limite = histogramas.limite;
+            const indice = function(valor, padrao) {
+                const dias = (valor === null || valor === undefined || valor === "") ? padrao : Number(valor);
+                return Math.min(Math.max(Math.floor(dias), 0), limite);
+            };
+            return ids.map(function(id) {
+                const h = histogramas.analistas[id.analista];
+                if (!h) {
+                    return "";
+                }
+                const f = (filtros || {})[id.analista] || {alarmes: ["A1", "A2"]};
+                const alarmes = (f.alarmes || []).slice().sort().join("");
+                const p = histogramas.padroes;
+                const qtdAlarmes = alarmes ? h[alarmes][indice(f.dias_alarmes, p.dias_alarmes)] : 0;
+                const qtdInsights = h.insights[indice(f.dias_insights, p.dias_insights)];
+                const qtdNotas = h.notas[indice(f.dias_notas, p.dias_notas)];
+                return "Alarmes " + qtdAlarmes + " · Insights " + qtdInsights
+                    + " · Notas " + qtdNotas + " · CONF " + h.conf;
+            });
+        }
+        """,
+        Output({"type": "previa-condicoes-analista", "analista": ALL}, "children"),
+        Input("filtros-por-analista", "data"),
+        Input("histogramas-analista", "data"),
+        State({"type": "previa-condicoes-analista", "analista": ALL}, "id"),
+    )
 
-        # Aplicar regras POR ANALISTA
-        todas_maquinas_qualificadas = set()
-        
-        for analista in df["ANALISTA RESPONSÁVEL"].dropna().unique():
-            df_analista = df[df["ANALISTA RESPONSÁVEL"] == analista]
-            
-            # Pegar configurações específicas deste analista
-            config = config_por_analista.get(analista, {
-                "filtro_alarme": ["A1", "A2"],
-                "dias_alarmes": DEFAULT_DIAS_ALARMES,
-                "dias_insights": DEFAULT_DIAS_INSIGHTS,
-                "dias_notas": DEFAULT_DIAS_NOTAS,
-            })
-            
-            filtro_alarme_analista = config["filtro_alarme"]
-            dias_alarm = config["dias_alarmes"]
-            dias_insight = config["dias_insights"]
-            dias_nota = config["dias_notas"]
-            
-            # Cond1: alarmes com análise antiga ou ausente (com filtro específico do analista)
-            if filtro_alarme_analista:
-                padrao_alarme = "|".join(filtro_alarme_analista)
-                # Pré-calcular dias_col para os índices do analista (MUITO mais rápido)
-                dias_col_analista = dias_col.loc[df_analista.index]
-                cond1 = (
-                    df_analista["STATUS DO PONTO DE MONITORAMENTO"].str.contains(padrao_alarme, case=False, na=False)
-                    & (dias_col_analista.isna() | (dias_col_analista > dias_alarm))
-                )
-            else:
-                cond1 = pd.Series(False, index=df_analista.index)
+    # ======================================================
+    # AVALIAÇÃO DAS REGRAS NO NAVEGADOR
+    # ======================================================
 
-            # Cond2: insights com análise antiga ou ausente
-            dias_col_analista = dias_col.loc[df_analista.index]
-            cond2 = (
-                (df_analista["INSIGHTS"] == "SIM")
-                & (dias_col_analista.isna() | (dias_col_analista > dias_insight))
-            )
+    # O snapshot só é enviado com a opção ligada, uma vez por base
+    @app.callback(
+        Output("snapshot-regras", "data"),
+        Input("df-base", "data"),
+        Input("avaliacao-navegador", "value"),
+    )
+    def montar_snapshot_regras(data, modo):
+        if not data or "navegador" not in (modo or []):
+            return None
 
-            # Cond3: notas M4 com conclusão vencida (usando valor pré-calculado)
-            dias_nota_col = dias_nota_col_global.loc[df_analista.index]
-            cond3 = (
-                df_analista["NOTA M4"].notna()
-                & (dias_nota_col.notna())
-                & (dias_nota_col > dias_nota)
-            )
+        from layout import DEFAULT_DIAS_ALARMES, DEFAULT_DIAS_INSIGHTS, DEFAULT_DIAS_NOTAS
+        from indicadores import indicadores_do_dataset, montar_snapshot
+
+        snapshot = montar_snapshot(indicadores_do_dataset(data["dataset_id"]), {
+            "dias_alarmes": DEFAULT_DIAS_ALARMES,
+            "dias_insights": DEFAULT_DIAS_INSIGHTS,
+            "dias_notas": DEFAULT_DIAS_NOTAS,
+            "dias_coleta": DEFAULT_DIAS_COLETA,
+        })
+        logger.info("snapshot-regras: %d pontos", snapshot["n"])
+        return snapshot
+
+    # cond1–cond4, filtro de coleta e contagem por analista (assets/avaliacao.js)
+    app.clientside_callback(
+        ClientsideFunction(namespace="avaliacao", function_name="tabela_analista"),
+        Output("tabela-analista", "data", allow_duplicate=True),
+        Output("tabela-analista", "columns", allow_duplicate=True),
+        Input("filtros-aplicados", "data"),
+        Input("dias-coleta-atualizada", "value"),
+        Input("top-k-maquinas", "value"),
+        Input("avaliacao-navegador", "value"),
+        Input("snapshot-regras", "data"),
+        prevent_initial_call=True,
+    )
 
-            # Cond4: ordens com status de confirmação pendente
-            cond4 = df_analista["STATUS DO SISTEMA DA ORDEM M4"].str.contains(
-                r"\bCONF\b", case=False, na=False, regex=True
+    # Lista e downloads atrás das contagens do navegador: aviso e downloads desligados
+    app.clientside_callback(
+        ClientsideFunction(namespace="avaliacao", function_name="sincronia"),
+        Output("aviso-lista-desatualizada", "style"),
+        Output("btn-download", "disabled"),
+        Output("btn-download-analistas", "disabled"),
+        Input("df-final", "data"),
+        Input("filtros-aplicados", "data"),
+        Input("dias-coleta-atualizada", "value"),
+        Input("top-k-maquinas", "value"),
+        Input("avaliacao-navegador", "value"),
+    )
+
+    # ======================================================
+    # APLICAÇÃO DAS REGRAS
+    # ======================================================
+
+    # Cada mudança de entrada ganha um carimbo (geração) no navegador;
+    # aplicar_regras dispara pelo carimbo e descarta gerações superadas.
+    # Com a avaliação no navegador (e sem Top-K), mudanças de limite não
+    # vão ao servidor: só a troca de base, o botão de atualizar a lista
+    # ou o desligamento da opção geram um carimbo novo.
+    app.clientside_callback(
+        """
+        function(data, diasColeta, filtros, topK, nAtualizar, modo, sessao) {
+            const novaSessao = sessao || ((window.crypto && window.crypto.randomUUID)
+                ? window.crypto.randomUUID()
+                : Date.now().toString(16) + Math.random().toString(16).slice(2));
+            const sessaoSaida = sessao ? window.dash_clientside.no_update : novaSessao;
+            const gatilhos = window.dash_clientside.callback_context.triggered.map(function(t) { return t.prop_id; });
+            const noNavegador = (modo || []).indexOf("navegador") !== -1 && !topK;
+            const servidor = ["df-base.data", "btn-atualizar-lista.n_clicks", "top-k-maquinas.value"];
+            if (noNavegador && sessao && !gatilhos.some(function(g) { return servidor.indexOf(g) !== -1; })) {
+                return [window.dash_clientside.no_update, sessaoSaida];
+            }
+            return [Date.now(), sessaoSaida];
+        }
+        """,
+        Output("geracao-avaliacao", "data"),
+        Output("sessao-id", "data"),
+        Input("df-base", "data"),
+        Input("dias-coleta-atualizada", "value"),
+        Input("filtros-aplicados", "data"),
+        Input("top-k-maquinas", "value"),
+        Input("btn-atualizar-lista", "n_clicks"),
+        Input("avaliacao-navegador", "value"),
+        State("sessao-id", "data"),
+    )
+
+    @app.callback(
+        Output("tabela-analista", "data"),
+        Output("tabela-analista", "columns"),
+        Output("df-final", "data"),
+        Input("geracao-avaliacao", "data"),
+        State("df-base", "data"),
+        State("dias-coleta-atualizada", "value"),
+        State("filtros-aplicados", "data"),
+        State("top-k-maquinas", "value"),
+        State("sessao-id", "data"),
+    )
+    @perfilavel("aplicar_regras")
+    def aplicar_regras(geracao, data, dias_coleta, filtros_aplicados, top_k, sessao):
+        # Se não há dados ainda (uploads incompletos), bloqueia normalmente.
+        if not data:
+            raise PreventUpdate
+
+        # Descarta a avaliação se uma mais nova da mesma sessão já chegou
+        # (antes de começar ou em qualquer ponto de verificação abaixo)
+        if sessao and geracao is not None and not registrar_geracao(sessao, geracao):
+            logger.info("aplicar_regras: geração %s já superada, descartando", geracao)
+            raise PreventUpdate
+
+        from pipeline import avaliar_regras
+
+        def verificar_geracao(etapa):
+            if avaliacao_obsoleta(sessao, geracao):
+                logger.info("aplicar_regras: geração %s superada em '%s', descartando", geracao, etapa)
+                raise PreventUpdate
+
+        # Uma avaliação por sessão de cada vez; quem esperou na fila confere
+        # se ainda é a geração mais nova antes de começar
+        with vez_da_sessao(sessao):
+            verificar_geracao("fila")
+            base, maquinas = carregar_dataset(data["dataset_id"])
+
+            # Usar valor padrão se dias_coleta for None
+            dias_coleta_recebido = dias_coleta
+            if dias_coleta is None:
+                dias_coleta = DEFAULT_DIAS_COLETA
+
+            print(f"DEBUG aplicar_regras: dias_coleta={dias_coleta}, len(base)={len(base)}")
+
+            df_final, _df_final_exibir, resumo, detalhes = avaliar_regras(
+                base, maquinas, filtros_aplicados, dias_coleta, top_k, verificar_geracao
             )
 
-            # Armazenar condições para cada índice deste analista
-            for idx in df_analista.index:
-                condicoes_por_index[idx]["cond1"] = cond1.loc[idx]
-                condicoes_por_index[idx]["cond2"] = cond2.loc[idx]
-                condicoes_por_index[idx]["cond3"] = cond3.loc[idx]
-                condicoes_por_index[idx]["cond4"] = cond4.loc[idx]
-                condicoes_por_index[idx]["dias_alarm"] = dias_col.loc[idx]
-                condicoes_por_index[idx]["dias_nota"] = dias_nota_col.loc[idx]
-
-            # Identificar máquinas qualificadas deste analista
-            pontos_qualificados = cond1 | cond2 | cond3 | cond4
-            maquinas_qualificadas = df_analista[pontos_qualificados]["MÁQUINA"].unique()
-            todas_maquinas_qualificadas.update(maquinas_qualificadas)
-        
-        # FILTRO GLOBAL: Remover máquinas onde TODOS os spots têm coleta defasada
-        # Calcular dias desde última coleta para cada ponto (SEMPRE recalcular, não usar cache)
-        print(f"DEBUG: Recalculando DIAS_DESDE_COLETA com dias_coleta={dias_coleta}")
-        df["DIAS_DESDE_COLETA"] = df["DATA DA ÚLTIMA COLETA"].apply(days_since_last_sync)
-        
-        # Verificar se está recalculando mesmo
-        print(f"DEBUG COLETA: Total pontos base: {len(df)}")
-        print(f"DEBUG COLETA: Pontos sem dados coleta (None): {df['DIAS_DESDE_COLETA'].isna().sum()}")
-        print(f"DEBUG COLETA: Pontos com coleta ≤ {dias_coleta} dias: {(df['DIAS_DESDE_COLETA'] <= dias_coleta).sum()}")
-        print(f"DEBUG COLETA: Pontos OK (NOT None E ≤ {dias_coleta}): {((df['DIAS_DESDE_COLETA'].notna()) & (df['DIAS_DESDE_COLETA'] <= dias_coleta)).sum()}")
-        
-        print(f"DEBUG: Total de máquinas qualificadas antes do filtro de coleta: {len(todas_maquinas_qualificadas)}")
-        print(f"DEBUG: Linha de corte configurada: {dias_coleta} dias")
-        
-        # Para cada máquina qualificada, verificar se pelo menos 1 spot tem coleta atualizada
-        # CRÍTICO: Verificar apenas nos pontos que pertencem às máquinas qualificadas
-        df_qualificado = df[df["MÁQUINA"].isin(todas_maquinas_qualificadas)]
-        
-        maquinas_com_coleta_ok = set()
-        maquinas_removidas_detalhes = []
-        
-        print(f"DEBUG LOOP: Iniciando loop com dias_coleta={dias_coleta}")
-        
-        for i, maquina in enumerate(todas_maquinas_qualificadas):
-            pontos_maquina = df_qualificado[df_qualificado["MÁQUINA"] == maquina]
-            dias_coleta_maquina = pontos_maquina["DIAS_DESDE_COLETA"]
-            
-            # Log da primeira máquina para debug
-            if i == 0:
-                print(f"DEBUG PRIMEIRA MÁQUINA: {maquina}")
-                print(f"  dias_coleta={dias_coleta}")
-                print(f"  Valores DIAS_DESDE_COLETA: {dias_coleta_maquina.tolist()[:5]}")
-                print(f"  Verificando: (notna) & (<= {dias_coleta})")
-            
-            # Se pelo menos 1 spot tem coleta atualizada E COM DADOS (não None), a máquina passa
-            # Mudança: None agora NÃO passa mais (Opção B)
-            tem_coleta_atualizada = (dias_coleta_maquina.notna()) & (dias_coleta_maquina <= dias_coleta)
-            
-            if tem_coleta_atualizada.any():
-                maquinas_com_coleta_ok.add(maquina)
-            else:
-                # Guardar detalhes da máquina removida
-                min_dias = dias_coleta_maquina[dias_coleta_maquina.notna()].min() if dias_coleta_maquina.notna().any() else None
-                maquinas_removidas_detalhes.append({
-                    'maquina': maquina,
-                    'menor_dias': min_dias
-                })
-        
-        print(f"DEBUG: Máquinas com coleta OK (filtro <= {dias_coleta} dias): {len(maquinas_com_coleta_ok)}")
-        print(f"DEBUG: Máquinas REMOVIDAS pelo filtro de coleta: {len(todas_maquinas_qualificadas) - len(maquinas_com_coleta_ok)}")
-        
-        # Mostrar primeiras 5 removidas com seus valores mínimos
-        if maquinas_removidas_detalhes:
-            print(f"DEBUG: Primeiras 5 máquinas removidas (menor dias de cada):")
-            for det in sorted(maquinas_removidas_detalhes, key=lambda x: x['menor_dias'] if x['menor_dias'] else 9999)[:5]:
-                print(f"  {det['maquina']}: menor_dias = {det['menor_dias']}")
-        
-        # Trazer TODOS os pontos das máquinas que passaram no filtro de coleta
-        df_final = df[df["MÁQUINA"].isin(maquinas_com_coleta_ok)].sort_values(
-            by=["ANALISTA RESPONSÁVEL", "MÁQUINA", "SPOTNAME"]
-        )
+            # Guarda os limites aplicados para restaurar junto com a base (sem
+            # filtros ainda, a avaliação é a inicial e não sobrescreve os salvos)
+            if filtros_aplicados:
+                salvar_estado_recente(sessao, data["dataset_id"], data.get("linhas"), filtros_aplicados, dias_coleta, top_k)
 
-        # Gerar coluna INPUT com badges para cada ponto (OTIMIZADO)
-        print(f"DEBUG: Gerando INPUT para {len(df_final)} linhas...")
-        try:
-            # Usar apply que é mais rápido que loop manual
-            df_final["INPUT"] = df_final.apply(
-                lambda row: gerar_badge_input(
-                    row,
-                    condicoes_por_index.get(row.name, {}).get("dias_alarm"),
-                    condicoes_por_index.get(row.name, {}).get("dias_nota"),
-                    condicoes_por_index.get(row.name, {}).get("cond1", False),
-                    condicoes_por_index.get(row.name, {}).get("cond2", False),
-                    condicoes_por_index.get(row.name, {}).get("cond3", False),
-                    condicoes_por_index.get(row.name, {}).get("cond4", False)
-                ),
-                axis=1
+            # Resumo compacto da avaliação no histórico (falha aqui não afeta a tela)
+            try:
+                registrar_execucao(
+                    df_final, detalhes, "app", data["dataset_id"], dias_coleta, top_k, filtros_aplicados
+                )
+            except Exception:
+                logger.exception("aplicar_regras: erro ao gravar histórico")
+
+            # A lista fica no servidor; o navegador recebe só a chave do resultado
+            # e busca as linhas conforme a visualização (ver exibir_resultado)
+            chave = chave_resultado(data["dataset_id"], filtros_aplicados, dias_coleta, top_k)
+            salvar_resultado(chave, df_final, detalhes["condicoes"])
+
+            cols_resumo = [{"name": c, "id": c} for c in resumo.columns]
+
+            # Entradas da avaliação como vieram do navegador, para ele saber se
+            # a lista ficou atrás das contagens locais (ver avaliacao.sincronia)
+            parametros = {"filtros": filtros_aplicados, "dias_coleta": dias_coleta_recebido, "top_k": top_k}
+
+            return (
+                resumo.to_dict("records"),
+                cols_resumo,
+                {
+                    "chave": chave, "linhas": len(df_final), "maquinas": int(df_final["MÁQUINA"].nunique()),
+                    "parametros": parametros,
+                },
             )
-            print(f"DEBUG: INPUT gerado com sucesso")
-        except Exception as e:
-            # Se falhar, criar coluna vazia para não quebrar
-            print(f"ERRO ao gerar INPUT: {e}")
-            df_final["INPUT"] = "[Erro ao gerar badges]"
 
-        # Remover INSIGHTS e DIAS_DESDE_COLETA antes de exibir
-        colunas_remover = ["INSIGHTS", "DIAS_DESDE_COLETA"]
-        
-        # Definir ordem desejada das colunas
-        ordem_desejada = [
-            "MÁQUINA",
-            "SUBCONJUNTO",
-            "SPOTNAME",
-            "ANALISTA RESPONSÁVEL",
-            "INPUT",
-            "LINK DO SPOT",
-            "STATUS DO PONTO DE MONITORAMENTO",
-            "DATA DA ÚLTIMA ANÁLISE",
-            "STATUS DA ÚLTIMA ANÁLISE",
-            "NOTA M4",
-            "ORDEM DA NOTA M4",
-            "DATA DE CONCLUSÃO DESEJADA DA NOTA M4",
-            "STATUS DO SISTEMA DA ORDEM M4",
-            "NÚMERO DA ORDEM DO PLANO AV",
-            "STATUS DO SISTEMA DA ORDEM DO PLANO AV",
-            "DATA DA ÚLTIMA COLETA",
-        ]
-        
-        # Pegar apenas as colunas que existem e não devem ser removidas
-        colunas_final_ordem = [c for c in ordem_desejada if c in df_final.columns and c not in colunas_remover]
-        
-        df_final_exibir = df_final[colunas_final_ordem]
+    # ======================================================
+    # LISTA FINAL: PONTOS OU AGRUPADA POR MÁQUINA
+    # ======================================================
 
-        resumo = (
-            df_final_exibir
-            .groupby("ANALISTA RESPONSÁVEL")
-            .size()
-            .reset_index(name="QUANTIDADE DE PONTOS")
-        )
+    @app.callback(
+        Output("tabela-final", "data"),
+        Output("tabela-final", "columns"),
+        Output("tabela-maquinas", "data"),
+        Output("tabela-maquinas", "columns"),
+        Output("container-lista", "style"),
+        Output("container-maquinas", "style"),
+        Input("df-final", "data"),
+        Input("modo-visualizacao", "value"),
+    )
+    def exibir_resultado(resultado, modo):
+        if not resultado:
+            raise PreventUpdate
+
+        from pipeline import colunas_para_exibir, resumir_por_maquina
+
+        lista, condicoes = carregar_resultado(resultado["chave"])
+
+        # Só a visualização ativa é enviada ao navegador
+        if modo == "maquina":
+            maquinas = resumir_por_maquina(lista, condicoes)
+            maquinas["id"] = maquinas["MÁQUINA"]
+            cols_maquinas = [{"name": c, "id": c} for c in maquinas.columns if c != "id"]
+            return [], [], maquinas.to_dict("records"), cols_maquinas, {"display": "none"}, {"display": "block"}
 
+        lista_exibir = lista[colunas_para_exibir(lista)]
         cols_final = [
-            {"name": c, "id": c, "presentation": "markdown"} if c == "LINK DO SPOT" 
-            else {"name": c, "id": c} 
-            for c in df_final_exibir.columns
+            {"name": c, "id": c, "presentation": "markdown"} if c == "LINK DO SPOT"
+            else {"name": c, "id": c}
+            for c in lista_exibir.columns
         ]
-        cols_resumo = [{"name": c, "id": c} for c in resumo.columns]
+        return lista_exibir.to_dict("records"), cols_final, [], [], {"display": "block"}, {"display": "none"}
 
-        return (
-            df_final_exibir.to_dict("records"),
-            cols_final,
-            resumo.to_dict("records"),
-            cols_resumo,
-            df_final.to_dict("records"),  # Mantém SPOTID_TEMP no store para possível uso futuro
-        )
+    @app.callback(
+        Output("tabela-pontos-maquina", "data"),
+        Output("tabela-pontos-maquina", "columns"),
+        Output("titulo-pontos-maquina", "children"),
+        Input("tabela-maquinas", "active_cell"),
+        State("df-final", "data"),
+    )
+    def expandir_maquina(celula, resultado):
+        if not celula or not resultado or celula.get("row_id") is None:
+            return [], [], ""
+
+        from pipeline import colunas_para_exibir
+
+        maquina = celula["row_id"]
+        lista, _condicoes = carregar_resultado(resultado["chave"])
+        pontos = lista.loc[lista["MÁQUINA"] == maquina, colunas_para_exibir(lista)]
+
+        cols = [
+            {"name": c, "id": c, "presentation": "markdown"} if c == "LINK DO SPOT"
+            else {"name": c, "id": c}
+            for c in pontos.columns
+        ]
+        return pontos.to_dict("records"), cols, f"{maquina} — {len(pontos)} pontos"
+
+    # ======================================================
+    # SIMULAÇÃO DE LIMITES
+    # ======================================================
+
+    @app.callback(
+        Output("tabela-simulacao", "data"),
+        Output("tabela-simulacao", "columns"),
+        Output("resultado-simulacao", "children"),
+        Input("btn-simular", "n_clicks"),
+        State("grade-dias-coleta", "value"),
+        State("grade-dias-alarmes", "value"),
+        State("grade-dias-insights", "value"),
+        State("grade-dias-notas", "value"),
+        State("faixa-simulacao", "value"),
+        State("df-base", "data"),
+        State("filtros-aplicados", "data"),
+        State("dias-coleta-atualizada", "value"),
+        prevent_initial_call=True,
+    )
+    def simular_limites(n_clicks, g_coleta, g_alarmes, g_insights, g_notas,
+                        faixa, data, filtros_aplicados, dias_coleta):
+        if not data:
+            raise PreventUpdate
+
+        if dias_coleta is None:
+            dias_coleta = DEFAULT_DIAS_COLETA
+
+        try:
+            grade = {
+                "dias_coleta": valores_grade(g_coleta),
+                "dias_alarmes": valores_grade(g_alarmes),
+                "dias_insights": valores_grade(g_insights),
+                "dias_notas": valores_grade(g_notas),
+            }
+        except ValueError:
+            return [], [], html.Div("❌ Use apenas números separados por vírgula.", style={"color": "red"})
+
+        from indicadores import indicadores_do_dataset, varrer_limites, escolher_configuracao, MAX_CONFIGURACOES_VARREDURA
+
+        n_configuracoes = 1
+        for valores in grade.values():
+            n_configuracoes *= max(len(valores), 1)
+        if n_configuracoes > MAX_CONFIGURACOES_VARREDURA:
+            return [], [], html.Div(
+                f"❌ {n_configuracoes} combinações: reduza a grade para no máximo {MAX_CONFIGURACOES_VARREDURA}.",
+                style={"color": "red"},
+            )
+
+        from pipeline import config_por_analista_de_filtros
+
+        indicadores = indicadores_do_dataset(data["dataset_id"])
+        config_por_analista = config_por_analista_de_filtros(filtros_aplicados, indicadores["analistas"])
+        varredura = varrer_limites(indicadores, config_por_analista, dias_coleta, grade)
+        escolhida = escolher_configuracao(varredura, faixa)
+
+        def formatar(valor):
+            return "atual" if valor is None else f"{valor:g}"
+
+        linhas = []
+        for i, (config, pontos) in enumerate(zip(varredura["configuracoes"], varredura["pontos"])):
+            linha = {
+                "RECOMENDADA": "✔" if i == escolhida else "",
+                "COLETA": formatar(config["dias_coleta"]),
+                "ALARMES": formatar(config["dias_alarmes"]),
+                "INSIGHTS": formatar(config["dias_insights"]),
+                "NOTAS": formatar(config["dias_notas"]),
+            }
+            linha.update(zip(varredura["analistas"], pontos))
+            linha["MÁXIMO"] = max(pontos, default=0)
+            linha["TOTAL"] = sum(pontos)
+            linhas.append(linha)
+
+        colunas = [{"name": c, "id": c} for c in linhas[0]] if linhas else []
+
+        if escolhida is None:
+            resumo = html.Div(
+                f"⚠️ Nenhuma combinação mantém todos os analistas abaixo de {faixa} pontos.",
+                style={"color": "orange"},
+            )
+        else:
+            linha = linhas[escolhida]
+            resumo = html.Div(
+                f"✔ Recomendada: coleta {linha['COLETA']}, alarmes {linha['ALARMES']}, "
+                f"insights {linha['INSIGHTS']}, notas {linha['NOTAS']} — "
+                f"máximo {linha['MÁXIMO']} pontos por analista, {linha['TOTAL']} no total.",
+                style={"color": "green", "fontWeight": "bold"},
+            )
+
+        return linhas, colunas, resumo
 
     # ======================================================
     # DOWNLOAD
@@ -739,11 +894,91 @@ def register_callbacks(app):
         Output("download-excel", "data"),
         Input("btn-download", "n_clicks"),
         State("df-final", "data"),
+        State("upload-lista-anterior", "data"),
+        prevent_initial_call=True,
+    )
+    @perfilavel("download_excel")
+    def download_excel(n, data, arquivo_anterior):
+        if not data:
+            raise PreventUpdate
+
+        from comparacao import comparar_listas
+        from exportacao import gerar_planilha_com_mudancas
+
+        df, _condicoes = carregar_resultado(data["chave"])
+        try:
+            _descricao, anterior = lista_anterior(arquivo_anterior)
+            mudancas = comparar_listas(anterior, df) if anterior is not None else None
+        except Exception:
+            logger.exception("download_excel: erro ao comparar com a lista anterior")
+            mudancas = None
+        planilha = gerar_planilha_com_mudancas(df, mudancas)
+
+        # A lista baixada hoje é a referência da comparação dos próximos dias
+        try:
+            salvar_lista_referencia(df)
+        except OSError:
+            logger.exception("download_excel: erro ao gravar lista de referência")
+        return dcc.send_bytes(planilha, "LISTA_FINAL_PRIORIZADA.xlsx")
+
+    @app.callback(
+        Output("resumo-mudancas", "children"),
+        Output("tabela-mudancas", "data"),
+        Output("tabela-mudancas", "columns"),
+        Output("status-upload-lista-anterior", "children"),
+        Input("df-final", "data"),
+        Input("upload-lista-anterior", "data"),
+    )
+    def comparar_com_anterior(data, arquivo_anterior):
+        status = html.Div(
+            f"✔ {arquivo_anterior['nome']}", style={"color": "green", "fontWeight": "bold"}
+        ) if arquivo_anterior else ""
+        if not data:
+            return "", [], [], status
+
+        from comparacao import comparar_listas, contar_mudancas, COLUNAS_MUDANCAS
+
+        try:
+            descricao, anterior = lista_anterior(arquivo_anterior)
+        except Exception as e:
+            logger.exception("comparar_com_anterior: erro ao ler lista anterior")
+            return html.Div(f"❌ Erro ao ler a lista anterior: {e}", style={"color": "red"}), [], [], status
+        if anterior is None:
+            return html.Div(
+                "Nenhuma lista anterior: baixe o Excel hoje para comparar nos próximos dias, ou envie uma lista.",
+                style={"fontSize": "12px", "color": "#666"},
+            ), [], [], status
+
+        df, _condicoes = carregar_resultado(data["chave"])
+        mudancas = comparar_listas(anterior, df)
+        contagem = contar_mudancas(mudancas)
+        logger.info("comparar_com_anterior: %s: %s", descricao, contagem)
+
+        rotulos = {"NOVO": "novos", "SAIU": "saíram", "ALTERADO": "alterados"}
+        resumo = f"Comparado com {descricao}: " + ", ".join(f"{n} {rotulos[m]}" for m, n in contagem.items())
+        if len(mudancas) > MAX_LINHAS_MUDANCAS:
+            resumo += f" (mostrando {MAX_LINHAS_MUDANCAS} de {len(mudancas)}; todas no Excel)"
+        return (
+            html.Div(resumo, style={"fontWeight": "bold"}),
+            mudancas.head(MAX_LINHAS_MUDANCAS).to_dict("records"),
+            [{"name": c, "id": c} for c in COLUNAS_MUDANCAS],
+            status,
+        )
+
+    @app.callback(
+        Output("download-zip-analistas", "data"),
+        Input("btn-download-analistas", "n_clicks"),
+        State("df-final", "data"),
         prevent_initial_call=True,
     )
-    def download_excel(n, data):
+    def download_por_analista(n, data):
         if not data:
             raise PreventUpdate
 
-        df = pd.DataFrame(data)
-        return dcc.send_data_frame(df.to_excel, "LISTA_FINAL_PRIORIZADA.xlsx", index=False)
+        from exportacao import exportar_por_analista
+
+        # Planilhas e índice saem do mesmo resultado gravado (o botão fica
+        # desligado enquanto as contagens do navegador estão à frente dele)
+        df, _condicoes = carregar_resultado(data["chave"])
+        pacote = exportar_por_analista(df)
+        return dcc.send_bytes(pacote, "LISTA_FINAL_POR_ANALISTA.zip")
@@ -0,0 +1,553 @@
+# carga.py
+# Teste de carga local: sobe o app com gunicorn em cada configuração de workers/threads
+# e repete sessões de coordenadores (uploads, processamento, edições de limite e downloads)
+#
+# Uso:
+#   python carga.py --configuracoes 1x4,2x4,4x4 --usuarios 1,4,8 --maquinas 2000
+#   python carga.py --configuracoes 4x4 --usuarios 8 --sessoes 3 --json carga.json
+#
+# Cada configuração "WxT" sobe `gunicorn app:app --workers W --threads T` (gthread,
+# como no Procfile) numa porta local, com uma pasta de dados própria. Os dados de
+# entrada são sintéticos, gerados uma vez por execução. As chamadas são os mesmos
+# POST /_dash-update-component que o navegador faz, montados a partir de
+# /_dash-dependencies; os callbacks de navegador (clientside) não vão ao servidor
+# e por isso não entram na sequência.
+#
+# Para cada configuração e quantidade de usuários simultâneos, o relatório mostra
+# percentis de latência por etapa, vazão (sessões/min e chamadas/s), erros e o pico
+# de memória (RSS) por worker e no total.
+
+import argparse
+import gzip
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+
+from parametros import DEFAULT_DIAS_COLETA
+
+PASTA_APP = os.path.dirname(os.path.abspath(__file__))
+
+# Mesmo tamanho de parte e mesmos nomes de arquivo do navegador
+TAMANHO_PARTE = 4 * 1024 * 1024
+ARQUIVOS_UPLOAD = {
+    "upload-base": "BASE",
+    "upload-mosaic": "MOSAIC",
+    "upload-notas": "NOTAS",
+    "upload-ordem-notas": "ORDEM_NOTAS",
+    "upload-ordem-planos": "ORDEM_PLANOS",
+    "upload-insights": "INSIGHTS",
+}
+
+ANALISTAS_SINTETICOS = ["ANA", "BRUNO", "CARLA", "DIEGO", "EDUARDO", "FERNANDA"]
+PERCENTIS = [50, 90, 99]
+INTERVALO_MEMORIA = 0.5
+
+
+# ======================================================
+# DADOS SINTÉTICOS
+# ======================================================
+
+def gerar_dados(pasta: str, n_maquinas: int, formato: str = "xlsx", semente: int = 0) -> dict:
+    """
+    Gera os seis arquivos de entrada com o formato das exportações reais
+    (o mosaic sempre em .csv). Retorna {id do upload: caminho}.
+    """
+    rng = np.random.default_rng(semente)
+    agora = datetime.now(timezone.utc)
+    os.makedirs(pasta, exist_ok=True)
+
+    def iso(dias):
+        return (agora - timedelta(days=int(dias))).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+    linhas = []
+    for m in range(n_maquinas):
+        maquina = f"MAQ-{m:05d}"
+        analista = ANALISTAS_SINTETICOS[m % len(ANALISTAS_SINTETICOS)]
+        for s in range(int(rng.integers(1, 6))):
+            linhas.append({
+                "MÁQUINA": maquina,
+                "SUBCONJUNTO": f"{maquina}-SUB{s % 3}",
+                "SPOT ID": f"spot{len(linhas):08x}",
+                "SPOT NAME": f"P{s}",
+                "ANALISTA RESPONSÁVEL": analista if rng.random() > 0.01 else None,
+            })
+    base = pd.DataFrame(linhas)
+
+    mosaic = []
+    for spot in base["SPOT ID"]:
+        if rng.random() < 0.1:
+            continue
+        status = rng.choice(["a1", "a2", "no-alert"])
+        sync = iso(rng.integers(0, 20)) if rng.random() > 0.05 else "-"
+        for _ in range(int(rng.integers(1, 3))):
+            mosaic.append({
+                "spotId": spot,
+                "status": status,
+                "analysisCreatedAt": iso(rng.integers(0, 40)) if rng.random() > 0.2 else None,
+                "analysisStatus": rng.choice(["a1", "a2", "no-alert", None]),
+                "spotLastSync": sync,
+            })
+
+    notas, ordens = [], []
+    ordem = 4000000
+    for subconjunto in base["SUBCONJUNTO"].unique():
+        for _ in range(int(rng.integers(0, 3))):
+            ordem += 1
+            conclusao = datetime.now() + timedelta(days=int(rng.integers(-40, 10)))
+            notas.append({
+                "Local de instalação": subconjunto,
+                "Ordem": float(ordem) if rng.random() > 0.3 else np.nan,
+                "Nota": 1000000 + ordem,
+                "Conclusão desejada": conclusao.strftime("%d.%m.%Y"),
+            })
+            ordens.append({
+                "Ordem": str(ordem),
+                "Status do sistema": rng.choice(["LIB CONF", "ABER", "ENTE CONF PARC", "LIB"]),
+            })
+
+    planos = pd.DataFrame({
+        "Local de instalação": [f"MAQ-{m:05d}" for m in range(0, n_maquinas, 3)],
+        "Ordem": [5000000 + m for m in range(0, n_maquinas, 3)],
+        "Status do sistema": "LIB",
+    })
+    insights = pd.DataFrame({"Máquinas": [f"MAQ-{m:05d}" for m in range(0, n_maquinas, 5)] + ["See more (3)"]})
+
+    tabelas = {
+        "upload-base": base,
+        "upload-mosaic": pd.DataFrame(mosaic),
+        "upload-notas": pd.DataFrame(notas),
+        "upload-ordem-notas": pd.DataFrame(ordens),
+        "upload-ordem-planos": planos,
+        "upload-insights": insights,
+    }
+    caminhos = {}
+    for destino, tabela in tabelas.items():
+        extensao = "csv" if destino == "upload-mosaic" or formato == "csv" else "xlsx"
+        caminho = os.path.join(pasta, f"{ARQUIVOS_UPLOAD[destino]}.{extensao}")
+        if extensao == "csv":
+            tabela.to_csv(caminho, index=False)
+        else:
+            tabela.to_excel(caminho, index=False)
+        caminhos[destino] = caminho
+    return caminhos
+
+
+# ======================================================
+# SERVIDOR (GUNICORN) E MEMÓRIA
+# ======================================================
+
+def _processos_filhos() -> dict:
+    """Mapa pid -> filhos diretos, lido de /proc."""
+    filhos = {}
+    for nome in os.listdir("/proc"):
+        if not nome.isdigit():
+            continue
+        try:
+            with open(f"/proc/{nome}/stat") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        filhos.setdefault(ppid, []).append(int(nome))
+    return filhos
+
+
+def _rss_mb(pid: int) -> float:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for linha in f:
+                if linha.startswith("VmRSS:"):
+                    return int(linha.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+
+class MonitorMemoria:
+    """
+    Amostra o RSS do gunicorn em segundo plano: pico de cada worker (com os
+    processos que ele criar, ex.: pool da exportação) e pico do total.
+    """
+
+    def __init__(self, pid_mestre: int):
+        self.pid_mestre = pid_mestre
+        self.pico_worker = 0.0
+        self.pico_total = 0.0
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._amostrar, daemon=True)
+
+    def _amostrar(self):
+        while not self._parar.wait(INTERVALO_MEMORIA):
+            filhos = _processos_filhos()
+
+            def arvore(pid):
+                return _rss_mb(pid) + sum(arvore(f) for f in filhos.get(pid, []))
+
+            workers = [arvore(pid) for pid in filhos.get(self.pid_mestre, [])]
+            self.pico_worker = max([self.pico_worker] + workers)
+            self.pico_total = max(self.pico_total, _rss_mb(self.pid_mestre) + sum(workers))
+
+    def __enter__(self):
+        if os.path.isdir("/proc"):
+            self._thread.start()
+        return self
+
+    def __exit__(self, *_):
+        self._parar.set()
+
+
+def subir_servidor(workers: int, threads: int, porta: int, dir_dados: str, timeout: float = 120):
+    """Sobe o gunicorn com as opções do Procfile e espera o app responder."""
+    comando = [
+        sys.executable, "-m", "gunicorn", "app:app",
+        "--bind", f"127.0.0.1:{porta}",
+        "--workers", str(workers), "--threads", str(threads),
+        "--worker-class", "gthread", "--timeout", "1800", "--keep-alive", "5",
+    ]
+    ambiente = {**os.environ, "PRIORIZACAO_DIR_DADOS": dir_dados}
+    caminho_log = os.path.join(dir_dados, "gunicorn.log")
+    with open(caminho_log, "wb") as log:
+        processo = subprocess.Popen(comando, cwd=PASTA_APP, env=ambiente, stdout=log, stderr=subprocess.STDOUT)
+
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        if processo.poll() is not None:
+            raise RuntimeError(f"gunicorn terminou ao iniciar (veja {caminho_log})")
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{porta}/_dash-dependencies", timeout=5) as resposta:
+                if resposta.status == 200:
+                    return processo
+        except OSError:
+            time.sleep(0.5)
+    processo.terminate()
+    raise RuntimeError(f"app não respondeu em {timeout:.0f}s (veja {caminho_log})")
+
+
+def parar_servidor(processo):
+    processo.terminate()
+    try:
+        processo.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        processo.kill()
+        processo.wait()
+
+
+# ======================================================
+# CHAMADAS DE CALLBACK (_dash-update-component)
+# ======================================================
+
+class ErroChamada(Exception):
+    """Resposta HTTP inesperada numa etapa da sessão."""
+
+
+class Cliente:
+    """Faz as requisições de uma sessão e registra a latência de cada etapa."""
+
+    def __init__(self, url: str, dependencias: list, latencias: dict, lock: threading.Lock):
+        self.url = url
+        self.dependencias = dependencias
+        self.latencias = latencias
+        self.lock = lock
+
+    def _requisitar(self, etapa: str, caminho: str, corpo: bytes = None, metodo: str = "POST",
+                    cabecalhos: dict = None):
+        requisicao = urllib.request.Request(
+            self.url + caminho, data=corpo, method=metodo, headers=cabecalhos or {}
+        )
+        inicio = time.perf_counter()
+        try:
+            with urllib.request.urlopen(requisicao, timeout=1800) as resposta:
+                conteudo = resposta.read()
+                status = resposta.status
+        except urllib.error.HTTPError as e:
+            conteudo, status = e.read(), e.code
+        duracao = time.perf_counter() - inicio
+
+        with self.lock:
+            self.latencias.setdefault(etapa, []).append(duracao)
+        if status >= 400:
+            raise ErroChamada(f"{etapa}: HTTP {status} {conteudo[:200]!r}")
+        return status, conteudo
+
+    def enviar_arquivo(self, caminho: str) -> dict:
+        """Mesmo protocolo de assets/uploads.js: partes gzip e conclusão."""
+        upload_id = uuid.uuid4().hex
+        with open(caminho, "rb") as f:
+            conteudo = f.read()
+        offset = 0
+        while True:
+            parte = conteudo[offset:offset + TAMANHO_PARTE]
+            self._requisitar(
+                "upload (parte)", f"/api/uploads/{upload_id}/partes?offset={offset}", gzip.compress(parte),
+                "PUT", {"Content-Type": "application/octet-stream", "Content-Encoding": "gzip"},
+            )
+            offset += len(parte)
+            if offset >= len(conteudo):
+                break
+        _, resposta = self._requisitar(
+            "upload (concluir)", f"/api/uploads/{upload_id}/concluir",
+            json.dumps({"nome": os.path.basename(caminho), "tamanho": len(conteudo)}).encode(),
+            cabecalhos={"Content-Type": "application/json"},
+        )
+        return json.loads(resposta)
+
+    def chamar(self, etapa: str, saida: str, entrada: str, valores: dict, padroes: dict = None) -> dict:
+        """
+        Dispara o callback cuja saída inclui 'saida' e cujo primeiro Input é
+        'entrada', com os valores atuais dos componentes ("id.prop" -> valor).
+        Retorna {"id.prop": valor} das saídas atualizadas ({} em PreventUpdate).
+        """
+        dependencia = encontrar_dependencia(self.dependencias, saida, entrada)
+        corpo = montar_payload(dependencia, valores, entrada, padroes or {})
+        status, resposta = self._requisitar(
+            etapa, "/_dash-update-component", json.dumps(corpo).encode(),
+            cabecalhos={"Content-Type": "application/json"},
+        )
+        if status == 204:
+            return {}
+        return {
+            f"{id_}.{prop}": valor
+            for id_, props in json.loads(resposta)["response"].items()
+            for prop, valor in props.items()
+        }
+
+
+def _nomes_saidas(dependencia: dict) -> list:
+    texto = dependencia["output"]
+    partes = texto[2:-2].split("...") if texto.startswith("..") else [texto]
+    return [parte.rsplit(".", 1) for parte in partes]
+
+
+def encontrar_dependencia(dependencias: list, saida: str, entrada: str) -> dict:
+    for dependencia in dependencias:
+        if dependencia.get("clientside_function"):
+            continue
+        # Saídas com ALL são identificadas pelo "type" do id (ex.: previa-analista.children)
+        saidas = [
+            f"{json.loads(id_)['type'] if id_.startswith('{') else id_}.{prop.split('@')[0]}"
+            for id_, prop in _nomes_saidas(dependencia)
+        ]
+        primeira = dependencia["inputs"][0]
+        if saida in saidas and f"{primeira['id']}.{primeira['property']}" == entrada:
+            return dependencia
+    raise KeyError(f"callback com saída {saida} e entrada {entrada} não encontrado")
+
+
+def _concretos(id_texto: str, padroes: dict) -> list:
+    """Ids concretos de um id com ALL (ex.: um por analista)."""
+    return padroes[json.loads(id_texto)["type"]]
+
+
+def montar_payload(dependencia: dict, valores: dict, disparado: str, padroes: dict) -> dict:
+    """Corpo do POST /_dash-update-component no formato do dash-renderer."""
+
+    def item(espec):
+        chave = f"{espec['id']}.{espec['property']}"
+        if espec["id"].startswith("{"):
+            return [
+                {"id": id_, "property": espec["property"],
+                 "value": id_ if espec["property"] == "id" else valores.get(chave)}
+                for id_ in _concretos(espec["id"], padroes)
+            ]
+        return {"id": espec["id"], "property": espec["property"], "value": valores.get(chave)}
+
+    saidas = [
+        [{"id": id_concreto, "property": prop} for id_concreto in _concretos(id_, padroes)]
+        if id_.startswith("{") else {"id": id_, "property": prop}
+        for id_, prop in _nomes_saidas(dependencia)
+    ]
+    corpo = {
+        "output": dependencia["output"],
+        "outputs": saidas if dependencia["output"].startswith("..") else saidas[0],
+        "inputs": [item(espec) for espec in dependencia["inputs"]],
+        "changedPropIds": [disparado],
+    }
+    if dependencia.get("state"):
+        corpo["state"] = [item(espec) for espec in dependencia["state"]]
+    return corpo
+
+
+# ======================================================
+# SESSÃO DE UM COORDENADOR
+# ======================================================
+
+def sessao_coordenador(cliente: Cliente, arquivos: dict, edicoes: int, semente: int):
+    """
+    Sequência de um coordenador no app: envia os seis arquivos, processa a
+    base, recebe filtros e histogramas, avalia as regras, exibe a lista, faz
+    'edicoes' mudanças de limite (prévia + regras + lista) e baixa o Excel e
+    o zip por analista.
+    """
+    rng = np.random.default_rng(semente)
+    valores = {"dias-coleta-atualizada.value": DEFAULT_DIAS_COLETA, "top-k-maquinas.value": None,
+               "modo-visualizacao.value": "lista", "sessao-id.data": uuid.uuid4().hex}
+
+    for destino, caminho in arquivos.items():
+        valores[f"{destino}.data"] = cliente.enviar_arquivo(caminho)
+
+    valores["btn-processar-uploads.n_clicks"] = 1
+    valores.update(cliente.chamar("processar_base", "df-base.data", "btn-processar-uploads.n_clicks", valores))
+    valores.update(cliente.chamar("gerar_filtros_analistas", "filtros-por-analista.data", "df-base.data", valores))
+    valores["filtros-aplicados.data"] = valores["filtros-por-analista.data"]
+    cliente.chamar("histogramas", "histogramas-analista.data", "df-base.data", valores)
+
+    def avaliar(sufixo):
+        valores["geracao-avaliacao.data"] = int(time.time() * 1000)
+        valores.update(cliente.chamar(f"aplicar_regras{sufixo}", "df-final.data", "geracao-avaliacao.data", valores))
+        cliente.chamar(f"exibir_resultado{sufixo}", "tabela-final.data", "df-final.data", valores)
+
+    avaliar("")
+
+    analistas = sorted(valores["filtros-por-analista.data"])
+    padroes = {"previa-analista": [{"analista": a, "type": "previa-analista"} for a in analistas]}
+    for _ in range(edicoes):
+        analista = analistas[int(rng.integers(len(analistas)))]
+        filtros = {**valores["filtros-por-analista.data"]}
+        filtros[analista] = {**filtros[analista], "dias_alarmes": int(rng.integers(5, 40))}
+        valores["filtros-por-analista.data"] = valores["filtros-aplicados.data"] = filtros
+        cliente.chamar("previa_impacto (edição)", "previa-analista.children", "filtros-por-analista.data", valores, padroes)
+        avaliar(" (edição)")
+
+    valores["btn-download.n_clicks"] = valores["btn-download-analistas.n_clicks"] = 1
+    cliente.chamar("download_excel", "download-excel.data", "btn-download.n_clicks", valores)
+    cliente.chamar("download_por_analista", "download-zip-analistas.data", "btn-download-analistas.n_clicks", valores)
+
+
+# ======================================================
+# EXECUÇÃO E RELATÓRIO
+# ======================================================
+
+def executar_rodada(url: str, arquivos: dict, usuarios: int, sessoes: int, edicoes: int) -> dict:
+    """'usuarios' coordenadores simultâneos, cada um com 'sessoes' sessões seguidas."""
+    with urllib.request.urlopen(f"{url}/_dash-dependencies") as resposta:
+        dependencias = json.loads(resposta.read())
+    latencias, lock, erros = {}, threading.Lock(), []
+
+    def usuario(u):
+        cliente = Cliente(url, dependencias, latencias, lock)
+        for s in range(sessoes):
+            try:
+                sessao_coordenador(cliente, arquivos, edicoes, semente=u * 1000 + s)
+            except (ErroChamada, KeyError, OSError) as e:
+                with lock:
+                    erros.append(f"{type(e).__name__}: {e}")
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=usuarios) as executor:
+        list(executor.map(usuario, range(usuarios)))
+    duracao = time.perf_counter() - inicio
+
+    chamadas = sum(len(v) for v in latencias.values())
+    return {
+        "usuarios": usuarios,
+        "segundos": round(duracao, 2),
+        "sessoes_por_minuto": round(60 * (usuarios * sessoes - len(erros)) / duracao, 2),
+        "chamadas_por_segundo": round(chamadas / duracao, 2),
+        "erros": erros,
+        "latencias": {
+            etapa: {
+                "n": len(valores),
+                **{f"p{p}": round(float(np.percentile(valores, p)), 3) for p in PERCENTIS},
+                "max": round(max(valores), 3),
+            }
+            for etapa, valores in latencias.items()
+        },
+    }
+
+
+def imprimir_rodada(configuracao: str, rodada: dict):
+    print(
+        f"\n=== {configuracao} | {rodada['usuarios']} usuário(s) | {rodada['segundos']}s | "
+        f"{rodada['sessoes_por_minuto']} sessões/min | {rodada['chamadas_por_segundo']} chamadas/s | "
+        f"RSS máx worker {rodada['rss_worker_mb']:.0f} MB, total {rodada['rss_total_mb']:.0f} MB | "
+        f"erros {len(rodada['erros'])}"
+    )
+    print(f"    {'etapa':<34}{'n':>6}" + "".join(f"{'p' + str(p):>9}" for p in PERCENTIS) + f"{'max':>9}")
+    for etapa, estatisticas in rodada["latencias"].items():
+        print(
+            f"    {etapa:<34}{estatisticas['n']:>6}"
+            + "".join(f"{estatisticas[f'p{p}']:>9.3f}" for p in PERCENTIS)
+            + f"{estatisticas['max']:>9.3f}"
+        )
+    for erro in rodada["erros"][:5]:
+        print(f"    ERRO {erro}", file=sys.stderr)
+
+
+def _configuracao(texto: str):
+    workers, _, threads = texto.lower().partition("x")
+    return int(workers), int(threads or 1)
+
+
+def montar_argumentos():
+    parser = argparse.ArgumentParser(
+        description="Teste de carga local dos callbacks do app em várias configurações do gunicorn."
+    )
+    parser.add_argument("--configuracoes", default="1x4,2x4,4x4",
+                        help="Lista de WORKERSxTHREADS separada por vírgula (ex.: 1x4,2x4,4x4)")
+    parser.add_argument("--usuarios", default="1,4,8",
+                        help="Quantidades de coordenadores simultâneos (ex.: 1,4,8)")
+    parser.add_argument("--sessoes", type=int, default=1, help="Sessões seguidas por usuário em cada rodada")
+    parser.add_argument("--edicoes", type=int, default=5, help="Edições de limite por sessão")
+    parser.add_argument("--maquinas", type=int, default=2000, help="Máquinas nos dados sintéticos")
+    parser.add_argument("--formato", choices=["xlsx", "csv"], default="xlsx",
+                        help="Formato dos arquivos sintéticos (o mosaic é sempre .csv)")
+    parser.add_argument("--porta", type=int, default=8765, help="Porta local do gunicorn")
+    parser.add_argument("--json", help="Grava os resultados completos neste arquivo")
+    return parser
+
+
+def main(argv=None) -> int:
+    args = montar_argumentos().parse_args(argv)
+    configuracoes = [_configuracao(c) for c in args.configuracoes.split(",") if c.strip()]
+    niveis = [int(u) for u in args.usuarios.split(",") if u.strip()]
+
+    pasta = tempfile.mkdtemp(prefix="carga-")
+    resultados = []
+    try:
+        inicio = time.perf_counter()
+        arquivos = gerar_dados(os.path.join(pasta, "entrada"), args.maquinas, args.formato)
+        print(f"Dados sintéticos: {args.maquinas} máquinas em {time.perf_counter() - inicio:.1f}s ({pasta})")
+
+        for workers, threads in configuracoes:
+            rotulo = f"{workers}x{threads}"
+            dir_dados = os.path.join(pasta, f"dados-{rotulo}")
+            os.makedirs(dir_dados)
+            url = f"http://127.0.0.1:{args.porta}"
+            processo = subir_servidor(workers, threads, args.porta, dir_dados)
+            try:
+                # Aquecimento (imports e caches de cada worker) fora da medição
+                executar_rodada(url, arquivos, workers, 1, 0)
+                for usuarios in niveis:
+                    with MonitorMemoria(processo.pid) as memoria:
+                        rodada = executar_rodada(url, arquivos, usuarios, args.sessoes, args.edicoes)
+                    rodada.update(
+                        configuracao=rotulo, workers=workers, threads=threads,
+                        rss_worker_mb=round(memoria.pico_worker, 1), rss_total_mb=round(memoria.pico_total, 1),
+                    )
+                    imprimir_rodada(rotulo, rodada)
+                    resultados.append(rodada)
+            finally:
+                parar_servidor(processo)
+    finally:
+        shutil.rmtree(pasta, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, ensure_ascii=False, indent=2)
+    return 1 if any(r["erros"] for r in resultados) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,148 @@
+# comparacao.py
+# Comparação da lista final com uma lista anterior (novos, saíram e alterados) por hash de chave e de conteúdo
+#
+# Cada linha vira dois hashes de 64 bits: o da chave (MÁQUINA, SUBCONJUNTO,
+# SPOTNAME e a ocorrência, para chaves repetidas) e o do conteúdo (badges,
+# status, notas e ordens). As duas listas são cruzadas por um único merge
+# nos hashes da chave; linhas só de um lado saíram ou são novas, e linhas
+# dos dois lados com hash de conteúdo diferente foram alteradas. Só as
+# linhas alteradas são comparadas coluna a coluna (para dizer o que mudou).
+#
+# Os números dos badges ("há 12 dias") mudam todo dia e não contam como
+# alteração; PRIORIDADE, coleta e link (com a data do dia na URL) são
+# descartados das duas listas antes da comparação (COLUNAS_IGNORADAS).
+
+import numpy as np
+import pandas as pd
+
+CHAVE_LISTA = ["MÁQUINA", "SUBCONJUNTO", "SPOTNAME"]
+
+COLUNAS_CONTEUDO = [
+    "ANALISTA RESPONSÁVEL",
+    "INPUT",
+    "STATUS DO PONTO DE MONITORAMENTO",
+    "DATA DA ÚLTIMA ANÁLISE",
+    "STATUS DA ÚLTIMA ANÁLISE",
+    "NOTA M4",
+    "ORDEM DA NOTA M4",
+    "DATA DE CONCLUSÃO DESEJADA DA NOTA M4",
+    "STATUS DO SISTEMA DA ORDEM M4",
+    "NÚMERO DA ORDEM DO PLANO AV",
+    "STATUS DO SISTEMA DA ORDEM DO PLANO AV",
+]
+
+# Mudam a cada geração da lista sem que o ponto tenha mudado
+COLUNAS_IGNORADAS = ["LINK DO SPOT", "PRIORIDADE", "DATA DA ÚLTIMA COLETA", "DIAS_DESDE_COLETA"]
+
+# Tipos de mudança, na ordem em que aparecem no resultado
+NOVO = "NOVO"
+SAIU = "SAIU"
+ALTERADO = "ALTERADO"
+MUDANCAS = [NOVO, SAIU, ALTERADO]
+
+COLUNAS_MUDANCAS = [
+    "MUDANÇA", *CHAVE_LISTA, "ANALISTA RESPONSÁVEL",
+    "INPUT ANTERIOR", "INPUT ATUAL", "COLUNAS ALTERADAS",
+]
+
+
+def _como_texto(df: pd.DataFrame, colunas: list) -> pd.DataFrame:
+    """
+    Colunas como texto ("" para vazio ou ausente), para que uma lista lida
+    do Excel (SPOTNAME numérico, datas) compare igual à gravada no servidor.
+    """
+    texto = {}
+    for coluna in colunas:
+        if coluna not in df.columns:
+            texto[coluna] = np.full(len(df), "", dtype=object)
+            continue
+        valores = df[coluna]
+        como_texto = valores.astype(str)
+        if pd.api.types.is_float_dtype(valores.dtype):
+            # Números lidos do Excel como float (coluna com vazios): 5000000.0 -> 5000000
+            como_texto = como_texto.str.replace(r"\.0$", "", regex=True)
+        texto[coluna] = como_texto.where(valores.notna(), "").to_numpy(dtype=object)
+    return pd.DataFrame(texto, index=pd.RangeIndex(len(df)))
+
+
+def hashes_da_lista(df: pd.DataFrame):
+    """
+    (texto, hash da chave, hash do conteúdo) de cada linha da lista. A
+    ocorrência entra na chave, então pontos repetidos casam na ordem. No
+    texto, os números dos badges viram '#'.
+    """
+    texto = _como_texto(df, CHAVE_LISTA + COLUNAS_CONTEUDO)
+    texto["INPUT"] = texto["INPUT"].str.replace(r"\d+", "#", regex=True)
+    chave = pd.util.hash_pandas_object(texto[CHAVE_LISTA], index=False)
+    ocorrencia = chave.groupby(chave.to_numpy(), sort=False).cumcount()
+    chave = pd.util.hash_pandas_object(
+        pd.DataFrame({"chave": chave.to_numpy(), "ocorrencia": ocorrencia.to_numpy()}), index=False
+    ).to_numpy()
+    conteudo = pd.util.hash_pandas_object(texto[COLUNAS_CONTEUDO], index=False).to_numpy()
+    return texto, chave, conteudo
+
+
+def _colunas_alteradas(anterior: pd.DataFrame, atual: pd.DataFrame) -> np.ndarray:
+    """Nomes das colunas de conteúdo que diferem, linha a linha (textos alinhados)."""
+    alteradas = np.full(len(atual), "", dtype=object)
+    for coluna in COLUNAS_CONTEUDO:
+        difere = anterior[coluna].to_numpy() != atual[coluna].to_numpy()
+        alteradas[difere] = alteradas[difere] + coluna + ", "
+    return pd.Series(alteradas, dtype=object).str[:-2].to_numpy(dtype=object)
+
+
+def comparar_listas(anterior: pd.DataFrame, atual: pd.DataFrame) -> pd.DataFrame:
+    """
+    Linhas novas, que saíram e alteradas da lista atual em relação à
+    anterior (colunas COLUNAS_MUDANCAS). NOVO e ALTERADO trazem os valores
+    atuais; SAIU, os da lista anterior. As COLUNAS_IGNORADAS não entram
+    na comparação, estejam ou não nas listas.
+    """
+    anterior = anterior.drop(columns=COLUNAS_IGNORADAS, errors="ignore")
+    atual = atual.drop(columns=COLUNAS_IGNORADAS, errors="ignore")
+    texto_anterior, chave_anterior, conteudo_anterior = hashes_da_lista(anterior)
+    texto_atual, chave_atual, conteudo_atual = hashes_da_lista(atual)
+
+    cruzado = pd.DataFrame({
+        "chave": chave_anterior, "conteudo": conteudo_anterior, "posicao": np.arange(len(anterior)),
+    }).merge(
+        pd.DataFrame({"chave": chave_atual, "conteudo": conteudo_atual, "posicao": np.arange(len(atual))}),
+        on="chave", how="outer", suffixes=("_anterior", "_atual"), indicator=True, sort=False,
+    )
+    lado = cruzado["_merge"].to_numpy()
+    saiu = cruzado.loc[lado == "left_only", "posicao_anterior"].to_numpy(dtype=np.int64)
+    novo = cruzado.loc[lado == "right_only", "posicao_atual"].to_numpy(dtype=np.int64)
+    ambos = cruzado[(lado == "both") & (cruzado["conteudo_anterior"] != cruzado["conteudo_atual"]).to_numpy()]
+    alterado_anterior = ambos["posicao_anterior"].to_numpy(dtype=np.int64)
+    alterado_atual = ambos["posicao_atual"].to_numpy(dtype=np.int64)
+
+    def linhas(texto, posicoes, mudanca, input_anterior, input_atual, alteradas):
+        parte = texto.iloc[posicoes]
+        linhas = pd.DataFrame({
+            "MUDANÇA": mudanca,
+            **{coluna: parte[coluna].to_numpy() for coluna in CHAVE_LISTA},
+            "ANALISTA RESPONSÁVEL": parte["ANALISTA RESPONSÁVEL"].to_numpy(),
+            "INPUT ANTERIOR": input_anterior,
+            "INPUT ATUAL": input_atual,
+            "COLUNAS ALTERADAS": alteradas,
+        })
+        return linhas.sort_values(CHAVE_LISTA, kind="stable")
+
+    # Os badges vêm das listas originais (com os dias), não do texto comparado
+    input_anterior = _como_texto(anterior, ["INPUT"])["INPUT"].to_numpy(dtype=object)
+    input_atual = _como_texto(atual, ["INPUT"])["INPUT"].to_numpy(dtype=object)
+
+    return pd.concat([
+        linhas(texto_atual, novo, NOVO, "", input_atual[novo], ""),
+        linhas(texto_anterior, saiu, SAIU, input_anterior[saiu], "", ""),
+        linhas(
+            texto_atual, alterado_atual, ALTERADO, input_anterior[alterado_anterior], input_atual[alterado_atual],
+            _colunas_alteradas(texto_anterior.iloc[alterado_anterior], texto_atual.iloc[alterado_atual]),
+        ),
+    ], ignore_index=True)[COLUNAS_MUDANCAS]
+
+
+def contar_mudancas(mudancas: pd.DataFrame) -> dict:
+    """{NOVO: n, SAIU: n, ALTERADO: n}."""
+    contagem = mudancas["MUDANÇA"].value_counts()
+    return {mudanca: int(contagem.get(mudanca, 0)) for mudanca in MUDANCAS}
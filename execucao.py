@@ -0,0 +1,172 @@
+# execucao.py
+# Backends de execução das etapas de cruzamento (pandas ou Arrow compute)
+#
+# As etapas de processar_base são sempre as mesmas duas operações:
+#   - mapear_concatenado: agrupa uma tabela auxiliar por chave, concatena os
+#     valores únicos (na ordem em que aparecem) com ' | ' e mapeia o texto
+#     de cada grupo para as chaves da base (mosaic, notas e planos);
+#   - status_das_ordens: explode as ordens da nota, cruza com ordem_notas e
+#     reagrupa os status por linha da base. Retorna também a cobertura do
+#     cruzamento (ordens sem status, ver helpers.resumir_cobertura).
+# Cada backend implementa as duas com o mesmo resultado; o pipeline escolhe
+# o backend pelo nome (parametros.BACKEND_PROCESSAMENTO ou argumento).
+
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from helpers import concat_values, resolver_status_ordem, resumir_cobertura
+from parametros import BACKEND_PROCESSAMENTO
+
+SEPARADOR = " | "
+
+Backend = namedtuple("Backend", ["nome", "mapear_concatenado", "status_das_ordens"])
+
+
+# ======================================================
+# PANDAS (REFERÊNCIA)
+# ======================================================
+
+def mapear_concatenado_pandas(chaves: pd.Series, tabela: pd.DataFrame, chave: str, colunas: dict) -> pd.DataFrame:
+    """
+    Para cada coluna da tabela (colunas = {coluna da tabela: coluna de saída}),
+    concatena os valores do grupo de cada chave e mapeia para 'chaves'.
+    Chaves sem grupo ficam NaN; grupos só com nulos viram "".
+    """
+    grupos = tabela.groupby(chave)
+    return pd.DataFrame(
+        {saida: chaves.map(grupos[coluna].apply(concat_values)) for coluna, saida in colunas.items()},
+        index=chaves.index,
+    )
+
+
+def status_das_ordens_pandas(ordens: pd.Series, ordem_notas: pd.DataFrame):
+    return resolver_status_ordem(ordens.to_frame("ORDEM DA NOTA M4"), ordem_notas)
+
+
+# ======================================================
+# ARROW COMPUTE
+# ======================================================
+
+def _aceita_arrow(serie: pd.Series) -> bool:
+    """
+    Datas e intervalos ficam no pandas: o astype(str) deles depende do
+    conjunto de valores (ex.: só data quando todas são meia-noite), então
+    o texto de um grupo não pode ser gerado fora do groupby.
+    """
+    return not (pd.api.types.is_datetime64_any_dtype(serie.dtype)
+                or pd.api.types.is_timedelta64_dtype(serie.dtype))
+
+
+def chave_texto(serie: pd.Series) -> bool:
+    return pd.api.types.infer_dtype(serie, skipna=True) in ("string", "empty")
+
+
+def como_texto(serie: pd.Series) -> pa.Array:
+    """Mesmo texto do astype(str) de concat_values; nulos continuam nulos."""
+    nulos = serie.isna().to_numpy()
+    texto = serie.astype(str).to_numpy(dtype=object)
+    return pa.array(texto, type=pa.string(), mask=nulos)
+
+
+def concatenar_por_chave(chaves: pa.Array, valores: pa.Array):
+    """
+    Versão Arrow do groupby(...).apply(concat_values): retorna as chaves
+    (não nulas) e o texto de cada uma, com os valores únicos na ordem em
+    que aparecem. Chaves só com valores nulos recebem "".
+    """
+    todas = pc.unique(chaves.drop_null())
+    tabela = pa.table({"chave": chaves, "valor": valores, "linha": np.arange(len(chaves))})
+    tabela = tabela.filter(pc.and_(pc.is_valid(tabela["chave"]), pc.is_valid(tabela["valor"])))
+
+    # Primeira ocorrência de cada valor no grupo define a ordem na concatenação
+    primeiros = (
+        tabela.group_by(["chave", "valor"], use_threads=False)
+        .aggregate([("linha", "min")])
+        .sort_by("linha_min")
+    )
+    listas = primeiros.group_by("chave", use_threads=False).aggregate([("valor", "list")])
+    textos = pc.binary_join(listas["valor_list"], SEPARADOR)
+
+    posicao = pc.index_in(todas, value_set=listas["chave"])
+    return todas, pc.fill_null(pc.take(textos, posicao), "")
+
+
+def mapear_concatenado_arrow(chaves: pd.Series, tabela: pd.DataFrame, chave: str, colunas: dict) -> pd.DataFrame:
+    """Mesmo resultado de mapear_concatenado_pandas, com kernels Arrow."""
+    # Chaves não textuais (o map do pandas casa 1 com 1.0) e tabela vazia
+    # (o pandas devolve float) ficam com a referência
+    if tabela.empty or not (chave_texto(chaves) and chave_texto(tabela[chave])):
+        return mapear_concatenado_pandas(chaves, tabela, chave, colunas)
+
+    chaves_tabela = como_texto(tabela[chave])
+    chaves_base = como_texto(chaves)
+    resultado = {}
+    for coluna, saida in colunas.items():
+        if not _aceita_arrow(tabela[coluna]):
+            resultado[saida] = mapear_concatenado_pandas(chaves, tabela, chave, {coluna: saida})[saida]
+            continue
+        grupos, textos = concatenar_por_chave(chaves_tabela, como_texto(tabela[coluna]))
+        posicao = pc.index_in(chaves_base, value_set=grupos)
+        # to_pandas dá o mesmo tipo de texto que o map do pandas (str ou object)
+        resultado[saida] = pc.take(textos, posicao).to_pandas().set_axis(chaves.index)
+    return pd.DataFrame(resultado, index=chaves.index)
+
+
+def status_das_ordens_arrow(ordens: pd.Series, ordem_notas: pd.DataFrame):
+    """Mesmo resultado de resolver_status_ordem, com split/join/agrupamento em Arrow."""
+    if "Status do sistema" not in ordem_notas.columns or not chave_texto(ordens):
+        return status_das_ordens_pandas(ordens, ordem_notas)
+
+    texto = como_texto(ordens)
+    validas = pc.fill_null(pc.not_equal(pc.utf8_trim_whitespace(texto), ""), False)
+    linhas = np.flatnonzero(validas.to_numpy(zero_copy_only=False))
+    if len(linhas) == 0:
+        return pd.Series("", index=ordens.index), resumir_cobertura(0, pd.Series([], dtype=object))
+
+    partes = pc.split_pattern(texto.filter(validas), SEPARADOR)
+    explodidas = pa.table({
+        "linha": linhas[pc.list_parent_indices(partes).to_numpy()],
+        "ordem": pc.utf8_trim_whitespace(pc.list_flatten(partes)),
+        "posicao": np.arange(len(pc.list_flatten(partes))),
+    })
+    status = pa.table({
+        "ordem": como_texto(ordem_notas["Ordem"]),
+        "status": como_texto(ordem_notas["Status do sistema"]),
+        "posicao_status": np.arange(len(ordem_notas)),
+    })
+
+    # Join à esquerda mantendo a ordem do merge do pandas (linha da
+    # esquerda, depois a ordem das repetições em ordem_notas)
+    cruzado = explodidas.join(status, keys="ordem", join_type="left outer", use_threads=False)
+    cruzado = cruzado.sort_by([("posicao", "ascending"), ("posicao_status", "ascending")])
+
+    # Ordens sem par no join (equivale ao left_only do merge do pandas)
+    sem_status = cruzado.filter(pc.is_null(cruzado["posicao_status"]))["ordem"]
+    cobertura = resumir_cobertura(len(explodidas), sem_status.to_pandas())
+
+    grupos, textos = concatenar_por_chave(cruzado["linha"].combine_chunks(), cruzado["status"].combine_chunks())
+    resultado = np.full(len(ordens), "", dtype=object)
+    resultado[grupos.to_numpy()] = textos.to_numpy(zero_copy_only=False)
+    return pd.Series(resultado, index=ordens.index), cobertura
+
+
+# ======================================================
+# REGISTRO
+# ======================================================
+
+BACKENDS = {
+    "pandas": Backend("pandas", mapear_concatenado_pandas, status_das_ordens_pandas),
+    "arrow": Backend("arrow", mapear_concatenado_arrow, status_das_ordens_arrow),
+}
+
+
+def obter_backend(nome: str = None) -> Backend:
+    """Backend pelo nome; sem nome, o configurado em PRIORIZACAO_BACKEND."""
+    nome = (nome or BACKEND_PROCESSAMENTO).lower()
+    if nome not in BACKENDS:
+        raise ValueError(f"Backend de execução desconhecido: '{nome}' (use {', '.join(BACKENDS)})")
+    return BACKENDS[nome]
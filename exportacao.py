@@ -0,0 +1,122 @@
+# exportacao.py
+# Exportação da lista final em um Excel por analista (gerados em paralelo) dentro de um zip
+
+import io
+import multiprocessing
+import os
+import re
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import pandas as pd
+
+# Abaixo disso, gerar as planilhas no próprio processo sai mais barato
+# do que enviar as partes para os workers
+MIN_LINHAS_PARALELO = 20000
+MAX_PROCESSOS_EXPORTACAO = 8
+
+SEM_ANALISTA = "SEM ANALISTA"
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _obter_executor() -> ProcessPoolExecutor:
+    """
+    Pool de processos criado no primeiro uso e reaproveitado. Usa forkserver
+    porque o servidor roda com várias threads (fork de processo com threads
+    não é seguro).
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=min(os.cpu_count() or 1, MAX_PROCESSOS_EXPORTACAO),
+                mp_context=multiprocessing.get_context("forkserver"),
+            )
+        return _executor
+
+
+def _descartar_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+def nome_arquivo_analista(analista: str) -> str:
+    return re.sub(r"[^\w\- ]", "_", str(analista)).strip() + ".xlsx"
+
+
+def ordenar_lista(df: pd.DataFrame) -> pd.DataFrame:
+    """Mesma ordem da tela: prioridade (se houver), máquina e ponto."""
+    if "PRIORIDADE" in df.columns:
+        return df.sort_values(
+            ["PRIORIDADE", "MÁQUINA", "SPOTNAME"], ascending=[False, True, True], kind="stable"
+        )
+    return df.sort_values(["MÁQUINA", "SPOTNAME"], kind="stable")
+
+
+def gerar_planilha(parte: pd.DataFrame) -> bytes:
+    """Excel (em memória) com a lista já filtrada de um analista."""
+    saida = io.BytesIO()
+    ordenar_lista(parte).to_excel(saida, sheet_name="LISTA", index=False)
+    return saida.getvalue()
+
+
+def gerar_planilha_com_mudancas(df_final: pd.DataFrame, mudancas: pd.DataFrame = None) -> bytes:
+    """
+    Excel da lista final (primeira aba, como no download simples) e, se
+    houver comparação com uma lista anterior, a aba MUDANÇAS.
+    """
+    saida = io.BytesIO()
+    with pd.ExcelWriter(saida) as planilha:
+        df_final.to_excel(planilha, index=False)
+        if mudancas is not None:
+            mudancas.to_excel(planilha, sheet_name="MUDANÇAS", index=False)
+    return saida.getvalue()
+
+
+def _gerar_indice(partes: dict, arquivos: dict) -> bytes:
+    """Pontos e arquivo de cada analista, contados nas mesmas partes que viram planilhas."""
+    indice = pd.DataFrame({
+        "ANALISTA RESPONSÁVEL": list(partes),
+        "QUANTIDADE DE PONTOS": [len(parte) for parte in partes.values()],
+        "ARQUIVO": [arquivos[analista] for analista in partes],
+    })
+    saida = io.BytesIO()
+    indice.to_excel(saida, sheet_name="INDICE", index=False)
+    return saida.getvalue()
+
+
+def exportar_por_analista(df_final: pd.DataFrame) -> bytes:
+    """
+    Zip com um Excel por "ANALISTA RESPONSÁVEL" e um INDICE.xlsx com a
+    quantidade de pontos de cada um, contada na própria lista (o índice
+    nunca diverge dos arquivos). As planilhas são geradas em paralelo
+    quando a lista é grande o bastante.
+    """
+    analistas = df_final["ANALISTA RESPONSÁVEL"].fillna(SEM_ANALISTA)
+    partes = {analista: parte for analista, parte in df_final.groupby(analistas, sort=True)}
+    arquivos = {analista: nome_arquivo_analista(analista) for analista in partes}
+
+    if len(partes) > 1 and len(df_final) >= MIN_LINHAS_PARALELO:
+        try:
+            planilhas = list(_obter_executor().map(gerar_planilha, partes.values()))
+        except BrokenProcessPool:
+            # Worker morto (ex.: falta de memória): descarta o pool e gera aqui
+            _descartar_executor()
+            planilhas = map(gerar_planilha, partes.values())
+    else:
+        planilhas = map(gerar_planilha, partes.values())
+
+    saida = io.BytesIO()
+    # As planilhas já são zip internamente; recomprimir não ganha nada
+    with zipfile.ZipFile(saida, "w", compression=zipfile.ZIP_STORED) as pacote:
+        for analista, planilha in zip(partes, planilhas):
+            pacote.writestr(arquivos[analista], planilha)
+        pacote.writestr("INDICE.xlsx", _gerar_indice(partes, arquivos))
+    return saida.getvalue()
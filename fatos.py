@@ -0,0 +1,118 @@
+# fatos.py
+# Tabelas de fatos das notas e ordens M4 (uma linha por nota / por ordem), ligadas aos spots por códigos inteiros
+#
+# As colunas NOTA M4, ORDEM DA NOTA M4 e DATA DE CONCLUSÃO DESEJADA DA NOTA M4
+# da base são textos concatenados com ' | ', bons para exibir e ruins para
+# regras: a data de um subconjunto com duas notas não é uma data. Aqui as
+# notas ficam normalizadas, uma linha por nota com o código inteiro do
+# subconjunto (posição em pd.factorize(base["SUBCONJUNTO"])) e a data de
+# conclusão já convertida; as ordens, uma linha por (subconjunto, ordem) com
+# o status. As regras usam só reduções agrupadas dessas tabelas (conclusão
+# mais antiga e ordem com CONF por subconjunto), levadas a cada spot pelo
+# código; os textos concatenados continuam só para exibição.
+
+import logging
+
+import numpy as np
+import pandas as pd
+
+from blocos import TabelaEmBlocos
+from helpers import converter_datas, normalizar_ordem
+
+logger = logging.getLogger(__name__)
+
+# Colunas do arquivo de notas usadas nos fatos
+COLUNAS_NOTAS = ["Local de instalação", "Nota", "Ordem", "Conclusão desejada"]
+
+# Status de ordem executada
+PADRAO_CONF = r"\bCONF\b"
+
+# Colunas da base com as reduções por spot (usadas pelas regras, fora da exibição)
+COLUNA_CONCLUSAO = "CONCLUSÃO MAIS ANTIGA DA NOTA M4"
+COLUNA_CONF = "ORDEM M4 CONF"
+COLUNAS_FATOS = [COLUNA_CONCLUSAO, COLUNA_CONF]
+
+
+def montar_fatos_notas(subconjuntos: pd.Index, notas) -> pd.DataFrame:
+    """
+    Uma linha por nota dos subconjuntos informados (na ordem do arquivo):
+    SUBCONJUNTO (código = posição em 'subconjuntos'), NOTA, ORDEM
+    (normalizada) e CONCLUSAO (datetime64, NaT se vazia ou inválida).
+    Notas de outros subconjuntos são descartadas já na leitura, então uma
+    TabelaEmBlocos é lida em blocos sem carregar o arquivo inteiro.
+    """
+    if isinstance(notas, TabelaEmBlocos):
+        partes = [
+            bloco[bloco["Local de instalação"].isin(subconjuntos)]
+            for bloco in notas.blocos(COLUNAS_NOTAS)
+        ]
+        notas = pd.concat(partes, ignore_index=True) if partes else pd.DataFrame(columns=COLUNAS_NOTAS)
+    else:
+        notas = notas.loc[notas["Local de instalação"].isin(subconjuntos), COLUNAS_NOTAS]
+
+    return pd.DataFrame({
+        "SUBCONJUNTO": subconjuntos.get_indexer(notas["Local de instalação"]).astype(np.int32),
+        "NOTA": notas["Nota"].astype(str).where(notas["Nota"].notna()).to_numpy(),
+        # Sem espaços nas pontas, como as ordens explodidas em resolver_status_ordem
+        "ORDEM": normalizar_ordem(notas["Ordem"]).str.strip().to_numpy(),
+        "CONCLUSAO": converter_datas(notas["Conclusão desejada"]).to_numpy(),
+    })
+
+
+def montar_fatos_ordens(fatos_notas: pd.DataFrame, ordem_notas: pd.DataFrame) -> pd.DataFrame:
+    """
+    Uma linha por (subconjunto, ordem das suas notas, status em ordem_notas).
+    Ordens sem status (ou ordem_notas sem 'Status do sistema') ficam com
+    STATUS nulo.
+    """
+    ordens = fatos_notas.loc[fatos_notas["ORDEM"].notna(), ["SUBCONJUNTO", "ORDEM"]].drop_duplicates()
+    if "Status do sistema" not in ordem_notas.columns:
+        return ordens.assign(STATUS=pd.Series(pd.NA, index=ordens.index, dtype="str")).reset_index(drop=True)
+    status = ordem_notas[["Ordem", "Status do sistema"]].rename(
+        columns={"Ordem": "ORDEM", "Status do sistema": "STATUS"}
+    )
+    return ordens.merge(status.astype({"ORDEM": str}), on="ORDEM", how="left")
+
+
+# ======================================================
+# REDUÇÕES POR SUBCONJUNTO
+# ======================================================
+
+def conclusao_mais_antiga(fatos_notas: pd.DataFrame, n_subconjuntos: int) -> np.ndarray:
+    """Menor data de conclusão das notas de cada subconjunto (NaT sem notas datadas)."""
+    return (
+        fatos_notas.groupby("SUBCONJUNTO")["CONCLUSAO"].min()
+        .reindex(range(n_subconjuntos))
+        .to_numpy()
+    )
+
+
+def tem_ordem_conf(fatos_ordens: pd.DataFrame, n_subconjuntos: int) -> np.ndarray:
+    """Subconjuntos com alguma ordem de status CONF."""
+    conf = fatos_ordens["STATUS"].str.contains(PADRAO_CONF, case=False, na=False, regex=True)
+    resultado = np.zeros(n_subconjuntos, dtype=bool)
+    resultado[fatos_ordens.loc[conf.to_numpy(), "SUBCONJUNTO"].to_numpy()] = True
+    return resultado
+
+
+def reduzir_por_spot(subconjuntos_dos_spots: pd.Series, notas, ordem_notas: pd.DataFrame) -> pd.DataFrame:
+    """
+    Monta os fatos para os subconjuntos dos spots e retorna, alinhado ao
+    índice de subconjuntos_dos_spots, a conclusão mais antiga das notas
+    (COLUNA_CONCLUSAO, datetime64) e se há ordem executada (COLUNA_CONF).
+    Spots sem subconjunto ficam com NaT e False.
+    """
+    codigos, subconjuntos = pd.factorize(subconjuntos_dos_spots)
+    fatos_notas = montar_fatos_notas(pd.Index(subconjuntos), notas)
+    fatos_ordens = montar_fatos_ordens(fatos_notas, ordem_notas)
+    logger.info(
+        "fatos: %d notas e %d ordens para %d subconjuntos", len(fatos_notas), len(fatos_ordens), len(subconjuntos)
+    )
+
+    # A última posição é a sentinela dos spots sem subconjunto (código -1)
+    conclusao = np.append(conclusao_mais_antiga(fatos_notas, len(subconjuntos)), np.datetime64("NaT"))
+    conf = np.append(tem_ordem_conf(fatos_ordens, len(subconjuntos)), False)
+    return pd.DataFrame({
+        COLUNA_CONCLUSAO: conclusao[codigos],
+        COLUNA_CONF: conf[codigos],
+    }, index=subconjuntos_dos_spots.index)
@@ -1,21 +1,23 @@
 # helpers.py
 # Funções auxiliares compartilhadas
 
-import base64
 import io
 from datetime import datetime
 
+import numpy as np
 import pandas as pd
 
 
-def parse_contents(contents: str, filename: str) -> pd.DataFrame:
-    """Decodifica o conteúdo base64 de um upload e retorna um DataFrame."""
-    _content_type, content_string = contents.split(",")
-    decoded = base64.b64decode(content_string)
-
+def ler_tabela(fonte, filename: str) -> pd.DataFrame:
+    """
+    Lê um arquivo .csv ou Excel como DataFrame, a partir do caminho em disco
+    ou do conteúdo bruto (bytes). O formato vem do nome original do arquivo.
+    """
+    if isinstance(fonte, bytes):
+        fonte = io.BytesIO(fonte)
     if filename.endswith(".csv"):
-        return pd.read_csv(io.StringIO(decoded.decode("utf-8")))
-    return pd.read_excel(io.BytesIO(decoded))
+        return pd.read_csv(fonte, encoding="utf-8")
+    return pd.read_excel(fonte)
 
 
 def concat_values(series: pd.Series) -> str:
@@ -24,9 +26,9 @@ def concat_values(series: pd.Series) -> str:
     return " | ".join(vals) if len(vals) > 0 else ""
 
 
-def days_diff(date_str) -> "int | None":
+def converter_data(date_str) -> "pd.Timestamp | None":
     """
-    Calcula diferença em dias entre hoje e uma data.
+    Converte uma data em Timestamp (sem fuso).
     Aceita DD/MM/YYYY, DD.MM.YYYY, YYYY-MM-DD ou Timestamp do pandas.
     Datas inválidas ou vazias retornam None.
     """
@@ -35,7 +37,7 @@ def days_diff(date_str) -> "int | None":
 
     # Se já é Timestamp do pandas, usar diretamente
     if isinstance(date_str, pd.Timestamp):
-        return (datetime.today() - date_str.to_pydatetime().replace(tzinfo=None)).days
+        return date_str.tz_localize(None) if date_str.tzinfo else date_str
 
     date_str_clean = str(date_str).strip()
     
@@ -53,14 +55,37 @@ def days_diff(date_str) -> "int | None":
     if pd.isna(data):
         return None
 
-    return (datetime.today() - data.to_pydatetime().replace(tzinfo=None)).days
+    return data.tz_localize(None) if data.tzinfo else data
 
 
-def days_since_last_sync(datetime_str) -> "int | None":
+def days_diff(date_str) -> "int | None":
+    """
+    Calcula diferença em dias entre hoje e uma data (formatos de
+    converter_data). Datas inválidas ou vazias retornam None.
     """
-    Calcula diferença em dias entre hoje e um timestamp ISO.
+    data = converter_data(date_str)
+    if data is None:
+        return None
+    return (datetime.today() - data.to_pydatetime()).days
+
+
+def converter_datas(datas: pd.Series) -> pd.Series:
+    """converter_data uma vez por valor distinto, como coluna datetime64."""
+    codigos, valores = pd.factorize(datas)
+    convertidas = pd.DatetimeIndex([converter_data(v) for v in valores] + [None])
+    return pd.Series(convertidas[codigos], index=datas.index)
+
+
+def dias_desde(datas: pd.Series) -> pd.Series:
+    """Versão vetorizada de days_diff para uma coluna datetime64 (NaT vira NaN)."""
+    return (pd.Timestamp(datetime.today()) - datas).dt.days.astype(float)
+
+
+def converter_sincronizacao(datetime_str) -> "pd.Timestamp | None":
+    """
+    Converte um timestamp ISO em Timestamp UTC.
     Aceita formatos como '2024-01-15T10:30:00.000Z' do spotLastSync.
-    Valores inválidos, vazios, "-", ou datas futuras (negativos) retornam None.
+    Valores inválidos, vazios ou "-" retornam None.
     """
     if pd.isna(datetime_str) or str(datetime_str).strip() in ["", "-"]:
         return None
@@ -74,6 +99,34 @@ def days_since_last_sync(datetime_str) -> "int | None":
         data = pd.to_datetime(datetime_str_clean, errors="coerce", utc=True)
         if pd.isna(data):
             return None
+    return data
+
+
+def converter_sincronizacoes(valores: pd.Series) -> pd.Series:
+    """converter_sincronizacao uma vez por valor distinto, como coluna datetime64 UTC."""
+    codigos, distintos = pd.factorize(valores)
+    convertidas = pd.DatetimeIndex([converter_sincronizacao(v) for v in distintos] + [None], tz="UTC")
+    return pd.Series(convertidas[codigos], index=valores.index)
+
+
+def dias_desde_sincronizacao(momentos: pd.Series) -> np.ndarray:
+    """
+    Versão vetorizada de days_since_last_sync para uma coluna datetime64
+    UTC, contando a partir de agora: NaT e datas futuras viram NaN.
+    """
+    dias = (pd.Timestamp.now(tz="UTC") - pd.to_datetime(momentos, utc=True)).dt.days.to_numpy(dtype=float)
+    return np.where(dias < 0, np.nan, dias)
+
+
+def days_since_last_sync(datetime_str) -> "int | None":
+    """
+    Calcula diferença em dias entre hoje e um timestamp ISO
+    (formatos de converter_sincronizacao).
+    Valores inválidos, vazios, "-", ou datas futuras (negativos) retornam None.
+    """
+    data = converter_sincronizacao(datetime_str)
+    if data is None:
+        return None
     
     # Converter para timezone-aware para comparação
     hoje = pd.Timestamp.now(tz='UTC')
@@ -86,6 +139,11 @@ def days_since_last_sync(datetime_str) -> "int | None":
     return dias
 
 
+def normalizar_ordem(ordens: pd.Series) -> pd.Series:
+    """Número da ordem como texto, sem o '.0' de quando a coluna vem como float."""
+    return ordens.astype(str).str.replace(r"\.0$", "", regex=True)
+
+
 def clean_insights(df: pd.DataFrame) -> pd.Series:
     """
     Retorna a coluna de insights limpa: remove linhas do tipo
@@ -96,7 +154,28 @@ def clean_insights(df: pd.DataFrame) -> pd.Series:
     return col[mask].reset_index(drop=True)
 
 
-def resolver_status_ordem(base: pd.DataFrame, ordem_notas: pd.DataFrame) -> pd.Series:
+# Chaves sem correspondência listadas como exemplo no diagnóstico
+AMOSTRA_COBERTURA = 10
+
+
+def resumir_cobertura(linhas: int, faltando: pd.Series, erro: str = None) -> dict:
+    """
+    Resumo de um cruzamento a partir das chaves que ficaram sem par:
+    quantas linhas foram cruzadas, quantas ficaram sem correspondência,
+    quantas chaves distintas e uma amostra delas. 'faltando' sai do próprio
+    cruzamento (NaN do map, left_only do merge), sem nova passada nos dados.
+    """
+    distintas = faltando.dropna().drop_duplicates()
+    return {
+        "linhas": int(linhas),
+        "sem_correspondencia": int(len(faltando)),
+        "chaves_sem_correspondencia": int(len(distintas)),
+        "amostra": [str(v) for v in distintas.head(AMOSTRA_COBERTURA)],
+        "erro": erro,
+    }
+
+
+def resolver_status_ordem(base: pd.DataFrame, ordem_notas: pd.DataFrame):
     """
     Exploda a coluna 'ORDEM DA NOTA M4' (valores separados por ' | '),
     cruza com ordem_notas para obter o 'Status do sistema' e reagrupa
@@ -105,17 +184,20 @@ def resolver_status_ordem(base: pd.DataFrame, ordem_notas: pd.DataFrame) -> pd.S
     Usa reindex no final para garantir que todas as linhas da base
     estejam presentes no resultado, preenchendo com NaN onde não há
     match — evitando desalinhamento silencioso.
+
+    Retorna (status, cobertura): a cobertura (ver resumir_cobertura) vem do
+    indicador do próprio merge e lista as ordens ausentes de ordem_notas.
     """
     series = base["ORDEM DA NOTA M4"]
 
     # Apenas linhas que têm valor
     mask = series.notna() & (series.str.strip() != "")
     if not mask.any():
-        return pd.Series("", index=base.index)
+        return pd.Series("", index=base.index), resumir_cobertura(0, pd.Series([], dtype=object))
 
     exploded = (
         series[mask]
-        .str.split(" | ")
+        .str.split(" | ", regex=False)
         .explode()
         .str.strip()
         .to_frame("Ordem")
@@ -124,64 +206,125 @@ def resolver_status_ordem(base: pd.DataFrame, ordem_notas: pd.DataFrame) -> pd.S
     # Verificar se a coluna existe
     if "Status do sistema" not in ordem_notas.columns:
         print(f"ERRO: Coluna 'Status do sistema' não encontrada. Colunas disponíveis: {list(ordem_notas.columns)}")
-        return pd.Series("", index=base.index)
+        return pd.Series("", index=base.index), resumir_cobertura(
+            len(exploded), exploded["Ordem"],
+            erro="Coluna 'Status do sistema' não encontrada em ordem_notas",
+        )
 
-    merged = exploded.merge(
+    # O merge descarta o índice: a linha da base vai numa coluna própria
+    merged = exploded.rename_axis("LINHA_BASE").reset_index().merge(
         ordem_notas[["Ordem", "Status do sistema"]],
         on="Ordem",
         how="left",
+        indicator=True,
     )
 
     resultado = (
-        merged.groupby(level=0)["Status do sistema"]
+        merged.groupby("LINHA_BASE")["Status do sistema"]
         .apply(concat_values)
         .reindex(base.index, fill_value="")  # garante alinhamento com a base
     )
+    cobertura = resumir_cobertura(len(exploded), merged.loc[merged["_merge"] == "left_only", "Ordem"])
 
-    return resultado
+    return resultado, cobertura
 
 
-def gerar_badge_input(row, dias_col_val, dias_nota_val, cond1, cond2, cond3, cond4):
+def montar_tabela_maquinas(base: pd.DataFrame) -> pd.DataFrame:
     """
-    Gera badges para a coluna INPUT baseado nas regras que o ponto passou.
-    Retorna string formatada com badges estilo [emoji texto].
+    Materializa uma linha por MÁQUINA com os fatos que as regras usam:
+    quantidade de spots, primeira/última coleta (spotLastSync mais antigo e
+    mais recente, UTC), quantidade de spots em A1/A2 e o intervalo
+    [INICIO, FIM) das posições dos spots.
+
+    Os dias desde a coleta não ficam na tabela: ela é gravada com o dataset
+    e reaproveitada em outros dias, então as regras calculam os dias na
+    avaliação (ver dias_desde_sincronizacao).
+
+    A base precisa estar ordenada por MÁQUINA (spots da máquina contíguos).
     """
-    badges = []
-    
-    # Cond1: Alarme A2 ou A1
-    if cond1:
-        status = str(row.get("STATUS DO PONTO DE MONITORAMENTO", "")).lower()
-        dias = dias_col_val
-        
-        if "a2" in status:
-            if pd.isna(dias):
-                badges.append("[🔴 A2 - nunca analisado]")
-            else:
-                badges.append(f"[🔴 A2 há {int(dias)} dias sem análise]")
-        elif "a1" in status:
-            if pd.isna(dias):
-                badges.append("[🟡 A1 - nunca analisado]")
-            else:
-                badges.append(f"[🟡 A1 há {int(dias)} dias sem análise]")
-    
-    # Cond2: Insights
-    if cond2:
-        badges.append("[💡 Insights]")
-    
-    # Cond3: Nota M4 vencida
-    if cond3:
-        dias_nota = dias_nota_val
-        if not pd.isna(dias_nota):
-            badges.append(f"[📝 Nota M4 vencida há {int(dias_nota)} dias]")
-        else:
-            badges.append("[📝 Nota M4 vencida]")
-    
-    # Cond4: Ordem M4 executada
-    if cond4:
-        badges.append("[✅ Ordem M4 executada]")
-    
-    # Se não passou em nenhuma regra, é ponto da mesma máquina
-    if not badges:
-        badges.append("[ℹ️ Mesma máquina]")
-    
-    return " ".join(badges)
+    status = base["STATUS DO PONTO DE MONITORAMENTO"]
+    aux = pd.DataFrame({
+        "MÁQUINA": base["MÁQUINA"],
+        "POSICAO": np.arange(len(base)),
+        "COLETA": converter_sincronizacoes(base["DATA DA ÚLTIMA COLETA"]),
+        "A1": status.str.contains("A1", case=False, na=False),
+        "A2": status.str.contains("A2", case=False, na=False),
+    })
+
+    maquinas = aux.groupby("MÁQUINA", sort=False, dropna=False).agg(**{
+        "QTD SPOTS": ("POSICAO", "size"),
+        "PRIMEIRA COLETA": ("COLETA", "min"),
+        "ÚLTIMA COLETA": ("COLETA", "max"),
+        "QTD A1": ("A1", "sum"),
+        "QTD A2": ("A2", "sum"),
+        "INICIO": ("POSICAO", "min"),
+        "FIM": ("POSICAO", "max"),
+    }).reset_index()
+    maquinas["FIM"] += 1
+
+    return maquinas
+
+
+def posicoes_das_maquinas(maquinas: pd.DataFrame, selecionadas) -> np.ndarray:
+    """
+    Posições na base de todos os spots das máquinas selecionadas (máscara
+    booleana alinhada à tabela de máquinas), concatenando os intervalos
+    [INICIO, FIM) sem laço em Python.
+    """
+    inicio = maquinas["INICIO"].to_numpy(dtype=np.int64)[selecionadas]
+    tamanho = maquinas["FIM"].to_numpy(dtype=np.int64)[selecionadas] - inicio
+    deslocamento = np.repeat(inicio - np.cumsum(tamanho) + tamanho, tamanho)
+    return np.arange(tamanho.sum()) + deslocamento
+
+
+# Pesos da pontuação de prioridade (ver calcular_prioridade)
+PESO_ALARME_A2 = 40
+PESO_ALARME_A1 = 25
+PESO_INSIGHTS = 20
+PESO_NOTA_VENCIDA = 15
+PESO_ORDEM_CONF = 10
+DIAS_MAXIMOS_PRIORIDADE = 90
+
+
+def calcular_prioridade(status: pd.Series, dias_analise: pd.Series, dias_nota: pd.Series,
+                        cond1: pd.Series, cond2: pd.Series, cond3: pd.Series, cond4: pd.Series) -> pd.Series:
+    """
+    Pontuação numérica de prioridade por ponto, a partir das mesmas regras
+    dos badges: cada condição atendida soma um peso fixo, e as condições
+    com prazo somam até +30 conforme os dias de atraso (limitados a 90).
+    Ponto nunca analisado conta como atraso máximo.
+    """
+    status = status.fillna("").astype(str).str.lower()
+    atraso_analise = (
+        pd.to_numeric(dias_analise, errors="coerce")
+        .fillna(DIAS_MAXIMOS_PRIORIDADE)
+        .clip(0, DIAS_MAXIMOS_PRIORIDADE) / 3
+    )
+    atraso_nota = (
+        pd.to_numeric(dias_nota, errors="coerce")
+        .fillna(0)
+        .clip(0, DIAS_MAXIMOS_PRIORIDADE) / 3
+    )
+    peso_alarme = np.where(status.str.contains("a2"), PESO_ALARME_A2, PESO_ALARME_A1)
+
+    return (
+        cond1 * (peso_alarme + atraso_analise)
+        + cond2 * (PESO_INSIGHTS + atraso_analise)
+        + cond3 * (PESO_NOTA_VENCIDA + atraso_nota)
+        + cond4 * PESO_ORDEM_CONF
+    ).astype(float)
+
+
+def selecionar_top_k(analista: np.ndarray, maquina: np.ndarray, prioridade: np.ndarray, k: int) -> np.ndarray:
+    """
+    Recebe pares (analista, máquina) com a prioridade de cada par e retorna
+    os códigos das máquinas que estão entre as k de maior prioridade de
+    algum analista. Usa seleção parcial (argpartition), sem ordenar tudo.
+    """
+    selecionadas = []
+    grupos = pd.DataFrame({"analista": analista}).groupby("analista", sort=False).indices
+    for grupo in grupos.values():
+        if len(grupo) > k:
+            grupo = grupo[np.argpartition(-prioridade[grupo], k - 1)[:k]]
+        selecionadas.append(maquina[grupo])
+    return np.unique(np.concatenate(selecionadas)) if selecionadas else np.zeros(0, dtype=np.int64)
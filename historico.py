@@ -0,0 +1,233 @@
+# historico.py
+# Histórico das avaliações em SQLite (resumos compactos por analista, máquina e condição)
+
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+from armazenamento import DIR_DADOS
+
+ARQUIVO_HISTORICO = os.path.join(DIR_DADOS, "historico.sqlite3")
+
+# Rótulos das condições gravados no histórico (cond1..cond4 do pipeline)
+CONDICOES = {
+    "cond1": "ALARMES",
+    "cond2": "INSIGHTS",
+    "cond3": "NOTAS",
+    "cond4": "CONF",
+}
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS execucoes (
+    id INTEGER PRIMARY KEY,
+    executado_em TEXT NOT NULL,
+    origem TEXT NOT NULL,
+    dataset_id TEXT,
+    dias_coleta REAL,
+    top_k INTEGER,
+    config TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_execucoes_data ON execucoes (executado_em);
+
+CREATE TABLE IF NOT EXISTS resumo_analista (
+    execucao_id INTEGER NOT NULL REFERENCES execucoes (id) ON DELETE CASCADE,
+    analista TEXT NOT NULL,
+    pontos INTEGER NOT NULL,
+    maquinas INTEGER NOT NULL,
+    PRIMARY KEY (analista, execucao_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS resumo_condicao (
+    execucao_id INTEGER NOT NULL REFERENCES execucoes (id) ON DELETE CASCADE,
+    analista TEXT NOT NULL,
+    condicao TEXT NOT NULL,
+    pontos INTEGER NOT NULL,
+    PRIMARY KEY (analista, condicao, execucao_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS ix_resumo_condicao ON resumo_condicao (condicao, execucao_id);
+
+CREATE TABLE IF NOT EXISTS maquinas_lista (
+    execucao_id INTEGER NOT NULL REFERENCES execucoes (id) ON DELETE CASCADE,
+    maquina TEXT NOT NULL,
+    analista TEXT NOT NULL,
+    prioridade REAL,
+    pontos INTEGER NOT NULL,
+    PRIMARY KEY (maquina, analista, execucao_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS ix_maquinas_lista_analista ON maquinas_lista (analista, execucao_id);
+
+CREATE TABLE IF NOT EXISTS maquinas_removidas (
+    execucao_id INTEGER NOT NULL REFERENCES execucoes (id) ON DELETE CASCADE,
+    maquina TEXT NOT NULL,
+    analista TEXT,
+    menor_dias_coleta REAL,
+    PRIMARY KEY (maquina, execucao_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS ix_maquinas_removidas_analista ON maquinas_removidas (analista, execucao_id);
+"""
+
+_esquema_criado = False
+_esquema_lock = threading.Lock()
+
+
+def conectar() -> sqlite3.Connection:
+    """
+    Conexão nova por chamada (seguro entre threads e workers). WAL deixa as
+    consultas de tendência rodarem enquanto outra avaliação grava.
+    """
+    global _esquema_criado
+    os.makedirs(DIR_DADOS, exist_ok=True)
+    conexao = sqlite3.connect(ARQUIVO_HISTORICO, timeout=30)
+    conexao.execute("PRAGMA foreign_keys = ON")
+    if not _esquema_criado:
+        with _esquema_lock:
+            conexao.execute("PRAGMA journal_mode = WAL")
+            conexao.executescript(ESQUEMA)
+            _esquema_criado = True
+    return conexao
+
+
+def _texto(valor):
+    import pandas as pd
+
+    return None if pd.isna(valor) else str(valor)
+
+
+def registrar_execucao(df_final: "pd.DataFrame", detalhes: dict, origem: str,
+                       dataset_id: str = None, dias_coleta=None, top_k=None,
+                       filtros: dict = None) -> int:
+    """
+    Grava o resumo de uma avaliação: pontos e máquinas por analista, pontos
+    por condição, máquinas da lista (com prioridade) e máquinas removidas
+    pelo filtro de coleta. Nenhum DataFrame é guardado. Retorna o id.
+    """
+    import pandas as pd
+
+    lista = df_final[df_final["ANALISTA RESPONSÁVEL"].notna()]
+    condicoes = detalhes["condicoes"].loc[lista.index]
+
+    por_analista = lista.groupby("ANALISTA RESPONSÁVEL").agg(
+        pontos=("MÁQUINA", "size"), maquinas=("MÁQUINA", "nunique")
+    )
+    por_condicao = (
+        condicoes.rename(columns=CONDICOES)
+        .groupby(lista["ANALISTA RESPONSÁVEL"]).sum()
+        .stack()
+    )
+    por_maquina = lista.groupby(["MÁQUINA", "ANALISTA RESPONSÁVEL"]).agg(
+        prioridade=("PRIORIDADE", "max"), pontos=("PRIORIDADE", "size")
+    )
+    removidas = detalhes["removidas"]
+
+    with conectar() as conexao:
+        cursor = conexao.execute(
+            "INSERT INTO execucoes (executado_em, origem, dataset_id, dias_coleta, top_k, config)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                datetime.now().isoformat(timespec="seconds"), origem, dataset_id,
+                None if dias_coleta is None else float(dias_coleta),
+                int(top_k) if top_k else None,
+                json.dumps(filtros or {}, ensure_ascii=False, sort_keys=True),
+            ),
+        )
+        execucao_id = cursor.lastrowid
+        conexao.executemany(
+            "INSERT INTO resumo_analista VALUES (?, ?, ?, ?)",
+            [(execucao_id, str(a), int(p), int(m)) for a, p, m in por_analista.itertuples()],
+        )
+        conexao.executemany(
+            "INSERT INTO resumo_condicao VALUES (?, ?, ?, ?)",
+            [(execucao_id, str(a), c, int(p)) for (a, c), p in por_condicao.items()],
+        )
+        conexao.executemany(
+            "INSERT INTO maquinas_lista VALUES (?, ?, ?, ?, ?)",
+            [(execucao_id, str(m), str(a), float(pr), int(p)) for (m, a), pr, p in por_maquina.itertuples()],
+        )
+        conexao.executemany(
+            "INSERT INTO maquinas_removidas VALUES (?, ?, ?, ?)",
+            [
+                (execucao_id, str(m), _texto(a), None if pd.isna(d) else float(d))
+                for m, a, d in removidas[["MÁQUINA", "ANALISTA RESPONSÁVEL", "MENOR DIAS COLETA"]].itertuples(index=False)
+            ],
+        )
+    conexao.close()
+    return execucao_id
+
+
+def _consultar(sql: str, parametros=()) -> list:
+    conexao = conectar()
+    try:
+        conexao.row_factory = sqlite3.Row
+        return [dict(linha) for linha in conexao.execute(sql, parametros)]
+    finally:
+        conexao.close()
+
+
+def tendencia_analista(analista: str, desde: str = None, ate: str = None) -> list:
+    """Pontos, máquinas e pontos por condição do analista em cada execução."""
+    return _consultar(
+        """
+        SELECT e.id AS execucao, e.executado_em, e.origem, r.pontos, r.maquinas,
+               (SELECT group_concat(c.condicao || '=' || c.pontos)
+                  FROM resumo_condicao c
+                 WHERE c.analista = r.analista AND c.execucao_id = r.execucao_id) AS condicoes
+          FROM resumo_analista r
+          JOIN execucoes e ON e.id = r.execucao_id
+         WHERE r.analista = ?
+           AND e.executado_em >= coalesce(?, '')
+           AND e.executado_em <= coalesce(?, '9999')
+         ORDER BY e.executado_em
+        """,
+        (analista, desde, ate),
+    )
+
+
+def tendencia_condicao(condicao: str, analista: str = None, desde: str = None) -> list:
+    """Pontos de uma condição (ALARMES, INSIGHTS, NOTAS, CONF) por execução."""
+    return _consultar(
+        """
+        SELECT e.id AS execucao, e.executado_em, c.analista, c.pontos
+          FROM resumo_condicao c
+          JOIN execucoes e ON e.id = c.execucao_id
+         WHERE c.condicao = ?
+           AND (? IS NULL OR c.analista = ?)
+           AND e.executado_em >= coalesce(?, '')
+         ORDER BY e.executado_em, c.analista
+        """,
+        (condicao, analista, analista, desde),
+    )
+
+
+def historico_maquina(maquina: str, desde: str = None) -> list:
+    """Execuções em que a máquina entrou na lista ou foi removida pela coleta."""
+    return _consultar(
+        """
+        SELECT e.id AS execucao, e.executado_em, 'LISTA' AS situacao, m.analista,
+               m.prioridade, m.pontos, NULL AS menor_dias_coleta
+          FROM maquinas_lista m JOIN execucoes e ON e.id = m.execucao_id
+         WHERE m.maquina = ? AND e.executado_em >= coalesce(?, '')
+        UNION ALL
+        SELECT e.id, e.executado_em, 'REMOVIDA (COLETA)', r.analista,
+               NULL, NULL, r.menor_dias_coleta
+          FROM maquinas_removidas r JOIN execucoes e ON e.id = r.execucao_id
+         WHERE r.maquina = ? AND e.executado_em >= coalesce(?, '')
+         ORDER BY 2
+        """,
+        (maquina, desde, maquina, desde),
+    )
+
+
+def removidas_por_analista(analista: str, desde: str = None) -> list:
+    """Quantidade de máquinas removidas pelo filtro de coleta em cada execução."""
+    return _consultar(
+        """
+        SELECT e.id AS execucao, e.executado_em, count(*) AS maquinas_removidas
+          FROM maquinas_removidas r JOIN execucoes e ON e.id = r.execucao_id
+         WHERE r.analista = ? AND e.executado_em >= coalesce(?, '')
+         GROUP BY e.id
+         ORDER BY e.executado_em
+        """,
+        (analista, desde),
+    )
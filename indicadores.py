@@ -0,0 +1,405 @@
+# indicadores.py
+# Indicadores numéricos compactos por ponto, usados nas prévias de impacto
+
+import base64
+import threading
+from collections import OrderedDict
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from armazenamento import MAX_DATASETS_EM_CACHE, carregar_dataset
+from fatos import COLUNA_CONCLUSAO, COLUNA_CONF
+from helpers import days_diff, days_since_last_sync, dias_desde
+
+# Indicadores já calculados por dataset, neste processo (como carregar_dataset)
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _array_numerico(series: pd.Series) -> np.ndarray:
+    """Converte uma Series em array float, com NaN no lugar de vazios."""
+    return pd.to_numeric(series, errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+
+
+def calcular_indicadores(base: pd.DataFrame) -> dict:
+    """
+    Extrai da base processada apenas o que as regras precisam, em formato
+    colunar (um array por coluna): códigos de analista e máquina, flags de
+    alarme/insight/nota/CONF e os dias desde análise, de atraso da nota e
+    desde a última coleta.
+
+    Os dias usam as mesmas funções de aplicar_regras (days_diff, dias_desde
+    e days_since_last_sync), então a prévia conta exatamente os mesmos pontos.
+    """
+    codigos_analista, analistas = pd.factorize(base["ANALISTA RESPONSÁVEL"])
+    codigos_maquina, maquinas = pd.factorize(base["MÁQUINA"], use_na_sentinel=False)
+    status = base["STATUS DO PONTO DE MONITORAMENTO"]
+
+    return {
+        "analistas": [str(a) for a in analistas],
+        "n_maquinas": len(maquinas),
+        "analista": codigos_analista.astype(np.int64),  # -1 = sem analista
+        "maquina": codigos_maquina.astype(np.int64),
+        "a1": status.str.contains("A1", case=False, na=False).to_numpy(dtype=bool),
+        "a2": status.str.contains("A2", case=False, na=False).to_numpy(dtype=bool),
+        "insights": (base["INSIGHTS"] == "SIM").to_numpy(dtype=bool),
+        "nota": base["NOTA M4"].notna().to_numpy(dtype=bool),
+        "conf": base[COLUNA_CONF].to_numpy(dtype=bool),
+        "dias_analise": _array_numerico(base["DATA DA ÚLTIMA ANÁLISE"].apply(days_diff)),
+        "dias_nota": _array_numerico(dias_desde(base[COLUNA_CONCLUSAO])),
+        "dias_coleta": _array_numerico(base["DATA DA ÚLTIMA COLETA"].apply(days_since_last_sync)),
+    }
+
+
+def indicadores_do_dataset(dataset_id: str) -> dict:
+    """
+    calcular_indicadores da base gravada, calculado uma vez por dataset (e
+    por dia, já que os dias contam a partir de hoje) em cada processo. As
+    prévias e a simulação recebem só o dataset_id do navegador; os
+    indicadores por ponto nunca vão e voltam na requisição.
+    """
+    chave = (dataset_id, date.today())
+    with _cache_lock:
+        if chave in _cache:
+            _cache.move_to_end(chave)
+            return _cache[chave]
+
+    base, _maquinas = carregar_dataset(dataset_id)
+    indicadores = calcular_indicadores(base)
+    with _cache_lock:
+        _cache[chave] = indicadores
+        while len(_cache) > MAX_DATASETS_EM_CACHE:
+            _cache.popitem(last=False)
+    return indicadores
+
+
+def _limites_por_analista(ind: dict, config_por_analista: dict):
+    """
+    Monta arrays de limites indexados pelo código do analista.
+    A última posição é uma sentinela para pontos sem analista (código -1),
+    que nunca qualificam — igual ao loop por analista de aplicar_regras.
+    """
+    n = len(ind["analistas"]) + 1
+    usa_a1 = np.zeros(n, dtype=bool)
+    usa_a2 = np.zeros(n, dtype=bool)
+    lim_alarmes = np.full(n, np.inf)
+    lim_insights = np.full(n, np.inf)
+    lim_notas = np.full(n, np.inf)
+
+    for i, analista in enumerate(ind["analistas"]):
+        config = config_por_analista[analista]
+        filtro = [f.upper() for f in config["filtro_alarme"]]
+        usa_a1[i] = "A1" in filtro
+        usa_a2[i] = "A2" in filtro
+        lim_alarmes[i] = config["dias_alarmes"]
+        lim_insights[i] = config["dias_insights"]
+        lim_notas[i] = config["dias_notas"]
+
+    return usa_a1, usa_a2, lim_alarmes, lim_insights, lim_notas
+
+
+def pontos_na_lista(ind: dict, config_por_analista: dict, dias_coleta) -> np.ndarray:
+    """
+    Avalia cond1–cond4 e o filtro de coleta por máquina de forma vetorizada
+    e retorna a máscara dos pontos que entram na lista final.
+    """
+    analista = np.asarray(ind["analista"], dtype=np.int64)
+    maquina = np.asarray(ind["maquina"], dtype=np.int64)
+    dias_analise = np.asarray(ind["dias_analise"], dtype=float)
+    dias_nota = np.asarray(ind["dias_nota"], dtype=float)
+    dias_col = np.asarray(ind["dias_coleta"], dtype=float)
+
+    usa_a1, usa_a2, lim_alarmes, lim_insights, lim_notas = _limites_por_analista(ind, config_por_analista)
+    sem_analise = np.isnan(dias_analise)
+
+    with np.errstate(invalid="ignore"):
+        alarme = (np.asarray(ind["a1"]) & usa_a1[analista]) | (np.asarray(ind["a2"]) & usa_a2[analista])
+        cond1 = alarme & (sem_analise | (dias_analise > lim_alarmes[analista]))
+        cond2 = np.asarray(ind["insights"]) & (sem_analise | (dias_analise > lim_insights[analista]))
+        cond3 = np.asarray(ind["nota"]) & ~np.isnan(dias_nota) & (dias_nota > lim_notas[analista])
+        cond4 = np.asarray(ind["conf"])
+        coleta_ok = ~np.isnan(dias_col) & (dias_col <= dias_coleta)
+
+    qualificado = (cond1 | cond2 | cond3 | cond4) & (analista >= 0)
+    n_maquinas = ind["n_maquinas"]
+    maquina_qualificada = np.bincount(maquina[qualificado], minlength=n_maquinas) > 0
+    maquina_coleta_ok = np.bincount(maquina[coleta_ok], minlength=n_maquinas) > 0
+
+    return (maquina_qualificada & maquina_coleta_ok)[maquina]
+
+
+def contar_pontos_por_analista(ind: dict, config_por_analista: dict, dias_coleta) -> dict:
+    """
+    Prévia da coluna 'QUANTIDADE DE PONTOS' da tabela-analista sem passar
+    pelo pipeline completo (sem DataFrame, datas em texto ou badges).
+    """
+    analista = np.asarray(ind["analista"], dtype=np.int64)
+    na_lista = pontos_na_lista(ind, config_por_analista, dias_coleta) & (analista >= 0)
+    contagem = np.bincount(analista[na_lista], minlength=len(ind["analistas"]))
+    return dict(zip(ind["analistas"], contagem.tolist()))
+
+
+# ======================================================
+# SNAPSHOT BINÁRIO PARA AVALIAÇÃO NO NAVEGADOR
+# ======================================================
+
+# Bits de "flags" no snapshot (um byte por ponto)
+FLAGS_SNAPSHOT = {"a1": 1, "a2": 2, "insights": 4, "nota": 8, "conf": 16}
+
+
+def _b64(valores, dtype) -> str:
+    """Array little-endian em base64 (vira um TypedArray no navegador)."""
+    return base64.b64encode(np.asarray(valores, dtype=dtype).tobytes()).decode("ascii")
+
+
+def montar_snapshot(ind: dict, padroes: dict) -> dict:
+    """
+    Versão compacta dos indicadores para avaliar cond1–cond4, o filtro de
+    coleta e a contagem por analista direto no navegador: códigos em Int32,
+    as cinco flags num Uint8 e os dias em Float32 (NaN = sem data; os dias
+    são inteiros, então Float32 é exato). 'padroes' traz os limites usados
+    quando o analista não tem valor preenchido.
+    """
+    flags = np.zeros(len(ind["analista"]), dtype=np.uint8)
+    for nome, bit in FLAGS_SNAPSHOT.items():
+        flags |= np.asarray(ind[nome], dtype=bool).astype(np.uint8) * np.uint8(bit)
+
+    return {
+        "n": len(flags),
+        "analistas": list(ind["analistas"]),
+        "n_maquinas": ind["n_maquinas"],
+        "analista": _b64(ind["analista"], "<i4"),
+        "maquina": _b64(ind["maquina"], "<i4"),
+        "flags": _b64(flags, np.uint8),
+        "dias_analise": _b64(np.asarray(ind["dias_analise"], dtype=float), "<f4"),
+        "dias_nota": _b64(np.asarray(ind["dias_nota"], dtype=float), "<f4"),
+        "dias_coleta": _b64(np.asarray(ind["dias_coleta"], dtype=float), "<f4"),
+        "padroes": padroes,
+    }
+
+
+# ======================================================
+# HISTOGRAMAS ACUMULADOS PARA PRÉVIA POR CONDIÇÃO
+# ======================================================
+
+# Limites acima disso são tratados como este valor na consulta
+LIMITE_DIAS_HISTOGRAMA = 365
+
+
+def _acima_do_limite(gatilho: np.ndarray, peso: np.ndarray) -> list:
+    """
+    Retorna acima[t] = soma dos pesos com gatilho > t, para t = 0..LIMITE.
+    Gatilho +inf (ex.: nunca analisado) conta para qualquer limite;
+    -inf marca pares que a condição não alcança.
+    """
+    infinito = np.isposinf(gatilho)
+    finito = np.isfinite(gatilho)
+    # Baldes: -1 (ou menos), 0, 1, ..., LIMITE, LIMITE+1 (ou mais)
+    baldes = np.clip(gatilho[finito], -1, LIMITE_DIAS_HISTOGRAMA + 1).astype(np.int64) + 1
+    histograma = np.bincount(baldes, weights=peso[finito], minlength=LIMITE_DIAS_HISTOGRAMA + 3)
+    acumulado_reverso = np.cumsum(histograma[::-1])[::-1]
+    acima = acumulado_reverso[2:] + peso[infinito].sum()
+    return acima.astype(np.int64).tolist()
+
+
+def _pares_analista_maquina(ind: dict, validos: np.ndarray):
+    """
+    Agrupa os pontos válidos em pares (analista, máquina). Retorna o par de
+    cada ponto válido, o analista e a máquina de cada par e o peso do par
+    (quantidade de pontos do analista na máquina).
+    """
+    analista = np.asarray(ind["analista"], dtype=np.int64)[validos]
+    maquina = np.asarray(ind["maquina"], dtype=np.int64)[validos]
+    par, par_do_ponto = np.unique(analista * ind["n_maquinas"] + maquina, return_inverse=True)
+    peso = np.bincount(par_do_ponto, minlength=len(par)).astype(float)
+    return par_do_ponto, par // ind["n_maquinas"], par % ind["n_maquinas"], peso
+
+
+def _gatilho_por_par(par_do_ponto: np.ndarray, n_pares: int, elegivel: np.ndarray, dias: np.ndarray) -> np.ndarray:
+    """Maior número de dias entre os pontos elegíveis de cada par (-inf se nenhum)."""
+    gatilho = np.full(n_pares, -np.inf)
+    np.maximum.at(gatilho, par_do_ponto, np.where(elegivel, dias, -np.inf))
+    return gatilho
+
+
+def montar_histogramas(ind: dict, dias_coleta) -> dict:
+    """
+    Para cada analista e condição, acumula quantos pontos entrariam na lista
+    se só aquela condição estivesse ativa, em função do limite em dias.
+
+    A granularidade é o par (analista, máquina): o gatilho do par é o maior
+    número de dias entre os pontos do analista que atendem à condição, e o
+    peso é a quantidade de pontos do analista na máquina. Máquinas barradas
+    pelo filtro de coleta (dias_coleta) ficam de fora. Assim a prévia de
+    qualquer limite t é uma consulta O(1) em acima[t].
+    """
+    analista = np.asarray(ind["analista"], dtype=np.int64)
+    maquina = np.asarray(ind["maquina"], dtype=np.int64)
+    dias_analise = np.asarray(ind["dias_analise"], dtype=float)
+    dias_nota = np.asarray(ind["dias_nota"], dtype=float)
+    dias_col = np.asarray(ind["dias_coleta"], dtype=float)
+
+    with np.errstate(invalid="ignore"):
+        coleta_ok = ~np.isnan(dias_col) & (dias_col <= dias_coleta)
+    maquina_coleta_ok = np.bincount(maquina[coleta_ok], minlength=ind["n_maquinas"]) > 0
+
+    validos = (analista >= 0) & maquina_coleta_ok[maquina]
+    par_do_ponto, analista_do_par, _maquina_do_par, peso = _pares_analista_maquina(ind, validos)
+    n_pares = len(peso)
+
+    # Nunca analisado (NaN) dispara alarmes e insights com qualquer limite
+    dias_analise_gatilho = np.where(np.isnan(dias_analise), np.inf, dias_analise)[validos]
+    dias_nota_gatilho = np.nan_to_num(dias_nota, nan=-np.inf)[validos]
+
+    a1 = np.asarray(ind["a1"])[validos]
+    a2 = np.asarray(ind["a2"])[validos]
+    nota = (np.asarray(ind["nota"]) & ~np.isnan(dias_nota))[validos]
+    gatilhos = {
+        "A1": _gatilho_por_par(par_do_ponto, n_pares, a1, dias_analise_gatilho),
+        "A2": _gatilho_por_par(par_do_ponto, n_pares, a2, dias_analise_gatilho),
+        "A1A2": _gatilho_por_par(par_do_ponto, n_pares, a1 | a2, dias_analise_gatilho),
+        "insights": _gatilho_por_par(par_do_ponto, n_pares, np.asarray(ind["insights"])[validos], dias_analise_gatilho),
+        "notas": _gatilho_por_par(par_do_ponto, n_pares, nota, dias_nota_gatilho),
+    }
+    conf_par = np.bincount(par_do_ponto, weights=np.asarray(ind["conf"])[validos], minlength=n_pares) > 0
+
+    histogramas = {}
+    for codigo, nome in enumerate(ind["analistas"]):
+        do_analista = analista_do_par == codigo
+        histogramas[nome] = {
+            condicao: _acima_do_limite(gatilho[do_analista], peso[do_analista])
+            for condicao, gatilho in gatilhos.items()
+        }
+        histogramas[nome]["conf"] = int(peso[do_analista & conf_par].sum())
+
+    return {"limite": LIMITE_DIAS_HISTOGRAMA, "analistas": histogramas}
+
+
+# ======================================================
+# VARREDURA DE LIMITES (WHAT-IF)
+# ======================================================
+
+PARAMETROS_VARREDURA = ["dias_coleta", "dias_alarmes", "dias_insights", "dias_notas"]
+
+# Combinações aceitas numa varredura (cada uma vira uma linha da tabela)
+MAX_CONFIGURACOES_VARREDURA = 1000
+
+# Células das matrizes (configuração x par) avaliadas de uma vez: as
+# configurações são processadas em blocos para a memória não crescer com a grade
+ELEMENTOS_POR_BLOCO_VARREDURA = 2_000_000
+
+
+def varrer_limites(ind: dict, config_por_analista: dict, dias_coleta, grade: dict) -> dict:
+    """
+    Avalia de uma vez todas as combinações de limites da grade e retorna a
+    matriz de 'QUANTIDADE DE PONTOS' (configuração x analista).
+
+    grade mapeia cada parâmetro de PARAMETROS_VARREDURA para uma lista de
+    valores; os limites em dias valem para todos os analistas. Parâmetros
+    ausentes (ou lista vazia) mantêm o valor atual — dias_coleta global e a
+    configuração de cada analista, inclusive o filtro A1/A2.
+
+    Os pontos são reduzidos a pares (analista, máquina) com o gatilho de cada
+    condição; cada bloco de configurações é então comparado contra esses
+    gatilhos por broadcast, com no máximo ELEMENTOS_POR_BLOCO_VARREDURA
+    células (configuração x par) por matriz.
+    """
+    analista = np.asarray(ind["analista"], dtype=np.int64)
+    maquina = np.asarray(ind["maquina"], dtype=np.int64)
+    dias_analise = np.asarray(ind["dias_analise"], dtype=float)
+    dias_nota = np.asarray(ind["dias_nota"], dtype=float)
+    dias_col = np.asarray(ind["dias_coleta"], dtype=float)
+    n_analistas = len(ind["analistas"])
+    n_maquinas = ind["n_maquinas"]
+
+    usa_a1, usa_a2, lim_alarmes, lim_insights, lim_notas = _limites_por_analista(ind, config_por_analista)
+    atuais = {
+        "dias_coleta": [dias_coleta],
+        "dias_alarmes": [None],
+        "dias_insights": [None],
+        "dias_notas": [None],
+    }
+    eixos = [list(grade.get(p) or atuais[p]) for p in PARAMETROS_VARREDURA]
+    combinacoes = np.array(np.meshgrid(*[np.arange(len(e)) for e in eixos], indexing="ij")).reshape(4, -1).T
+    configuracoes = [
+        {p: eixos[j][i] for j, (p, i) in enumerate(zip(PARAMETROS_VARREDURA, combinacao))}
+        for combinacao in combinacoes
+    ]
+
+    # --- gatilhos por par (analista, máquina), com o filtro A1/A2 de cada analista ---
+    validos = analista >= 0
+    par_do_ponto, analista_do_par, maquina_do_par, peso = _pares_analista_maquina(ind, validos)
+    n_pares = len(peso)
+
+    dias_analise_gatilho = np.where(np.isnan(dias_analise), np.inf, dias_analise)[validos]
+    alarme = (
+        (np.asarray(ind["a1"]) & usa_a1[analista]) | (np.asarray(ind["a2"]) & usa_a2[analista])
+    )[validos]
+    nota = (np.asarray(ind["nota"]) & ~np.isnan(dias_nota))[validos]
+
+    g_alarmes = _gatilho_por_par(par_do_ponto, n_pares, alarme, dias_analise_gatilho)
+    g_insights = _gatilho_por_par(par_do_ponto, n_pares, np.asarray(ind["insights"])[validos], dias_analise_gatilho)
+    g_notas = _gatilho_por_par(par_do_ponto, n_pares, nota, np.nan_to_num(dias_nota, nan=-np.inf)[validos])
+    conf_par = np.bincount(par_do_ponto, weights=np.asarray(ind["conf"])[validos], minlength=n_pares) > 0
+
+    def limites(bloco, parametro, atual_por_analista):
+        """Matriz (configuração do bloco x par) com o limite do analista de cada par."""
+        valores = np.array([
+            atual_por_analista[:n_analistas] if c[parametro] is None
+            else np.full(n_analistas, float(c[parametro]))
+            for c in bloco
+        ]).reshape(len(bloco), n_analistas)
+        return valores[:, analista_do_par]
+
+    # Máquina passa na coleta se o seu ponto mais recente estiver dentro da linha de corte
+    menor_coleta = np.full(n_maquinas, np.inf)
+    com_coleta = ~np.isnan(dias_col)
+    np.minimum.at(menor_coleta, maquina[com_coleta], dias_col[com_coleta])
+
+    # Pontos de cada analista em cada máquina (todas as máquinas, não só pares qualificados)
+    pontos_maquina_analista = np.zeros((n_maquinas, n_analistas))
+    np.add.at(pontos_maquina_analista, (maquina_do_par, analista_do_par), peso)
+
+    pontos = np.zeros((len(configuracoes), n_analistas), dtype=np.int64)
+    tamanho_bloco = max(1, ELEMENTOS_POR_BLOCO_VARREDURA // max(n_pares, n_maquinas, 1))
+    for inicio in range(0, len(configuracoes), tamanho_bloco):
+        bloco = configuracoes[inicio:inicio + tamanho_bloco]
+
+        # --- broadcast: (configuração do bloco x par) ---
+        par_qualificado = (
+            (g_alarmes > limites(bloco, "dias_alarmes", lim_alarmes))
+            | (g_insights > limites(bloco, "dias_insights", lim_insights))
+            | (g_notas > limites(bloco, "dias_notas", lim_notas))
+            | conf_par
+        )
+        maquina_qualificada = np.zeros((len(bloco), n_maquinas), dtype=bool)
+        np.logical_or.at(maquina_qualificada, (slice(None), maquina_do_par), par_qualificado)
+        del par_qualificado
+
+        linhas_corte = np.array([c["dias_coleta"] for c in bloco], dtype=float)
+        maquina_na_lista = maquina_qualificada & (menor_coleta[None, :] <= linhas_corte[:, None])
+        pontos[inicio:inicio + len(bloco)] = (maquina_na_lista.astype(float) @ pontos_maquina_analista).astype(np.int64)
+
+    return {
+        "analistas": list(ind["analistas"]),
+        "configuracoes": configuracoes,
+        "pontos": pontos.tolist(),
+    }
+
+
+def escolher_configuracao(varredura: dict, limite_pontos: int = 300):
+    """
+    Entre as configurações em que nenhum analista chega a limite_pontos
+    (300 = faixa verde, 400 = até a amarela da tabela-analista), escolhe a
+    que cobre mais pontos no total. Retorna o índice ou None se nenhuma serve.
+    """
+    pontos = np.asarray(varredura["pontos"], dtype=np.int64).reshape(len(varredura["configuracoes"]), -1)
+    if pontos.size == 0:
+        return None
+    dentro = pontos.max(axis=1, initial=0) < limite_pontos
+    if not dentro.any():
+        return None
+    total = np.where(dentro, pontos.sum(axis=1), -1)
+    return int(np.argmax(total))
@@ -3,16 +3,15 @@
 
 from dash import dcc, html, dash_table
 
-# ======================================================
-# VALORES PADRÃO DOS PARÂMETROS (dias)
-# ======================================================
-DEFAULT_DIAS_ALARMES = 15
-DEFAULT_DIAS_INSIGHTS = 7
-DEFAULT_DIAS_NOTAS = 15
+from parametros import DEFAULT_DIAS_ALARMES, DEFAULT_DIAS_INSIGHTS, DEFAULT_DIAS_NOTAS, DEFAULT_DIAS_COLETA
 
 
 def upload_box(label: str, upload_id: str, subtitle: str = ""):
-    """Componente reutilizável de upload com status."""
+    """
+    Componente reutilizável de upload com status. O envio é feito em partes
+    por assets/uploads.js direto para /api/uploads; ao concluir, o store
+    'upload_id' recebe só a referência do arquivo gravado no servidor.
+    """
     return html.Div([
         html.Div(label, style={
             "fontWeight": "bold",
@@ -24,9 +23,14 @@ def upload_box(label: str, upload_id: str, subtitle: str = ""):
             "color": "#666",
             "marginBottom": "8px",
         }) if subtitle else None,
-        dcc.Upload(
-            id=upload_id,
-            children=html.Div("Clique ou arraste o arquivo"),
+        html.Div(
+            [
+                html.Div("Clique ou arraste o arquivo", className="upload-arquivo-texto"),
+                html.Progress(value="0", max="100", className="upload-arquivo-progresso",
+                              style={"display": "none", "width": "100%"}),
+            ],
+            className="upload-arquivo",
+            **{"data-destino": upload_id},
             style={
                 "border": "2px dashed #999",
                 "padding": "12px",
@@ -34,10 +38,187 @@ def upload_box(label: str, upload_id: str, subtitle: str = ""):
                 "cursor": "pointer",
             },
         ),
+        dcc.Store(id=upload_id),  # {"upload_id", "nome", "tamanho"} do arquivo recebido
         html.Div(id=f"status-{upload_id}"),
     ])
 
 
+def linha_filtro_analista(analista: str, filtro: dict = None):
+    """
+    Linha de controles (alarmes e limites em dias) de um analista. 'filtro'
+    (formato do store de filtros) preenche os valores iniciais; sem ele,
+    valem os padrões.
+    """
+    filtro = filtro or {}
+    return html.Div([
+        # Nome do analista
+        html.Div(
+            f"{analista}:",
+            style={
+                "fontWeight": "bold",
+                "minWidth": "120px",
+                "display": "flex",
+                "alignItems": "center",
+            }
+        ),
+
+        # Checkboxes A1/A2
+        html.Div([
+            dcc.Checklist(
+                id={"type": "filtro-alarme-analista", "analista": analista},
+                options=[
+                    {"label": " A1", "value": "A1"},
+                    {"label": " A2", "value": "A2"},
+                ],
+                value=filtro.get("alarmes", ["A1", "A2"]),
+                inline=True,
+            ),
+        ], style={"minWidth": "100px"}),
+
+        # Input dias alarmes
+        html.Div([
+            html.Label("Alarmes:", style={"fontSize": "11px", "marginRight": "5px"}),
+            dcc.Input(
+                id={"type": "dias-alarmes-analista", "analista": analista},
+                type="number",
+                value=filtro.get("dias_alarmes", DEFAULT_DIAS_ALARMES),
+                min=0,
+                debounce=True,
+                style={"width": "60px"},
+            ),
+        ], style={"display": "flex", "alignItems": "center", "gap": "5px"}),
+
+        # Input dias insights
+        html.Div([
+            html.Label("Insights:", style={"fontSize": "11px", "marginRight": "5px"}),
+            dcc.Input(
+                id={"type": "dias-insights-analista", "analista": analista},
+                type="number",
+                value=filtro.get("dias_insights", DEFAULT_DIAS_INSIGHTS),
+                min=0,
+                debounce=True,
+                style={"width": "60px"},
+            ),
+        ], style={"display": "flex", "alignItems": "center", "gap": "5px"}),
+
+        # Input dias notas
+        html.Div([
+            html.Label("Notas:", style={"fontSize": "11px", "marginRight": "5px"}),
+            dcc.Input(
+                id={"type": "dias-notas-analista", "analista": analista},
+                type="number",
+                value=filtro.get("dias_notas", DEFAULT_DIAS_NOTAS),
+                min=0,
+                debounce=True,
+                style={"width": "60px"},
+            ),
+        ], style={"display": "flex", "alignItems": "center", "gap": "5px"}),
+
+        # Prévia do impacto com os limites em edição
+        html.Div([
+            html.Div(id={"type": "previa-analista", "analista": analista}),
+            html.Div(
+                id={"type": "previa-condicoes-analista", "analista": analista},
+                style={"color": "#666", "fontSize": "11px"},
+            ),
+        ], style={"fontSize": "12px", "marginLeft": "auto", "textAlign": "right"}),
+
+    ], style={
+        "display": "flex",
+        "gap": "15px",
+        "marginBottom": "12px",
+        "alignItems": "center",
+        "padding": "10px",
+        "backgroundColor": "white",
+        "borderRadius": "5px",
+        "border": "1px solid #e0e0e0",
+    })
+
+
+# Cores das colunas de status nas tabelas de pontos
+ESTILO_STATUS_PONTOS = [
+    # STATUS DO PONTO DE MONITORAMENTO
+    {
+        'if': {
+            'filter_query': '{STATUS DO PONTO DE MONITORAMENTO} is blank || {STATUS DO PONTO DE MONITORAMENTO} = ""',
+            'column_id': 'STATUS DO PONTO DE MONITORAMENTO'
+        },
+        'backgroundColor': '#e0e0e0',
+        'color': '#666'
+    },
+    {
+        'if': {
+            'filter_query': '{STATUS DO PONTO DE MONITORAMENTO} contains "no-alert"',
+            'column_id': 'STATUS DO PONTO DE MONITORAMENTO'
+        },
+        'backgroundColor': '#4caf50',
+        'color': 'white',
+        'fontWeight': 'bold'
+    },
+    {
+        'if': {
+            'filter_query': '{STATUS DO PONTO DE MONITORAMENTO} contains "a1" || {STATUS DO PONTO DE MONITORAMENTO} contains "A1"',
+            'column_id': 'STATUS DO PONTO DE MONITORAMENTO'
+        },
+        'backgroundColor': '#ffeb3b',
+        'color': 'black',
+        'fontWeight': 'bold'
+    },
+    {
+        'if': {
+            'filter_query': '{STATUS DO PONTO DE MONITORAMENTO} contains "a2" || {STATUS DO PONTO DE MONITORAMENTO} contains "A2"',
+            'column_id': 'STATUS DO PONTO DE MONITORAMENTO'
+        },
+        'backgroundColor': '#ff4444',
+        'color': 'white',
+        'fontWeight': 'bold'
+    },
+
+    # STATUS DA ÚLTIMA ANÁLISE
+    {
+        'if': {
+            'filter_query': '{STATUS DA ÚLTIMA ANÁLISE} = "NUNCA ANALISADO"',
+            'column_id': 'STATUS DA ÚLTIMA ANÁLISE'
+        },
+        'backgroundColor': '#e0e0e0',
+        'color': '#666'
+    },
+    {
+        'if': {
+            'filter_query': '{STATUS DA ÚLTIMA ANÁLISE} = "NORMAL"',
+            'column_id': 'STATUS DA ÚLTIMA ANÁLISE'
+        },
+        'backgroundColor': '#4caf50',
+        'color': 'white',
+        'fontWeight': 'bold'
+    },
+    {
+        'if': {
+            'filter_query': '{STATUS DA ÚLTIMA ANÁLISE} = "ALERTA"',
+            'column_id': 'STATUS DA ÚLTIMA ANÁLISE'
+        },
+        'backgroundColor': '#ffeb3b',
+        'color': 'black',
+        'fontWeight': 'bold'
+    },
+    {
+        'if': {
+            'filter_query': '{STATUS DA ÚLTIMA ANÁLISE} = "INTERVENÇÃO"',
+            'column_id': 'STATUS DA ÚLTIMA ANÁLISE'
+        },
+        'backgroundColor': '#ff4444',
+        'color': 'white',
+        'fontWeight': 'bold'
+    },
+]
+
+# Células das tabelas de pontos (lista e pontos da máquina expandida)
+ESTILO_CELULA_PONTOS = {
+    'textAlign': 'left',
+    'padding': '8px',
+}
+
+
 layout = html.Div([
 
     html.H1("PRIORIZAÇÃO DE ANÁLISE", style={"textAlign": "center", "marginBottom": "30px"}),
@@ -149,6 +330,15 @@ layout = html.Div([
                         ),
                     ], style={"textAlign": "center"}),
 
+                    # Atualização parcial: só as linhas novas do mosaic
+                    html.Div([
+                        upload_box(
+                            "MOSAIC DELTA.CSV",
+                            "upload-mosaic-delta",
+                            "Só as linhas novas (spotLastSync após a última carga); atualiza a base já processada"
+                        ),
+                    ], style={"marginTop": "20px", "borderTop": "1px solid #ddd", "paddingTop": "15px"}),
+
                 ], style={"padding": "20px"}),
 
             ], style={
@@ -195,19 +385,38 @@ layout = html.Div([
         dcc.Input(
             id="dias-coleta-atualizada",
             type="number",
-            value=7,
+            value=DEFAULT_DIAS_COLETA,
             min=0,
             debounce=True,
             style={"width": "100px"},
         ),
     ], style={"marginBottom": "15px"}),
+    html.Div([
+        html.Label("MÁQUINAS POR ANALISTA (TOP K POR PRIORIDADE)"),
+        html.Div("Vazio = todas as máquinas qualificadas, em ordem alfabética.",
+                 style={"fontSize": "12px", "color": "#666", "marginBottom": "8px"}),
+        dcc.Input(
+            id="top-k-maquinas",
+            type="number",
+            min=1,
+            debounce=True,
+            style={"width": "100px"},
+        ),
+    ], style={"marginBottom": "15px"}),
 
     html.Hr(),
 
     # --- stores internos ---
-    dcc.Store(id="df-base"),
-    dcc.Store(id="df-final"),
-    dcc.Store(id="filtros-por-analista", data={}),  # Store para filtros individuais
+    dcc.Location(id="url"),  # Dispara a restauração da última base ao abrir a página
+    dcc.Store(id="df-base"),  # {"dataset_id": ...} da base gravada no servidor
+    dcc.Store(id="df-final"),  # {"chave": ..., "parametros": ...} do resultado gravado no servidor
+    dcc.Store(id="sessao-id", storage_type="session"),  # Identifica a aba: avaliações superadas e base restaurada
+    dcc.Store(id="geracao-avaliacao"),  # Carimbo da última mudança de entrada das regras
+    dcc.Store(id="filtros-por-analista", data={}),  # Store para filtros individuais (em edição)
+    dcc.Store(id="filtros-aplicados", data={}),  # Filtros efetivamente usados nas regras
+    dcc.Store(id="histogramas-analista"),  # Acumulados por condição para prévia O(1)
+    dcc.Store(id="snapshot-regras"),  # Indicadores em binário para avaliar as regras no navegador
+    dcc.Store(id="diagnostico-cruzamentos"),  # Cobertura de cada cruzamento do último processamento
     
     # Loading indicator
     dcc.Loading(
@@ -217,8 +426,67 @@ layout = html.Div([
         children=html.Div(id="loading-output")
     ),
 
+    # --- diagnóstico dos cruzamentos (chaves sem correspondência) ---
+    html.H4("DIAGNÓSTICO DOS CRUZAMENTOS"),
+    html.Div(id="painel-diagnostico", style={"marginBottom": "15px"}),
+
+    html.Hr(),
+
     # --- tabela resumo ---
     html.H4("IMPACTO POR ANALISTA"),
+
+    # Modo em lote: edições ficam pendentes até clicar em "Aplicar limites"
+    html.Div([
+        dcc.Checklist(
+            id="modo-aplicacao-lote",
+            options=[{"label": " Aplicar limites em lote", "value": "lote"}],
+            value=[],
+            inline=True,
+        ),
+        html.Button(
+            "✓ Aplicar limites",
+            id="btn-aplicar-limites",
+            n_clicks=0,
+            style={
+                "padding": "6px 20px",
+                "backgroundColor": "#1976d2",
+                "color": "white",
+                "border": "none",
+                "borderRadius": "5px",
+                "cursor": "pointer",
+                "fontWeight": "bold",
+            }
+        ),
+    ], style={"display": "flex", "alignItems": "center", "gap": "15px", "marginBottom": "10px"}),
+
+    # Avaliação no navegador: a tabela por analista responde na hora e a
+    # lista detalhada só é recalculada no servidor pelo botão
+    html.Div([
+        dcc.Checklist(
+            id="avaliacao-navegador",
+            options=[{"label": " Calcular contagens no navegador", "value": "navegador"}],
+            value=[],
+            inline=True,
+        ),
+        html.Button(
+            "⟳ Atualizar lista detalhada",
+            id="btn-atualizar-lista",
+            n_clicks=0,
+            style={
+                "padding": "6px 20px",
+                "backgroundColor": "#546e7a",
+                "color": "white",
+                "border": "none",
+                "borderRadius": "5px",
+                "cursor": "pointer",
+                "fontWeight": "bold",
+            }
+        ),
+        html.Span(
+            "Com Top-K preenchido a contagem continua no servidor.",
+            style={"color": "#666", "fontStyle": "italic", "fontSize": "13px"}
+        ),
+    ], style={"display": "flex", "alignItems": "center", "gap": "15px", "marginBottom": "10px"}),
     
     # Container para filtros dinâmicos por analista
     html.Div(
@@ -270,101 +538,150 @@ layout = html.Div([
 
     html.Hr(),
 
-    # --- tabela principal ---
-    html.H4("LISTA FINAL"),
+    # --- simulação de limites (varredura what-if) ---
+    html.H4("SIMULAÇÃO DE LIMITES"),
+    html.Div(
+        "Informe valores separados por vírgula. Campos vazios mantêm o valor atual "
+        "(limites de cada analista e linha de corte global).",
+        style={"fontSize": "12px", "color": "#666", "marginBottom": "8px"},
+    ),
+    html.Div([
+        html.Div([
+            html.Label(rotulo, style={"fontSize": "11px", "display": "block"}),
+            dcc.Input(id=grade_id, type="text", placeholder="ex.: 7, 15, 30", style={"width": "140px"}),
+        ])
+        for rotulo, grade_id in [
+            ("Coleta (dias)", "grade-dias-coleta"),
+            ("Alarmes (dias)", "grade-dias-alarmes"),
+            ("Insights (dias)", "grade-dias-insights"),
+            ("Notas (dias)", "grade-dias-notas"),
+        ]
+    ] + [
+        dcc.RadioItems(
+            id="faixa-simulacao",
+            options=[
+                {"label": " Todos no verde (< 300)", "value": 300},
+                {"label": " Até o amarelo (< 400)", "value": 400},
+            ],
+            value=300,
+            style={"fontSize": "12px"},
+        ),
+        html.Button("Simular", id="btn-simular", n_clicks=0),
+    ], style={"display": "flex", "alignItems": "flex-end", "gap": "15px", "marginBottom": "10px"}),
+    html.Div(id="resultado-simulacao", style={"marginBottom": "10px"}),
     dash_table.DataTable(
-        id="tabela-final",
-        filter_action="native",
+        id="tabela-simulacao",
+        page_size=15,
         sort_action="native",
-        page_action="none",
-        style_table={
-            "height": "500px",
-            "overflowY": "auto",
-        },
-        style_cell={
-            'textAlign': 'left',
-            'padding': '8px',
-        },
+        style_cell={'textAlign': 'left'},
         style_data_conditional=[
-            # STATUS DO PONTO DE MONITORAMENTO
-            {
-                'if': {
-                    'filter_query': '{STATUS DO PONTO DE MONITORAMENTO} is blank || {STATUS DO PONTO DE MONITORAMENTO} = ""',
-                    'column_id': 'STATUS DO PONTO DE MONITORAMENTO'
-                },
-                'backgroundColor': '#e0e0e0',
-                'color': '#666'
-            },
-            {
-                'if': {
-                    'filter_query': '{STATUS DO PONTO DE MONITORAMENTO} contains "no-alert"',
-                    'column_id': 'STATUS DO PONTO DE MONITORAMENTO'
-                },
-                'backgroundColor': '#4caf50',
-                'color': 'white',
-                'fontWeight': 'bold'
-            },
-            {
-                'if': {
-                    'filter_query': '{STATUS DO PONTO DE MONITORAMENTO} contains "a1" || {STATUS DO PONTO DE MONITORAMENTO} contains "A1"',
-                    'column_id': 'STATUS DO PONTO DE MONITORAMENTO'
-                },
-                'backgroundColor': '#ffeb3b',
-                'color': 'black',
-                'fontWeight': 'bold'
-            },
-            {
-                'if': {
-                    'filter_query': '{STATUS DO PONTO DE MONITORAMENTO} contains "a2" || {STATUS DO PONTO DE MONITORAMENTO} contains "A2"',
-                    'column_id': 'STATUS DO PONTO DE MONITORAMENTO'
-                },
-                'backgroundColor': '#ff4444',
-                'color': 'white',
-                'fontWeight': 'bold'
-            },
-            
-            # STATUS DA ÚLTIMA ANÁLISE
-            {
-                'if': {
-                    'filter_query': '{STATUS DA ÚLTIMA ANÁLISE} = "NUNCA ANALISADO"',
-                    'column_id': 'STATUS DA ÚLTIMA ANÁLISE'
-                },
-                'backgroundColor': '#e0e0e0',
-                'color': '#666'
-            },
-            {
-                'if': {
-                    'filter_query': '{STATUS DA ÚLTIMA ANÁLISE} = "NORMAL"',
-                    'column_id': 'STATUS DA ÚLTIMA ANÁLISE'
-                },
-                'backgroundColor': '#4caf50',
-                'color': 'white',
-                'fontWeight': 'bold'
-            },
             {
-                'if': {
-                    'filter_query': '{STATUS DA ÚLTIMA ANÁLISE} = "ALERTA"',
-                    'column_id': 'STATUS DA ÚLTIMA ANÁLISE'
-                },
-                'backgroundColor': '#ffeb3b',
-                'color': 'black',
-                'fontWeight': 'bold'
-            },
-            {
-                'if': {
-                    'filter_query': '{STATUS DA ÚLTIMA ANÁLISE} = "INTERVENÇÃO"',
-                    'column_id': 'STATUS DA ÚLTIMA ANÁLISE'
-                },
-                'backgroundColor': '#ff4444',
-                'color': 'white',
+                'if': {'filter_query': '{RECOMENDADA} = "✔"'},
+                'backgroundColor': '#c8e6c9',
                 'fontWeight': 'bold'
             },
         ],
     ),
 
+    html.Hr(),
+
+    # --- tabela principal ---
+    html.H4("LISTA FINAL"),
+    # Com as contagens no navegador, a lista e os downloads ficam na última
+    # avaliação do servidor até o "Atualizar lista detalhada"
+    html.Div(
+        id="aviso-lista-desatualizada",
+        style={"display": "none"},
+        children="⚠️ A tabela por analista já mostra os limites atuais, mas a lista e os downloads são da "
+                 "avaliação anterior. Clique em \"⟳ Atualizar lista detalhada\" para sincronizar.",
+    ),
+    dcc.RadioItems(
+        id="modo-visualizacao",
+        options=[
+            {"label": " Lista de pontos", "value": "lista"},
+            {"label": " Agrupada por máquina", "value": "maquina"},
+        ],
+        value="lista",
+        inline=True,
+        style={"marginBottom": "10px"},
+    ),
+    html.Div(id="container-lista", children=[
+        dash_table.DataTable(
+            id="tabela-final",
+            filter_action="native",
+            sort_action="native",
+            page_action="none",
+            style_table={
+                "height": "500px",
+                "overflowY": "auto",
+            },
+            style_cell=ESTILO_CELULA_PONTOS,
+            style_data_conditional=ESTILO_STATUS_PONTOS,
+        ),
+    ]),
+
+    # Uma linha por máquina; os pontos vêm do servidor ao clicar na máquina
+    html.Div(id="container-maquinas", style={"display": "none"}, children=[
+        html.Div("Clique em uma máquina para ver os pontos.",
+                 style={"fontSize": "12px", "color": "#666", "marginBottom": "8px"}),
+        dash_table.DataTable(
+            id="tabela-maquinas",
+            filter_action="native",
+            sort_action="native",
+            page_action="none",
+            style_table={
+                "height": "350px",
+                "overflowY": "auto",
+            },
+            style_cell=ESTILO_CELULA_PONTOS,
+        ),
+        html.H5(id="titulo-pontos-maquina", style={"marginTop": "15px"}),
+        dash_table.DataTable(
+            id="tabela-pontos-maquina",
+            page_action="none",
+            style_table={"overflowX": "auto"},
+            style_cell=ESTILO_CELULA_PONTOS,
+            style_data_conditional=ESTILO_STATUS_PONTOS,
+        ),
+    ]),
+
     html.Br(),
     html.Button("Download Excel", id="btn-download"),
+    html.Button("Download por Analista (zip)", id="btn-download-analistas", style={"marginLeft": "10px"}),
     dcc.Download(id="download-excel"),
+    dcc.Download(id="download-zip-analistas"),
+
+    html.Hr(),
+
+    # --- comparação com a lista anterior (novos, saíram, alterados) ---
+    html.H4("MUDANÇAS DESDE A LISTA ANTERIOR"),
+    html.Div(
+        "Sem arquivo, a lista atual é comparada com a última lista baixada (Download Excel) antes de hoje. "
+        "O Excel baixado traz a comparação na aba MUDANÇAS.",
+        style={"fontSize": "12px", "color": "#666", "marginBottom": "8px"},
+    ),
+    html.Div(
+        upload_box(
+            "LISTA ANTERIOR (opcional)",
+            "upload-lista-anterior",
+            "LISTA_FINAL_PRIORIZADA.xlsx de outro dia",
+        ),
+        style={"maxWidth": "400px", "marginBottom": "10px"},
+    ),
+    html.Div(id="resumo-mudancas", style={"marginBottom": "10px"}),
+    dash_table.DataTable(
+        id="tabela-mudancas",
+        filter_action="native",
+        sort_action="native",
+        page_size=20,
+        style_table={"overflowX": "auto"},
+        style_cell={"textAlign": "left"},
+        style_data_conditional=[
+            {"if": {"filter_query": '{MUDANÇA} = "NOVO"'}, "backgroundColor": "#c8e6c9"},
+            {"if": {"filter_query": '{MUDANÇA} = "SAIU"'}, "backgroundColor": "#ffcdd2"},
+            {"if": {"filter_query": '{MUDANÇA} = "ALTERADO"'}, "backgroundColor": "#fff9c4"},
+        ],
+    ),
 ], style={
     "backgroundColor": "#f5f5f5",
     "padding": "30px",
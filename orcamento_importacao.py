@@ -0,0 +1,110 @@
+# orcamento_importacao.py
+# Verificação do custo de boot do app: tempo de importação, primeira página e módulos pesados carregados
+#
+# Uso (antes do deploy; no CI roda pelo pytest, ver tests/test_orcamento_importacao.py):
+#   python orcamento_importacao.py
+#   python orcamento_importacao.py --repeticoes 5 --segundos-app 0.5 --segundos-pagina 0.5
+#
+# Cada medição roda num processo novo (importação a frio). O tempo do próprio
+# app é o de 'import app' menos o de 'import dash', que não depende deste
+# código. Sai com código 1 se algum orçamento estourar ou se pandas, pyarrow
+# ou openpyxl forem carregados antes do primeiro processamento.
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+
+# Só devem ser importados pelos callbacks de processamento (ver callbacks.py).
+# numpy fica de fora: o serializador JSON do Dash (plotly) o carrega ao
+# servir o layout, independente do app.
+MODULOS_PESADOS = ["pandas", "pyarrow", "openpyxl", "xlsxwriter"]
+
+ORCAMENTO_SEGUNDOS_APP = 0.5
+ORCAMENTO_SEGUNDOS_PAGINA = 0.5
+
+# Medido no processo filho: importação, página inicial e layout do Dash
+MEDICAO = """
+import json, sys, time
+inicio = time.perf_counter()
+import dash
+meio = time.perf_counter()
+import app
+fim = time.perf_counter()
+cliente = app.app.server.test_client()
+for rota in ("/", "/_dash-layout", "/_dash-dependencies"):
+    resposta = cliente.get(rota)
+    assert resposta.status_code == 200, (rota, resposta.status_code)
+pagina = time.perf_counter()
+print(json.dumps({
+    "dash": meio - inicio,
+    "app": fim - meio,
+    "pagina": pagina - fim,
+    "pesados": sorted(m for m in MODULOS if m in sys.modules),
+}))
+"""
+
+
+def medir() -> dict:
+    """Uma medição a frio (processo novo) com o -X importtime ligado."""
+    pasta = os.path.dirname(os.path.abspath(__file__))
+    codigo = "MODULOS = " + json.dumps(MODULOS_PESADOS) + "\n" + MEDICAO
+    processo = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", codigo],
+        cwd=pasta, capture_output=True, text=True, check=True,
+    )
+    medicao = json.loads(processo.stdout.strip().splitlines()[-1])
+    medicao["importtime"] = processo.stderr
+    return medicao
+
+
+def modulos_do_app(importtime: str, pasta: str, limite: int = 10) -> list:
+    """Módulos do repositório por tempo acumulado de importação (µs)."""
+    locais = {nome[:-3] for nome in os.listdir(pasta) if nome.endswith(".py")}
+    tempos = []
+    for linha in importtime.splitlines():
+        achado = re.match(r"import time:\s+\d+ \|\s+(\d+) \|\s+(\S+)$", linha)
+        if achado and achado.group(2) in locais:
+            tempos.append((int(achado.group(1)), achado.group(2)))
+    return sorted(tempos, reverse=True)[:limite]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verifica o orçamento de importação e da primeira página do app.")
+    parser.add_argument("--repeticoes", type=int, default=3, help="medições a frio; vale a menor (padrão 3)")
+    parser.add_argument("--segundos-app", type=float, default=ORCAMENTO_SEGUNDOS_APP,
+                        help=f"máximo para 'import app' além do dash (padrão {ORCAMENTO_SEGUNDOS_APP})")
+    parser.add_argument("--segundos-pagina", type=float, default=ORCAMENTO_SEGUNDOS_PAGINA,
+                        help=f"máximo para /, /_dash-layout e /_dash-dependencies (padrão {ORCAMENTO_SEGUNDOS_PAGINA})")
+    args = parser.parse_args()
+
+    medicoes = [medir() for _ in range(max(args.repeticoes, 1))]
+    melhor = min(medicoes, key=lambda m: m["app"] + m["pagina"])
+    pesados = sorted({m for medicao in medicoes for m in medicao["pesados"]})
+
+    print(f"import dash: {melhor['dash']:.2f}s")
+    print(f"import app (sem o dash): {melhor['app']:.2f}s (orçamento {args.segundos_app:.2f}s)")
+    print(f"primeira página: {melhor['pagina']:.2f}s (orçamento {args.segundos_pagina:.2f}s)")
+    print("Módulos do app por tempo acumulado:")
+    for micros, modulo in modulos_do_app(melhor["importtime"], os.path.dirname(os.path.abspath(__file__))):
+        print(f"  {modulo}: {micros / 1000:.0f} ms")
+
+    falhas = []
+    if melhor["app"] > args.segundos_app:
+        falhas.append(f"import app levou {melhor['app']:.2f}s (orçamento {args.segundos_app:.2f}s)")
+    if melhor["pagina"] > args.segundos_pagina:
+        falhas.append(f"primeira página levou {melhor['pagina']:.2f}s (orçamento {args.segundos_pagina:.2f}s)")
+    if pesados:
+        falhas.append(f"módulos pesados carregados no boot: {', '.join(pesados)}")
+
+    for falha in falhas:
+        print(f"ERRO: {falha}")
+    if falhas:
+        sys.exit(1)
+    print("OK: dentro do orçamento")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+# parametros.py
+# Valores padrão dos parâmetros das regras (compartilhados pelo app e pela CLI)
+
+import os
+
+# ======================================================
+# VALORES PADRÃO DOS PARÂMETROS (dias)
+# ======================================================
+DEFAULT_DIAS_ALARMES = 15
+DEFAULT_DIAS_INSIGHTS = 7
+DEFAULT_DIAS_NOTAS = 15
+
+# Filtro global: máquinas com coleta mais antiga que isso saem da lista
+DEFAULT_DIAS_COLETA = 7
+
+# ======================================================
+# EXECUÇÃO
+# ======================================================
+# Backend das etapas de cruzamento do processamento: "pandas" ou "arrow"
+BACKEND_PROCESSAMENTO = os.environ.get("PRIORIZACAO_BACKEND", "pandas")
+
+# Mosaic e notas em .csv maiores que isso (MB) são lidos e agregados em
+# blocos de LINHAS_POR_BLOCO linhas, sem carregar o arquivo inteiro
+LIMITE_MB_EM_MEMORIA = float(os.environ.get("PRIORIZACAO_LIMITE_MB_EM_MEMORIA", 200))
+LINHAS_POR_BLOCO = int(os.environ.get("PRIORIZACAO_LINHAS_POR_BLOCO", 250000))
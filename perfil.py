@@ -0,0 +1,272 @@
+# perfil.py
+# Perfilamento sob demanda dos callbacks pesados (cProfile + tracemalloc) com download dos relatórios
+#
+# Ativação, sem mudar código:
+#   - PRIORIZACAO_PERFIL="processar_base=2,aplicar_regras=5" perfila as próximas
+#     N chamadas de cada callback em cada worker (contado a partir do boot);
+#   - POST /api/admin/perfis/armar?callback=aplicar_regras&n=3 (com o token de
+#     PRIORIZACAO_ADMIN_TOKEN em X-Admin-Token ou ?token=) arma as próximas N
+#     chamadas em qualquer worker (contador compartilhado em disco).
+#
+# Cada chamada perfilada grava em dados/perfis/:
+#   <nome>.prof        estatísticas do cProfile (pstats; abre no snakeviz/pstats)
+#   <nome>.txt         resumo: funções por tempo acumulado e memória rastreada
+#
+# O tracemalloc mede o processo inteiro: com várias threads por worker (ver
+# Procfile), o pico inclui as requisições que rodaram ao mesmo tempo. Para
+# medir só o callback, perfile num worker de uma thread
+# (gunicorn app:app --workers 1 --threads 1).
+
+import cProfile
+import fcntl
+import functools
+import hmac
+import io
+import json
+import logging
+import os
+import pstats
+import re
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+
+from flask import jsonify, request, send_file
+
+from armazenamento import DIR_DADOS
+
+logger = logging.getLogger(__name__)
+
+DIR_PERFIS = os.path.join(DIR_DADOS, "perfis")
+ARQUIVO_ARMADOS = os.path.join(DIR_PERFIS, "armados.json")
+
+CALLBACKS_PERFILAVEIS = ["processar_base", "aplicar_regras", "download_excel"]
+MAX_RELATORIOS = 60
+LINHAS_RESUMO = 40
+
+EXTENSOES_RELATORIO = (".prof", ".txt")
+
+
+def _ler_ambiente() -> dict:
+    """'processar_base=2,aplicar_regras' -> {"processar_base": 2, "aplicar_regras": 1}."""
+    armados = {}
+    for item in os.environ.get("PRIORIZACAO_PERFIL", "").split(","):
+        nome, _, n = item.strip().partition("=")
+        if nome in CALLBACKS_PERFILAVEIS:
+            armados[nome] = int(n) if n.strip().isdigit() else 1
+    return armados
+
+
+# Contadores do próprio processo (variável de ambiente)
+_armados_locais = _ler_ambiente()
+_armados_lock = threading.Lock()
+
+# tracemalloc é global ao processo: liga com a primeira chamada perfilada e
+# desliga com a última (chamadas concorrentes em threads diferentes)
+_rastreando = 0
+_rastreio_lock = threading.Lock()
+
+
+# ======================================================
+# CONTADORES (PROCESSO E COMPARTILHADO ENTRE WORKERS)
+# ======================================================
+
+def _com_armados_compartilhados(alterar):
+    """Lê e regrava armados.json sob lock de arquivo (workers do gunicorn)."""
+    os.makedirs(DIR_PERFIS, exist_ok=True)
+    with open(ARQUIVO_ARMADOS + ".lock", "w") as trava:
+        fcntl.flock(trava, fcntl.LOCK_EX)
+        try:
+            with open(ARQUIVO_ARMADOS, encoding="utf-8") as f:
+                armados = json.load(f)
+        except (OSError, ValueError):
+            armados = {}
+        resultado = alterar(armados)
+        with open(ARQUIVO_ARMADOS + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(armados, f)
+        os.replace(ARQUIVO_ARMADOS + ".tmp", ARQUIVO_ARMADOS)
+        return resultado
+
+
+def armar(callback: str, n: int) -> dict:
+    """Arma as próximas n chamadas do callback (n=0 desarma). Retorna os armados."""
+    if callback not in CALLBACKS_PERFILAVEIS:
+        raise ValueError(f"callback deve ser um de: {', '.join(CALLBACKS_PERFILAVEIS)}")
+
+    def alterar(armados):
+        if n > 0:
+            armados[callback] = n
+        else:
+            armados.pop(callback, None)
+        return dict(armados)
+
+    return _com_armados_compartilhados(alterar)
+
+
+def _consumir(callback: str) -> bool:
+    """Gasta uma chamada armada (do processo ou compartilhada), se houver."""
+    with _armados_lock:
+        if _armados_locais.get(callback, 0) > 0:
+            _armados_locais[callback] -= 1
+            return True
+
+    # Sem nada armado, evita abrir o lock a cada chamada
+    if not os.path.exists(ARQUIVO_ARMADOS):
+        return False
+
+    def alterar(armados):
+        if armados.get(callback, 0) <= 0:
+            return False
+        armados[callback] -= 1
+        if armados[callback] == 0:
+            del armados[callback]
+        return True
+
+    return _com_armados_compartilhados(alterar)
+
+
+# ======================================================
+# PERFILAMENTO
+# ======================================================
+
+def _iniciar_rastreio() -> bool:
+    """Liga o tracemalloc; retorna False se outra chamada perfilada já o usa."""
+    global _rastreando
+    with _rastreio_lock:
+        if _rastreando == 0:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+        _rastreando += 1
+        return _rastreando == 1
+
+
+def _parar_rastreio():
+    global _rastreando
+    with _rastreio_lock:
+        _rastreando -= 1
+        if _rastreando == 0:
+            tracemalloc.stop()
+
+
+def _limpar_antigos():
+    relatorios = sorted(
+        (os.path.join(DIR_PERFIS, n) for n in os.listdir(DIR_PERFIS) if n.endswith(".prof")),
+        key=os.path.getmtime,
+    )
+    for caminho in relatorios[:-MAX_RELATORIOS]:
+        base = caminho[:-len(".prof")]
+        for extensao in EXTENSOES_RELATORIO:
+            if os.path.exists(base + extensao):
+                os.remove(base + extensao)
+
+
+def _gravar_relatorio(callback: str, perfil: cProfile.Profile, memoria: dict, segundos: float, erro: str):
+    os.makedirs(DIR_PERFIS, exist_ok=True)
+    nome = f"{datetime.now():%Y%m%d-%H%M%S}-{callback}-{os.getpid()}-{threading.get_ident() % 10000:04d}"
+    base = os.path.join(DIR_PERFIS, nome)
+
+    perfil.dump_stats(base + ".prof")
+
+    mb = 1024 * 1024
+    resumo = io.StringIO()
+    resumo.write(f"{callback} em {segundos:.2f}s (pid {os.getpid()})")
+    resumo.write(f" - terminou com {erro}\n" if erro else "\n")
+    resumo.write(
+        "Memória rastreada do PROCESSO durante a chamada (todas as threads, não só este callback): "
+        f"{memoria['inicio'] / mb:.1f} MB no início, pico {memoria['pico'] / mb:.1f} MB "
+        f"(+{(memoria['pico'] - memoria['inicio']) / mb:.1f} MB), {memoria['fim'] / mb:.1f} MB no fim\n"
+    )
+    if not memoria["sozinha"]:
+        resumo.write("Outra chamada perfilada rodava ao mesmo tempo: o pico inclui as duas.\n")
+    resumo.write(f"\n=== FUNÇÕES POR TEMPO ACUMULADO (top {LINHAS_RESUMO}) ===\n")
+    pstats.Stats(perfil, stream=resumo).sort_stats("cumulative").print_stats(LINHAS_RESUMO)
+    with open(base + ".txt", "w", encoding="utf-8") as f:
+        f.write(resumo.getvalue())
+
+    _limpar_antigos()
+    logger.info("perfil de %s gravado em %s.prof/.txt", callback, base)
+
+
+def perfilavel(callback: str):
+    """
+    Decorador dos callbacks: quando há chamadas armadas para 'callback', roda
+    a chamada sob cProfile e tracemalloc e grava o relatório. PreventUpdate e
+    erros também geram relatório (e continuam sendo levantados).
+    """
+    def decorador(funcao):
+        @functools.wraps(funcao)
+        def executar(*args, **kwargs):
+            if not _consumir(callback):
+                return funcao(*args, **kwargs)
+
+            perfil = cProfile.Profile()
+            sozinha = _iniciar_rastreio()
+            memoria = {"sozinha": sozinha, "inicio": tracemalloc.get_traced_memory()[0]}
+            inicio = time.perf_counter()
+            erro = None
+            try:
+                return perfil.runcall(funcao, *args, **kwargs)
+            except BaseException as e:
+                erro = type(e).__name__
+                raise
+            finally:
+                segundos = time.perf_counter() - inicio
+                memoria["fim"], memoria["pico"] = tracemalloc.get_traced_memory()
+                _parar_rastreio()
+                try:
+                    _gravar_relatorio(callback, perfil, memoria, segundos, erro)
+                except Exception:
+                    logger.exception("erro ao gravar perfil de %s", callback)
+        return executar
+    return decorador
+
+
+# ======================================================
+# ROTAS DE ADMINISTRAÇÃO
+# ======================================================
+
+def _autorizado() -> bool:
+    esperado = os.environ.get("PRIORIZACAO_ADMIN_TOKEN")
+    recebido = request.headers.get("X-Admin-Token") or request.args.get("token") or ""
+    return bool(esperado) and hmac.compare_digest(recebido, esperado)
+
+
+def register_perfis(server):
+    """Registra as rotas de perfilamento (exigem PRIORIZACAO_ADMIN_TOKEN)."""
+
+    @server.before_request
+    def exigir_admin():
+        if request.path.startswith("/api/admin/") and not _autorizado():
+            return jsonify({"erro": "acesso restrito (token de administrador)"}), 403
+        return None
+
+    @server.route("/api/admin/perfis")
+    def listar_perfis():
+        relatorios = []
+        if os.path.isdir(DIR_PERFIS):
+            for nome in sorted(os.listdir(DIR_PERFIS), reverse=True):
+                if nome.endswith(EXTENSOES_RELATORIO):
+                    caminho = os.path.join(DIR_PERFIS, nome)
+                    relatorios.append({"arquivo": nome, "bytes": os.path.getsize(caminho)})
+        armados = _com_armados_compartilhados(dict) if os.path.exists(ARQUIVO_ARMADOS) else {}
+        return jsonify({"armados": armados, "relatorios": relatorios})
+
+    @server.route("/api/admin/perfis/armar", methods=["POST"])
+    def armar_perfil():
+        try:
+            n = int(request.args.get("n", 1))
+            armados = armar(request.args.get("callback", ""), n)
+        except ValueError as e:
+            return jsonify({"erro": str(e)}), 400
+        return jsonify({"armados": armados})
+
+    @server.route("/api/admin/perfis/<arquivo>")
+    def baixar_perfil(arquivo):
+        if not re.fullmatch(r"[\w\-]+\.(prof|txt)", arquivo):
+            return jsonify({"erro": "arquivo inválido"}), 400
+        caminho = os.path.join(DIR_PERFIS, arquivo)
+        if not os.path.isfile(caminho):
+            return jsonify({"erro": f"relatório '{arquivo}' não encontrado"}), 404
+        return send_file(caminho, as_attachment=True, download_name=arquivo)
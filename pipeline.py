@@ -0,0 +1,518 @@
+# pipeline.py
+# Etapas de processamento sem dependência do Dash (usadas pelos callbacks e pela CLI)
+
+import logging
+
+import numpy as np
+import pandas as pd
+
+from blocos import TabelaEmBlocos, mapear_concatenado_em_blocos
+from execucao import obter_backend
+from fatos import COLUNAS_FATOS, reduzir_por_spot
+from helpers import days_since_last_sync, dias_desde_sincronizacao, montar_tabela_maquinas, clean_insights, normalizar_ordem, resumir_cobertura, posicoes_das_maquinas, calcular_prioridade, selecionar_top_k
+from regras import PLANO_REGRAS
+from parametros import DEFAULT_DIAS_ALARMES, DEFAULT_DIAS_INSIGHTS, DEFAULT_DIAS_NOTAS
+
+logger = logging.getLogger(__name__)
+
+
+def config_por_analista_de_filtros(filtros: dict, analistas) -> dict:
+    """
+    Converte o store de filtros ({analista: {"alarmes", "dias_alarmes", ...}})
+    na configuração usada pelas regras, completando valores vazios com os
+    defaults. Analistas ausentes do store recebem a configuração padrão.
+    """
+    filtros = filtros or {}
+    config_por_analista = {}
+    for analista in analistas:
+        filtro = filtros.get(analista)
+        if filtro is None:
+            filtro = {"alarmes": ["A1", "A2"]}
+        config_por_analista[analista] = {
+            "filtro_alarme": filtro.get("alarmes") or [],
+            "dias_alarmes": filtro.get("dias_alarmes") if filtro.get("dias_alarmes") is not None else DEFAULT_DIAS_ALARMES,
+            "dias_insights": filtro.get("dias_insights") if filtro.get("dias_insights") is not None else DEFAULT_DIAS_INSIGHTS,
+            "dias_notas": filtro.get("dias_notas") if filtro.get("dias_notas") is not None else DEFAULT_DIAS_NOTAS,
+        }
+    return config_por_analista
+
+
+# Colunas do mosaic usadas no processamento (as que ficam gravadas no dataset)
+COLUNAS_MOSAIC = ["spotId", "status", "analysisCreatedAt", "analysisStatus", "spotLastSync"]
+
+# Colunas da base que dependem só do mosaic
+COLUNAS_DO_MOSAIC = [
+    "STATUS DO PONTO DE MONITORAMENTO",
+    "DATA DA ÚLTIMA ANÁLISE",
+    "STATUS DA ÚLTIMA ANÁLISE",
+    "DATA DA ÚLTIMA COLETA",
+]
+
+
+def processar_analysis_status(status_str):
+    """Converte o analysisStatus do mosaic em label legível."""
+    if pd.isna(status_str) or str(status_str).strip() in ["", "-"]:
+        return "NUNCA ANALISADO"
+    status_lower = str(status_str).lower().strip()
+    if status_lower == "a1":
+        return "ALERTA"
+    elif status_lower == "a2":
+        return "INTERVENÇÃO"
+    elif status_lower == "no-alert":
+        return "NORMAL"
+    else:
+        return status_str
+
+
+# Colunas agrupadas por spotId -> colunas da base (DATA_ANALISE_FMT vem de formatar_data_analise)
+COLUNAS_AGRUPADAS_MOSAIC = {
+    "status": "STATUS DO PONTO DE MONITORAMENTO",
+    "DATA_ANALISE_FMT": "DATA DA ÚLTIMA ANÁLISE",
+    "analysisStatus": "STATUS DA ÚLTIMA ANÁLISE",
+    # NÃO converter data para formato brasileiro - manter ISO para facilitar parse
+    "spotLastSync": "DATA DA ÚLTIMA COLETA",
+}
+
+
+def formatar_data_analise(mosaic: pd.DataFrame) -> pd.DataFrame:
+    """Acrescenta DATA_ANALISE_FMT (analysisCreatedAt em DD/MM/AAAA)."""
+    return mosaic.assign(DATA_ANALISE_FMT=pd.to_datetime(
+        mosaic["analysisCreatedAt"], errors="coerce", format="ISO8601"
+    ).dt.strftime("%d/%m/%Y"))
+
+
+def mapear_mosaic(spot_ids: pd.Series, mosaic, backend: str = None) -> pd.DataFrame:
+    """
+    Colunas da base derivadas do mosaic (COLUNAS_DO_MOSAIC) para os spots
+    informados, alinhadas ao índice de spot_ids. O mosaic pode ser um
+    DataFrame ou uma TabelaEmBlocos (.csv grande, agregado em blocos).
+    """
+    # --- mapeamentos (um agrupamento por spotId para as quatro colunas) ---
+    if isinstance(mosaic, TabelaEmBlocos):
+        colunas = mapear_concatenado_em_blocos(
+            spot_ids, mosaic, "spotId", COLUNAS_AGRUPADAS_MOSAIC,
+            preparar=formatar_data_analise, lidas=COLUNAS_MOSAIC, backend=backend,
+        )
+    else:
+        colunas = obter_backend(backend).mapear_concatenado(
+            spot_ids, formatar_data_analise(mosaic), "spotId", COLUNAS_AGRUPADAS_MOSAIC,
+        )
+    # Mapear analysisStatus e processar para labels legíveis
+    colunas["STATUS DA ÚLTIMA ANÁLISE"] = colunas["STATUS DA ÚLTIMA ANÁLISE"].apply(processar_analysis_status)
+    return colunas[COLUNAS_DO_MOSAIC]
+
+
+def mesclar_mosaic(mosaic: pd.DataFrame, delta: pd.DataFrame):
+    """
+    Junta um delta do mosaic (ex.: só as linhas com spotLastSync mais novo
+    que a última carga) ao mosaic gravado. Nos spots do delta, status e
+    spotLastSync passam a ser os do delta e análises novas são acrescentadas
+    (a mesma análise, pelo analysisCreatedAt, fica com a versão do delta).
+    Retorna (mosaic mesclado, spotIds afetados).
+    """
+    faltando = [c for c in COLUNAS_MOSAIC if c not in delta.columns]
+    if faltando:
+        raise ValueError(f"Delta do mosaic sem as colunas: {', '.join(faltando)}")
+
+    delta = delta[COLUNAS_MOSAIC].dropna(subset=["spotId"])
+    afetados = delta["spotId"].unique()
+
+    afetado = mosaic["spotId"].isin(afetados)
+    anteriores = mosaic[afetado].copy()
+    atual = delta.drop_duplicates("spotId", keep="last").set_index("spotId")
+    anteriores["status"] = anteriores["spotId"].map(atual["status"])
+    anteriores["spotLastSync"] = anteriores["spotId"].map(atual["spotLastSync"])
+
+    # Análises reenviadas no delta substituem a versão gravada
+    reenviadas = pd.MultiIndex.from_frame(delta[["spotId", "analysisCreatedAt"]].dropna())
+    substituida = pd.MultiIndex.from_frame(anteriores[["spotId", "analysisCreatedAt"]]).isin(reenviadas)
+    anteriores = anteriores[~substituida]
+
+    mesclado = pd.concat([mosaic[~afetado], anteriores, delta], ignore_index=True)
+    return mesclado, afetados
+
+
+def aplicar_delta_mosaic(base: pd.DataFrame, spot_ids: pd.Series,
+                         mosaic: pd.DataFrame, delta: pd.DataFrame):
+    """
+    Atualiza a base processada com um delta do mosaic recalculando só as
+    COLUNAS_DO_MOSAIC dos spots afetados; notas, ordens e insights não são
+    refeitos. spot_ids é o SPOT ID de cada linha da base (mesma ordem).
+    Retorna (base atualizada, mosaic mesclado, quantidade de linhas afetadas).
+    """
+    mosaic, afetados = mesclar_mosaic(mosaic, delta)
+
+    linhas = spot_ids.isin(afetados).to_numpy()
+    base = base.copy()
+    if linhas.any():
+        novos = mapear_mosaic(
+            spot_ids[linhas], mosaic[mosaic["spotId"].isin(afetados)]
+        )
+        for coluna in COLUNAS_DO_MOSAIC:
+            base.loc[linhas, coluna] = novos[coluna].to_numpy()
+
+    return base, mosaic, int(linhas.sum())
+
+
+# Etapas do diagnóstico dos cruzamentos, na ordem do processamento
+ETAPAS_CRUZAMENTO = {
+    "mosaic": "SPOT ID sem linhas no mosaic",
+    "notas": "SUBCONJUNTO sem notas M4",
+    "ordens": "Ordens da nota sem status em ordem_notas",
+    "planos": "MÁQUINA sem ordens de plano AV",
+}
+
+
+def _cobertura_do_mapa(chaves: pd.Series, mapeada: pd.Series) -> dict:
+    """Cobertura de um mapear_concatenado: chave sem grupo fica NaN (grupo só com nulos vira "")."""
+    return resumir_cobertura(len(chaves), chaves[mapeada.isna().to_numpy()])
+
+
+def processar_arquivos(base: pd.DataFrame, mosaic, notas,
+                       ordem_notas: pd.DataFrame, ordem_planos: pd.DataFrame,
+                       insights: pd.DataFrame, backend: str = None) -> pd.DataFrame:
+    """
+    Cruza a base com os cinco arquivos auxiliares e retorna a base processada,
+    com as colunas de exibição e ordenada por MÁQUINA. 'backend' escolhe quem
+    executa os cruzamentos ("pandas" ou "arrow", ver execucao.py). Mosaic e
+    notas podem vir como TabelaEmBlocos (.csv grandes, ver blocos.py).
+    """
+    base, _spot_ids, _diagnostico = ingerir_arquivos(base, mosaic, notas, ordem_notas, ordem_planos, insights, backend)
+    return base
+
+
+def ingerir_arquivos(base: pd.DataFrame, mosaic, notas,
+                     ordem_notas: pd.DataFrame, ordem_planos: pd.DataFrame,
+                     insights: pd.DataFrame, backend: str = None):
+    """
+    Igual a processar_arquivos, mas retorna também o SPOT ID de cada linha
+    da base processada (mesma ordem), usado para aplicar deltas do mosaic,
+    e o diagnóstico dos cruzamentos ({etapa: cobertura}, ver
+    helpers.resumir_cobertura): spots fora do mosaic, subconjuntos sem
+    notas, ordens sem status e máquinas sem planos. O diagnóstico sai das
+    próprias colunas cruzadas (NaN = chave sem grupo), sem reler os arquivos.
+    """
+    execucao = obter_backend(backend)
+    # --- normalização ---
+    if not isinstance(notas, TabelaEmBlocos):
+        notas["ORDEM_NORM"] = normalizar_ordem(notas["Ordem"])
+    ordem_notas["Ordem"] = ordem_notas["Ordem"].astype(str)
+
+    # Limpa insights removendo lixo 'See more (N)'
+    insights_clean = clean_insights(insights)
+
+    # --- colunas vindas do mosaic (status, análise e coleta) ---
+    colunas_mosaic = mapear_mosaic(base["SPOT ID"], mosaic, execucao.nome)
+    for coluna in COLUNAS_DO_MOSAIC:
+        base[coluna] = colunas_mosaic[coluna]
+    diagnostico = {"mosaic": _cobertura_do_mapa(base["SPOT ID"], colunas_mosaic["STATUS DO PONTO DE MONITORAMENTO"])}
+
+    base["INSIGHTS"] = base["MÁQUINA"].isin(insights_clean).map(
+        lambda x: "SIM" if x else "NÃO"
+    )
+
+    # --- notas por subconjunto ---
+    colunas_agrupadas_notas = {
+        "Nota": "NOTA M4",
+        "ORDEM_NORM": "ORDEM DA NOTA M4",
+        "Conclusão desejada": "DATA DE CONCLUSÃO DESEJADA DA NOTA M4",
+    }
+    if isinstance(notas, TabelaEmBlocos):
+        colunas_notas = mapear_concatenado_em_blocos(
+            base["SUBCONJUNTO"], notas, "Local de instalação", colunas_agrupadas_notas,
+            preparar=lambda bloco: bloco.assign(ORDEM_NORM=normalizar_ordem(bloco["Ordem"])),
+            lidas=["Nota", "Ordem", "Conclusão desejada"], backend=execucao.nome,
+        )
+    else:
+        colunas_notas = execucao.mapear_concatenado(
+            base["SUBCONJUNTO"], notas, "Local de instalação", colunas_agrupadas_notas,
+        )
+    for coluna in colunas_notas.columns:
+        base[coluna] = colunas_notas[coluna]
+    diagnostico["notas"] = _cobertura_do_mapa(base["SUBCONJUNTO"], colunas_notas["NOTA M4"])
+
+    # --- fatos de notas e ordens: conclusão mais antiga e ordem CONF por spot (para as regras) ---
+    colunas_fatos = reduzir_por_spot(base["SUBCONJUNTO"], notas, ordem_notas)
+    for coluna in COLUNAS_FATOS:
+        base[coluna] = colunas_fatos[coluna]
+
+    # --- status da ordem (texto para exibição): explode as ordens da nota e reagrupa por linha ---
+    base["STATUS DO SISTEMA DA ORDEM M4"], diagnostico["ordens"] = execucao.status_das_ordens(
+        base["ORDEM DA NOTA M4"], ordem_notas
+    )
+
+    # --- planos por máquina ---
+    colunas_planos = execucao.mapear_concatenado(base["MÁQUINA"], ordem_planos, "Local de instalação", {
+        "Ordem": "NÚMERO DA ORDEM DO PLANO AV",
+        "Status do sistema": "STATUS DO SISTEMA DA ORDEM DO PLANO AV",
+    })
+    for coluna in colunas_planos.columns:
+        base[coluna] = colunas_planos[coluna]
+    diagnostico["planos"] = _cobertura_do_mapa(base["MÁQUINA"], colunas_planos["NÚMERO DA ORDEM DO PLANO AV"])
+
+    for etapa, cobertura in diagnostico.items():
+        logger.info(
+            "cruzamentos: %s: %d de %d sem correspondência (%d chaves distintas)%s",
+            etapa, cobertura["sem_correspondencia"], cobertura["linhas"], cobertura["chaves_sem_correspondencia"],
+            f" - {cobertura['erro']}" if cobertura["erro"] else "",
+        )
+
+    # Criar coluna de link do spot com formato markdown clicável
+    from datetime import datetime, timedelta
+    hoje = datetime.now()
+    data_fim = hoje.strftime("%Y-%m-%dT%H:%M:%S-03:00")
+    data_inicio = (hoje - timedelta(days=7)).strftime("%Y-%m-%dT00:00:00-03:00")
+
+    base["LINK DO SPOT"] = base["SPOT ID"].apply(
+        lambda spot_id: f"[🔗 Abrir](https://dyp.dynamox.solutions/654a51b9314e921d5e082ee3/spot-viewer/{spot_id}/{data_inicio}/{data_fim}?tab=telemetry)"
+    )
+
+    # Renomear e reorganizar colunas
+    base = base.rename(columns={
+        "SPOT NAME": "SPOTNAME",
+    })
+
+    # Remover SPOT ID da visualização (mas manter temporariamente para criar link)
+    # Reordenar colunas conforme solicitado
+    colunas_ordem = [
+        "MÁQUINA",
+        "SUBCONJUNTO", 
+        "SPOTNAME",
+        "ANALISTA RESPONSÁVEL",
+        "STATUS DO PONTO DE MONITORAMENTO",
+        "DATA DA ÚLTIMA ANÁLISE",
+        "STATUS DA ÚLTIMA ANÁLISE",
+        "INSIGHTS",
+        "NOTA M4",
+        "ORDEM DA NOTA M4",
+        "DATA DE CONCLUSÃO DESEJADA DA NOTA M4",
+        "STATUS DO SISTEMA DA ORDEM M4",
+        "NÚMERO DA ORDEM DO PLANO AV",
+        "STATUS DO SISTEMA DA ORDEM DO PLANO AV",
+        "DATA DA ÚLTIMA COLETA",
+        "LINK DO SPOT",
+    ] + COLUNAS_FATOS
+
+    # Reordenar e manter só as colunas necessárias (sem SPOT ID para exibição).
+    # Ordenar por MÁQUINA deixa os spots de cada máquina contíguos (ver montar_tabela_maquinas).
+    base = base.sort_values("MÁQUINA", kind="stable").reset_index(drop=True)
+
+    return base[colunas_ordem], base["SPOT ID"], diagnostico
+
+
+# Colunas da lista final na tela, nesta ordem (INSIGHTS e DIAS_DESDE_COLETA
+# ficam só na lista completa)
+COLUNAS_EXIBICAO = [
+    "MÁQUINA",
+    "SUBCONJUNTO",
+    "SPOTNAME",
+    "ANALISTA RESPONSÁVEL",
+    "INPUT",
+    "PRIORIDADE",
+    "LINK DO SPOT",
+    "STATUS DO PONTO DE MONITORAMENTO",
+    "DATA DA ÚLTIMA ANÁLISE",
+    "STATUS DA ÚLTIMA ANÁLISE",
+    "NOTA M4",
+    "ORDEM DA NOTA M4",
+    "DATA DE CONCLUSÃO DESEJADA DA NOTA M4",
+    "STATUS DO SISTEMA DA ORDEM M4",
+    "NÚMERO DA ORDEM DO PLANO AV",
+    "STATUS DO SISTEMA DA ORDEM DO PLANO AV",
+    "DATA DA ÚLTIMA COLETA",
+]
+
+
+def colunas_para_exibir(df: pd.DataFrame) -> list:
+    """Colunas de COLUNAS_EXIBICAO presentes no DataFrame, na ordem da tela."""
+    return [c for c in COLUNAS_EXIBICAO if c in df.columns]
+
+
+def resumir_por_maquina(df_final: pd.DataFrame, condicoes: pd.DataFrame) -> pd.DataFrame:
+    """
+    Uma linha por máquina da lista final, na ordem da lista, com a
+    quantidade de pontos e de pontos em cada condição (badges agregados).
+    condicoes tem cond1–cond4 alinhadas às linhas de df_final.
+    """
+    flags = pd.DataFrame(condicoes.to_numpy(dtype=bool), columns=["cond1", "cond2", "cond3", "cond4"])
+    status = df_final["STATUS DO PONTO DE MONITORAMENTO"].fillna("").str.lower().to_numpy()
+    flags["a2"] = flags["cond1"].to_numpy() & pd.Series(status).str.contains("a2").to_numpy()
+    flags["a1"] = flags["cond1"] & ~flags["a2"]
+    flags["MÁQUINA"] = df_final["MÁQUINA"].to_numpy()
+
+    por_maquina = flags.groupby("MÁQUINA", sort=False).agg(
+        a2=("a2", "sum"), a1=("a1", "sum"), insights=("cond2", "sum"),
+        notas=("cond3", "sum"), conf=("cond4", "sum"), pontos=("a2", "size"),
+    )
+    rotulos = [
+        ("a2", "🔴 A2"), ("a1", "🟡 A1"), ("insights", "💡 Insights"),
+        ("notas", "📝 Notas vencidas"), ("conf", "✅ Ordens executadas"),
+    ]
+
+    def badges(linha):
+        partes = [f"[{rotulo}: {int(linha[coluna])}]" for coluna, rotulo in rotulos if linha[coluna]]
+        return " ".join(partes) or "[ℹ️ Mesma máquina]"
+
+    info = df_final.groupby("MÁQUINA", sort=False).agg(
+        analistas=("ANALISTA RESPONSÁVEL", lambda v: " | ".join(v.dropna().astype(str).unique())),
+        prioridade=("PRIORIDADE", "max"),
+    )
+    return pd.DataFrame({
+        "MÁQUINA": por_maquina.index,
+        "ANALISTA RESPONSÁVEL": info["analistas"].to_numpy(),
+        "INPUT": por_maquina.apply(badges, axis=1).to_numpy(),
+        "PRIORIDADE": info["prioridade"].to_numpy(),
+        "PONTOS": por_maquina["pontos"].to_numpy(),
+    })
+
+
+def avaliar_regras(base: pd.DataFrame, maquinas: pd.DataFrame, filtros: dict,
+                   dias_coleta, top_k=None, verificar_geracao=None):
+    """
+    Aplica as regras (cond1–cond4, ver regras.py) com os limites de cada
+    analista, o filtro global de coleta e o top K opcional. Retorna (df_final, df_final_exibir, resumo, detalhes): a lista
+    completa com colunas auxiliares, a lista para exibição, a contagem por
+    analista e, em 'detalhes', as condições de cada linha da lista
+    ("condicoes") e as máquinas removidas pelo filtro de coleta ("removidas").
+
+    verificar_geracao(etapa), se informado, é chamado entre as etapas e pode
+    levantar exceção para interromper uma avaliação que ficou obsoleta.
+    """
+    if verificar_geracao is None:
+        verificar_geracao = lambda etapa: None
+
+    # Tabela de máquinas gravada antes de guardar os timestamps de coleta
+    if "ÚLTIMA COLETA" not in maquinas.columns:
+        maquinas = montar_tabela_maquinas(base)
+
+    # CRÍTICO: Fazer cópia para evitar modificar o objeto em cache
+    # (a base é mapeada em memória e compartilhada entre chamadas)
+    df = base.copy()
+
+    # Configurações por analista (já confirmadas, ver modo em lote)
+    config_por_analista = config_por_analista_de_filtros(
+        filtros, df["ANALISTA RESPONSÁVEL"].dropna().unique()
+    )
+
+    # Todas as regras (cond1–cond4, ver regras.py) num único plano vetorizado:
+    # dias desde a análise e de atraso da nota são calculados uma vez e
+    # compartilhados; pontos sem analista não passam em nenhuma regra
+    avaliacao = PLANO_REGRAS.avaliar(df, config_por_analista, verificar_geracao)
+    condicoes = avaliacao.condicoes
+    dias_col = avaliacao.intermediarios["dias_analise"]
+    dias_nota_col_global = avaliacao.intermediarios["dias_nota"]
+
+    # Máquina qualifica se pelo menos 1 ponto qualifica. A base vem
+    # ordenada por MÁQUINA, então cada máquina é um intervalo contíguo
+    # [INICIO, FIM) e a redução é O(máquinas).
+    pontos_qualificados = condicoes.any(axis=1).to_numpy()
+    inicio = maquinas["INICIO"].to_numpy()
+    maquina_qualificada = (
+        np.logical_or.reduceat(pontos_qualificados, inicio) if len(inicio) else np.zeros(0, dtype=bool)
+    )
+
+    # FILTRO GLOBAL: Remover máquinas onde TODOS os spots têm coleta defasada.
+    # Se pelo menos 1 spot tem coleta atualizada E COM DADOS, a máquina passa;
+    # spots sem dados (None) não contam — equivale a olhar o menor valor da máquina.
+    # Os dias saem da coleta mais recente da máquina, contados a partir de hoje
+    # (a tabela de máquinas pode ter sido gravada em outro dia).
+    menor_dias_coleta = dias_desde_sincronizacao(maquinas["ÚLTIMA COLETA"])
+    maquina_coleta_ok = menor_dias_coleta <= dias_coleta
+    maquina_na_lista = maquina_qualificada & maquina_coleta_ok
+
+    print(f"DEBUG: Total de máquinas qualificadas antes do filtro de coleta: {maquina_qualificada.sum()}")
+    print(f"DEBUG: Máquinas com coleta OK (filtro <= {dias_coleta} dias): {maquina_na_lista.sum()}")
+    print(f"DEBUG: Máquinas REMOVIDAS pelo filtro de coleta: {(maquina_qualificada & ~maquina_coleta_ok).sum()}")
+
+    # Mostrar primeiras 5 removidas com seus valores mínimos
+    removidas = maquinas[maquina_qualificada & ~maquina_coleta_ok].assign(**{
+        "MENOR DIAS COLETA": menor_dias_coleta[maquina_qualificada & ~maquina_coleta_ok],
+    })
+    if len(removidas):
+        print(f"DEBUG: Primeiras 5 máquinas removidas (menor dias de cada):")
+        for _, det in removidas.sort_values("MENOR DIAS COLETA", na_position="last").head(5).iterrows():
+            print(f"  {det['MÁQUINA']}: menor_dias = {det['MENOR DIAS COLETA']}")
+
+    # Prioridade: por ponto, e da máquina como o maior valor entre seus pontos
+    prioridade = calcular_prioridade(
+        df["STATUS DO PONTO DE MONITORAMENTO"], dias_col, dias_nota_col_global,
+        condicoes["cond1"], condicoes["cond2"], condicoes["cond3"], condicoes["cond4"],
+    )
+    prioridade_maquina = (
+        np.maximum.reduceat(prioridade.to_numpy(), inicio) if len(inicio) else np.zeros(0)
+    )
+    df["PRIORIDADE"] = np.repeat(prioridade_maquina, maquinas["QTD SPOTS"].to_numpy()).round(1)
+
+    # Top K: só as K máquinas de maior prioridade de cada analista
+    if top_k:
+        codigo_maquina = np.repeat(np.arange(len(maquinas)), maquinas["QTD SPOTS"].to_numpy())
+        candidatos = maquina_na_lista[codigo_maquina] & df["ANALISTA RESPONSÁVEL"].notna().to_numpy()
+        pares = (
+            pd.DataFrame({
+                "analista": df["ANALISTA RESPONSÁVEL"].to_numpy()[candidatos],
+                "maquina": codigo_maquina[candidatos],
+                "prioridade": prioridade.to_numpy()[candidatos],
+            })
+            .groupby(["analista", "maquina"], sort=False)["prioridade"].max()
+            .reset_index()
+        )
+        selecionadas = selecionar_top_k(
+            pares["analista"].to_numpy(), pares["maquina"].to_numpy(),
+            pares["prioridade"].to_numpy(), int(top_k),
+        )
+        no_top_k = np.zeros(len(maquinas), dtype=bool)
+        no_top_k[selecionadas] = True
+        maquina_na_lista &= no_top_k
+        logger.info("Top %d por analista: %d máquinas", int(top_k), maquina_na_lista.sum())
+
+    # Trazer TODOS os pontos das máquinas que passaram no filtro de coleta
+    # (um único take com as posições dos intervalos das máquinas)
+    df_final = df.take(posicoes_das_maquinas(maquinas, maquina_na_lista))
+    if top_k:
+        df_final = df_final.sort_values(
+            by=["ANALISTA RESPONSÁVEL", "PRIORIDADE", "MÁQUINA", "SPOTNAME"],
+            ascending=[True, False, True, True],
+        )
+    else:
+        df_final = df_final.sort_values(by=["ANALISTA RESPONSÁVEL", "MÁQUINA", "SPOTNAME"])
+    df_final["DIAS_DESDE_COLETA"] = df_final["DATA DA ÚLTIMA COLETA"].apply(days_since_last_sync)
+
+    verificar_geracao("badges")
+
+    # Coluna INPUT com os badges das regras, a partir das mesmas condições e dias
+    print(f"DEBUG: Gerando INPUT para {len(df_final)} linhas...")
+    try:
+        df_final["INPUT"] = PLANO_REGRAS.badges(df, avaliacao, df_final.index)
+        print(f"DEBUG: INPUT gerado com sucesso")
+    except Exception as e:
+        # Se falhar, criar coluna vazia para não quebrar
+        print(f"ERRO ao gerar INPUT: {e}")
+        df_final["INPUT"] = "[Erro ao gerar badges]"
+
+    # As reduções dos fatos só servem às regras; a lista final (e o Excel)
+    # fica com os textos de exibição
+    df_final = df_final.drop(columns=COLUNAS_FATOS)
+
+    colunas_final_ordem = colunas_para_exibir(df_final)
+
+    df_final_exibir = df_final[colunas_final_ordem]
+
+    verificar_geracao("resumo")
+
+    resumo = (
+        df_final_exibir
+        .groupby("ANALISTA RESPONSÁVEL")
+        .size()
+        .reset_index(name="QUANTIDADE DE PONTOS")
+    )
+
+    detalhes = {
+        "condicoes": condicoes.loc[df_final.index],
+        "removidas": pd.DataFrame({
+            "MÁQUINA": removidas["MÁQUINA"].to_numpy(),
+            "ANALISTA RESPONSÁVEL": df["ANALISTA RESPONSÁVEL"].to_numpy()[removidas["INICIO"].to_numpy()],
+            "MENOR DIAS COLETA": removidas["MENOR DIAS COLETA"].to_numpy(),
+        }),
+    }
+
+    return df_final, df_final_exibir, resumo, detalhes
@@ -0,0 +1,230 @@
+# priorizar.py
+# Execução em lote (sem navegador) da priorização a partir de arquivos em disco
+#
+# Uso:
+#   python priorizar.py --config limites.json --saida-dir saida/ planta_a/ planta_b/
+#   python priorizar.py --base base.xlsx --mosaic mosaic.csv --notas notas.xlsx \
+#       --ordem-notas ordem_notas.xlsx --ordem-planos ordem_planos.xlsx \
+#       --insights insights.xlsx --saida LISTA_FINAL_PRIORIZADA.xlsx
+#
+# Cada diretório (uma planta ou uma data de snapshot) deve conter os seis
+# arquivos com os nomes abaixo, em .csv ou Excel. Os diretórios são
+# processados em paralelo, um por processo; cada saída recebe o nome do
+# diretório relativo à raiz comum (ver rotulos_dos_diretorios).
+#
+# O arquivo de configuração (JSON) segue o formato dos filtros do app:
+#   {"dias_coleta": 7, "top_k": null, "backend": "arrow",
+#    "analistas": {"ANA": {"alarmes": ["A1", "A2"], "dias_alarmes": 15,
+#                          "dias_insights": 7, "dias_notas": 15}}}
+# Analistas ausentes recebem os valores padrão. "backend" ("pandas" ou "arrow")
+# escolhe quem executa os cruzamentos; sem ele vale PRIORIZACAO_BACKEND.
+
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from blocos import abrir_tabela
+from helpers import ler_tabela, montar_tabela_maquinas
+from historico import registrar_execucao
+from parametros import DEFAULT_DIAS_COLETA
+from pipeline import processar_arquivos, avaliar_regras
+
+# Nome (sem extensão) de cada arquivo de entrada dentro de um diretório
+ARQUIVOS_ENTRADA = ["base", "mosaic", "notas", "ordem_notas", "ordem_planos", "insights"]
+EXTENSOES = [".xlsx", ".xls", ".csv"]
+# Entradas que podem ser lidas em blocos quando grandes (ver blocos.py)
+ARQUIVOS_EM_BLOCOS = ["mosaic", "notas"]
+
+
+def localizar_entradas(diretorio: str) -> dict:
+    """Encontra os seis arquivos de entrada dentro do diretório."""
+    entradas = {}
+    for nome in ARQUIVOS_ENTRADA:
+        for extensao in EXTENSOES:
+            caminho = os.path.join(diretorio, nome + extensao)
+            if os.path.isfile(caminho):
+                entradas[nome] = caminho
+                break
+        else:
+            raise FileNotFoundError(f"{diretorio}: arquivo '{nome}' (.xlsx/.xls/.csv) não encontrado")
+    return entradas
+
+
+def rotulos_dos_diretorios(diretorios: list) -> list:
+    """
+    Rótulo (e nome do arquivo de saída) de cada diretório: o caminho relativo
+    à raiz comum, com '_' no lugar das barras. Assim planta_a/2026-10-17 e
+    planta_b/2026-10-17 viram planta_a_2026-10-17 e planta_b_2026-10-17, e
+    não o mesmo '2026-10-17'.
+    """
+    absolutos = [os.path.abspath(d) for d in diretorios]
+    raiz = os.path.commonpath(absolutos)
+    rotulos = []
+    for caminho in absolutos:
+        relativo = os.path.relpath(caminho, raiz)
+        if relativo == os.curdir:
+            relativo = os.path.basename(caminho)
+        rotulos.append(relativo.replace(os.sep, "_"))
+    return rotulos
+
+
+def carregar_config(caminho) -> dict:
+    if not caminho:
+        return {}
+    with open(caminho, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def priorizar(entradas: dict, config: dict, saida: str, quieto: bool = False,
+              rotulo: str = "arquivos", historico: bool = True) -> dict:
+    """
+    Roda ingestão e regras para um conjunto de arquivos e grava a lista final
+    (mesmo conteúdo do download do app). Retorna um resumo da execução.
+    Com 'historico', o resumo da avaliação vai para o histórico de execuções.
+    """
+    inicio = time.perf_counter()
+    log = io.StringIO() if quieto else sys.stdout
+    with contextlib.redirect_stdout(log):
+        # Mosaic e notas em .csv muito grandes são agregados em blocos
+        tabelas = {
+            nome: (abrir_tabela if nome in ARQUIVOS_EM_BLOCOS else ler_tabela)(caminho, caminho)
+            for nome, caminho in entradas.items()
+        }
+        base = processar_arquivos(
+            tabelas["base"], tabelas["mosaic"], tabelas["notas"],
+            tabelas["ordem_notas"], tabelas["ordem_planos"], tabelas["insights"],
+            config.get("backend"),
+        )
+        maquinas = montar_tabela_maquinas(base)
+
+        dias_coleta = config.get("dias_coleta")
+        if dias_coleta is None:
+            dias_coleta = DEFAULT_DIAS_COLETA
+        df_final, _df_final_exibir, resumo, detalhes = avaliar_regras(
+            base, maquinas, config.get("analistas") or {}, dias_coleta, config.get("top_k"),
+        )
+
+    if historico:
+        registrar_execucao(
+            df_final, detalhes, f"cli:{rotulo}", None, dias_coleta, config.get("top_k"),
+            config.get("analistas"),
+        )
+
+    pasta = os.path.dirname(os.path.abspath(saida))
+    os.makedirs(pasta, exist_ok=True)
+    if saida.endswith(".csv"):
+        df_final.to_csv(saida, index=False)
+    else:
+        df_final.to_excel(saida, index=False)
+
+    return {
+        "saida": saida,
+        "pontos": len(df_final),
+        "maquinas": df_final["MÁQUINA"].nunique(),
+        "por_analista": dict(zip(resumo["ANALISTA RESPONSÁVEL"], resumo["QUANTIDADE DE PONTOS"].astype(int))),
+        "segundos": round(time.perf_counter() - inicio, 1),
+    }
+
+
+def _executar(tarefa):
+    """Ponto de entrada de cada processo: devolve (rótulo, resumo ou erro)."""
+    rotulo, entradas, config, saida, quieto, historico = tarefa
+    # Mensagens dos módulos (logging) com o mesmo filtro do --quieto
+    logging.basicConfig(
+        level=logging.WARNING if quieto else logging.INFO,
+        format=f"[{rotulo}] %(name)s %(levelname)s: %(message)s",
+    )
+    try:
+        return rotulo, priorizar(entradas, config, saida, quieto, rotulo, historico), None
+    except Exception as e:
+        return rotulo, None, f"{type(e).__name__}: {e}"
+
+
+def montar_argumentos():
+    parser = argparse.ArgumentParser(
+        description="Gera a lista final priorizada a partir dos arquivos em disco, sem o navegador."
+    )
+    parser.add_argument("diretorios", nargs="*",
+                        help="Diretórios de planta/snapshot, cada um com os seis arquivos de entrada")
+    for nome in ARQUIVOS_ENTRADA:
+        parser.add_argument(f"--{nome.replace('_', '-')}", dest=nome,
+                            help=f"Caminho do arquivo '{nome}' (execução única, sem diretórios)")
+    parser.add_argument("--config", help="JSON com dias_coleta, top_k e limites por analista")
+    parser.add_argument("--saida", default="LISTA_FINAL_PRIORIZADA.xlsx",
+                        help="Arquivo de saída na execução única (.xlsx ou .csv)")
+    parser.add_argument("--saida-dir", default=".",
+                        help="Pasta de saída ao processar diretórios (um arquivo por diretório)")
+    parser.add_argument("--formato", choices=["xlsx", "csv"], default="xlsx",
+                        help="Formato dos arquivos gravados em --saida-dir")
+    parser.add_argument("--processos", type=int, default=os.cpu_count() or 1,
+                        help="Quantidade de diretórios processados em paralelo")
+    parser.add_argument("--sem-historico", action="store_true",
+                        help="Não grava o resumo das avaliações no histórico de execuções")
+    parser.add_argument("-q", "--quieto", action="store_true", help="Oculta as mensagens DEBUG e de log do processamento")
+    return parser
+
+
+def main(argv=None) -> int:
+    parser = montar_argumentos()
+    args = parser.parse_args(argv)
+    config = carregar_config(args.config)
+
+    explicitos = {nome: getattr(args, nome) for nome in ARQUIVOS_ENTRADA if getattr(args, nome)}
+    if explicitos and args.diretorios:
+        parser.error("use diretórios OU os caminhos --base/--mosaic/..., não os dois")
+
+    if explicitos:
+        faltando = [nome for nome in ARQUIVOS_ENTRADA if nome not in explicitos]
+        if faltando:
+            parser.error(f"arquivos de entrada ausentes: {', '.join(faltando)}")
+        tarefas = [("arquivos", explicitos, config, args.saida, args.quieto, not args.sem_historico)]
+    elif args.diretorios:
+        rotulos = rotulos_dos_diretorios(args.diretorios)
+        # Rótulos repetidos gravariam o mesmo arquivo de saída em paralelo
+        repetidos = sorted({r for r in rotulos if rotulos.count(r) > 1})
+        if repetidos:
+            parser.error(f"diretórios com o mesmo nome de saída: {', '.join(repetidos)}")
+        tarefas = []
+        for diretorio, rotulo in zip(args.diretorios, rotulos):
+            try:
+                entradas = localizar_entradas(diretorio)
+            except FileNotFoundError as e:
+                parser.error(str(e))
+            saida = os.path.join(args.saida_dir, f"{rotulo}.{args.formato}")
+            tarefas.append((rotulo, entradas, config, saida, args.quieto, not args.sem_historico))
+    else:
+        parser.error("informe diretórios de entrada ou os seis caminhos --base/--mosaic/...")
+
+    processos = max(1, min(args.processos, len(tarefas)))
+    if processos == 1:
+        resultados = map(_executar, tarefas)
+    else:
+        executor = ProcessPoolExecutor(max_workers=processos)
+        resultados = executor.map(_executar, tarefas)
+
+    falhas = 0
+    for rotulo, resumo, erro in resultados:
+        if erro:
+            falhas += 1
+            print(f"ERRO [{rotulo}]: {erro}", file=sys.stderr)
+            continue
+        print(
+            f"[{rotulo}] {resumo['pontos']} pontos em {resumo['maquinas']} máquinas "
+            f"-> {resumo['saida']} ({resumo['segundos']}s)"
+        )
+        for analista, quantidade in resumo["por_analista"].items():
+            print(f"    {analista}: {quantidade}")
+
+    if processos > 1:
+        executor.shutdown()
+    return 1 if falhas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,238 @@
+# regras.py
+# Regras da lista final (cond1–cond4) declaradas como dados e compiladas num plano vetorizado único
+#
+# Cada regra diz qual coluna testar e como (predicado), qual prazo em dias
+# comparar com qual limite do analista e qual badge mostrar. O plano calcula
+# uma única vez os intermediários que as regras compartilham (dias desde a
+# análise, dias de atraso da nota, padrões de alarme por analista) e avalia
+# todas as regras sobre eles, sem laço por analista nem apply por linha; os
+# badges da coluna INPUT saem das mesmas máscaras e dias.
+#
+# Para uma regra nova basta acrescentar uma Regra em REGRAS (e, se ela usar
+# um limite novo, o campo em config_por_analista_de_filtros).
+
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from fatos import COLUNA_CONCLUSAO, COLUNA_CONF
+from helpers import days_diff, dias_desde
+
+# nome: coluna de saída (cond1..); coluna: coluna da base lida pelo predicado;
+# predicado: (tipo, argumento), ver PREDICADOS; prazo: intermediário em dias
+# (ou None); limite: chave do limite na configuração do analista (ou None);
+# sem_data_vence: prazo ausente conta como vencido; badge: texto no INPUT
+Regra = namedtuple("Regra", ["nome", "coluna", "predicado", "prazo", "limite", "sem_data_vence", "badge"])
+
+# com_dias/sem_dias: modelos com {rotulo} e {dias}; rotulos: variantes
+# (trecho procurado na coluna da regra, em minúsculas, e rótulo), na ordem
+# de preferência, ou None para um rótulo único
+Badge = namedtuple("Badge", ["com_dias", "sem_dias", "rotulos"])
+
+# Intermediários em dias: nome -> coluna de data da base (texto ou datetime64)
+INTERMEDIARIOS = {
+    "dias_analise": "DATA DA ÚLTIMA ANÁLISE",
+    "dias_nota": COLUNA_CONCLUSAO,
+}
+
+# Tipos de predicado. "contem_do_analista" usa como padrão a lista da
+# configuração de cada analista (argumento = chave, ex.: "filtro_alarme")
+PREDICADOS = ["igual", "contem", "preenchido", "contem_do_analista"]
+
+BADGE_MESMA_MAQUINA = "[ℹ️ Mesma máquina]"
+
+REGRAS = [
+    # Cond1: alarmes (filtro do analista) com análise antiga ou ausente
+    Regra(
+        "cond1", "STATUS DO PONTO DE MONITORAMENTO", ("contem_do_analista", "filtro_alarme"),
+        "dias_analise", "dias_alarmes", True,
+        Badge("[{rotulo} há {dias} dias sem análise]", "[{rotulo} - nunca analisado]",
+              (("a2", "🔴 A2"), ("a1", "🟡 A1"))),
+    ),
+    # Cond2: insights com análise antiga ou ausente
+    Regra(
+        "cond2", "INSIGHTS", ("igual", "SIM"), "dias_analise", "dias_insights", True,
+        Badge("[💡 Insights]", "[💡 Insights]", None),
+    ),
+    # Cond3: notas M4 com conclusão vencida (a nota mais antiga do subconjunto, ver fatos.py)
+    Regra(
+        "cond3", "NOTA M4", ("preenchido", None), "dias_nota", "dias_notas", False,
+        Badge("[📝 Nota M4 vencida há {dias} dias]", "[📝 Nota M4 vencida]", None),
+    ),
+    # Cond4: ordens com status de confirmação pendente (CONF em alguma ordem, ver fatos.py)
+    Regra(
+        "cond4", COLUNA_CONF, ("igual", True), None, None, False,
+        Badge("[✅ Ordem M4 executada]", "[✅ Ordem M4 executada]", None),
+    ),
+]
+
+AvaliacaoRegras = namedtuple("AvaliacaoRegras", ["condicoes", "intermediarios"])
+
+
+def _dias_por_valor(datas: pd.Series) -> pd.Series:
+    """days_diff uma vez por texto de data distinto (as datas se repetem muito)."""
+    if pd.api.types.is_datetime64_any_dtype(datas.dtype):
+        return dias_desde(datas)
+    codigos, valores = pd.factorize(datas)
+    dias = np.array([days_diff(v) for v in valores] + [None], dtype=float)
+    return pd.Series(dias[codigos], index=datas.index)
+
+
+class PlanoRegras:
+    """Regras validadas, com intermediários e predicados deduplicados."""
+
+    def __init__(self, regras: list):
+        self.regras = list(regras)
+        self.intermediarios = list(dict.fromkeys(r.prazo for r in self.regras if r.prazo))
+        self.predicados = list(dict.fromkeys((r.coluna, r.predicado) for r in self.regras))
+        self.limites = list(dict.fromkeys(r.limite for r in self.regras if r.limite))
+
+    @property
+    def nomes(self) -> list:
+        return [r.nome for r in self.regras]
+
+    # ------------------------------------------------------
+    # Condições
+    # ------------------------------------------------------
+
+    def _avaliar_predicado(self, df, coluna, predicado, codigos, analistas, config_por_analista):
+        tipo, argumento = predicado
+        valores = df[coluna]
+        if tipo == "igual":
+            return (valores == argumento).to_numpy(dtype=bool)
+        if tipo == "preenchido":
+            return valores.notna().to_numpy()
+        if tipo == "contem":
+            return valores.str.contains(argumento, case=False, na=False, regex=True).to_numpy(dtype=bool)
+
+        # contem_do_analista: um str.contains por padrão distinto, só nas
+        # linhas dos analistas que usam aquele padrão
+        resultado = np.zeros(len(df), dtype=bool)
+        por_padrao = {}
+        for i, analista in enumerate(analistas):
+            padrao = "|".join(config_por_analista[analista][argumento] or [])
+            if padrao:
+                por_padrao.setdefault(padrao, []).append(i)
+        for padrao, grupo in por_padrao.items():
+            linhas = np.isin(codigos, grupo)
+            resultado[linhas] = valores[linhas].str.contains(padrao, case=False, na=False).to_numpy(dtype=bool)
+        return resultado
+
+    def avaliar(self, df: pd.DataFrame, config_por_analista: dict, verificar=None) -> AvaliacaoRegras:
+        """
+        Avalia todas as regras sobre a base. Retorna as condições (um bool
+        por regra e linha, com o índice de df) e os intermediários em dias.
+        Pontos sem analista não passam em nenhuma regra. verificar(etapa),
+        se informado, é chamado entre as etapas.
+        """
+        if verificar is None:
+            verificar = lambda etapa: None
+
+        codigos, analistas = pd.factorize(df["ANALISTA RESPONSÁVEL"])
+        tem_analista = codigos >= 0
+
+        intermediarios = {}
+        for nome in self.intermediarios:
+            verificar(f"intermediário {nome}")
+            intermediarios[nome] = _dias_por_valor(df[INTERMEDIARIOS[nome]])
+
+        # Limites indexados pelo código do analista; a última posição é a
+        # sentinela dos pontos sem analista (código -1)
+        limites = {}
+        for chave in self.limites:
+            limites[chave] = np.append(
+                np.array([config_por_analista[a][chave] for a in analistas], dtype=float), np.inf
+            )[codigos]
+
+        predicados = {}
+        for coluna, predicado in self.predicados:
+            verificar(f"predicado {coluna}")
+            predicados[(coluna, predicado)] = self._avaliar_predicado(
+                df, coluna, predicado, codigos, analistas, config_por_analista
+            )
+
+        condicoes = {}
+        for regra in self.regras:
+            condicao = predicados[(regra.coluna, regra.predicado)] & tem_analista
+            if regra.prazo:
+                dias = intermediarios[regra.prazo].to_numpy(dtype=float)
+                limite = limites[regra.limite] if regra.limite else 0
+                with np.errstate(invalid="ignore"):
+                    vencido = dias > limite
+                sem_data = np.isnan(dias)
+                condicao &= (sem_data | vencido) if regra.sem_data_vence else (~sem_data & vencido)
+            condicoes[regra.nome] = condicao
+
+        return AvaliacaoRegras(pd.DataFrame(condicoes, index=df.index), intermediarios)
+
+    # ------------------------------------------------------
+    # Badges
+    # ------------------------------------------------------
+
+    def badges(self, df: pd.DataFrame, avaliacao: AvaliacaoRegras, indices) -> np.ndarray:
+        """
+        Texto da coluna INPUT para as linhas 'indices' de df (rótulos do
+        índice), a partir das condições e dias já avaliados.
+        """
+        posicoes = df.index.get_indexer(indices)
+        textos = np.full(len(posicoes), "", dtype=object)
+
+        for regra in self.regras:
+            ativa = avaliacao.condicoes[regra.nome].to_numpy()[posicoes]
+            if not ativa.any():
+                continue
+            if regra.prazo:
+                dias = avaliacao.intermediarios[regra.prazo].to_numpy(dtype=float)[posicoes]
+            else:
+                dias = np.full(len(posicoes), np.nan)
+
+            texto = np.full(len(posicoes), "", dtype=object)
+            restantes = ativa.copy()
+            if regra.badge.rotulos:
+                minusculo = df[regra.coluna].iloc[posicoes].fillna("").astype(str).str.lower()
+                variantes = [
+                    (minusculo.str.contains(trecho, regex=False).to_numpy(dtype=bool), rotulo)
+                    for trecho, rotulo in regra.badge.rotulos
+                ]
+            else:
+                variantes = [(np.ones(len(posicoes), dtype=bool), "")]
+
+            for contem, rotulo in variantes:
+                alvo = restantes & contem
+                restantes &= ~alvo
+                sem_dias = alvo & np.isnan(dias)
+                com_dias = alvo & ~np.isnan(dias)
+                texto[sem_dias] = regra.badge.sem_dias.format(rotulo=rotulo, dias="")
+                if "{dias}" not in regra.badge.com_dias:
+                    texto[com_dias] = regra.badge.com_dias.format(rotulo=rotulo)
+                elif com_dias.any():
+                    prefixo, _, sufixo = regra.badge.com_dias.format(rotulo=rotulo, dias="\0").partition("\0")
+                    numeros = pd.Series(dias[com_dias]).astype(np.int64).astype(str)
+                    texto[com_dias] = (prefixo + numeros + sufixo).to_numpy(dtype=object)
+
+            preenchido = texto != ""
+            juntar = preenchido & (textos != "")
+            textos[juntar] = textos[juntar] + " " + texto[juntar]
+            textos[preenchido & ~juntar] = texto[preenchido & ~juntar]
+
+        textos[textos == ""] = BADGE_MESMA_MAQUINA
+        return textos
+
+
+def compilar_regras(regras: list) -> PlanoRegras:
+    """Valida as regras declaradas e monta o plano de avaliação."""
+    nomes = [r.nome for r in regras]
+    if len(set(nomes)) != len(nomes):
+        raise ValueError(f"Regras com nome repetido: {nomes}")
+    for regra in regras:
+        if regra.predicado[0] not in PREDICADOS:
+            raise ValueError(f"{regra.nome}: predicado '{regra.predicado[0]}' desconhecido (use {', '.join(PREDICADOS)})")
+        if regra.prazo and regra.prazo not in INTERMEDIARIOS:
+            raise ValueError(f"{regra.nome}: prazo '{regra.prazo}' desconhecido (use {', '.join(INTERMEDIARIOS)})")
+        if regra.limite and not regra.prazo:
+            raise ValueError(f"{regra.nome}: limite '{regra.limite}' sem prazo")
+    return PlanoRegras(regras)
+
+
+PLANO_REGRAS = compilar_regras(REGRAS)
@@ -0,0 +1,115 @@
+# tarefas.py
+# Controle de gerações das avaliações por sessão (descarte de avaliações superadas)
+#
+# Por sessão (aba do navegador), em DIR_SESSOES:
+#   <sessao>            maior geração registrada (lida sem lock, gravada com replace)
+#   <sessao>.lock       lock do ler-comparar-gravar de registrar_geracao
+#   <sessao>.avaliacao  lock da fila: uma avaliação por sessão de cada vez
+#
+# Os locks são fcntl.flock, então valem entre threads e entre workers.
+# Arquivos de sessões paradas há mais de IDADE_MAXIMA_SESSAO são apagados
+# quando uma sessão nova aparece.
+
+import fcntl
+import logging
+import os
+import re
+import time
+import uuid
+from contextlib import contextmanager
+
+from armazenamento import DIR_DADOS
+
+logger = logging.getLogger(__name__)
+
+DIR_SESSOES = os.path.join(DIR_DADOS, "sessoes")
+
+# Sessões sem nenhuma avaliação nesse intervalo (segundos) são apagadas
+IDADE_MAXIMA_SESSAO = 24 * 60 * 60
+
+
+def _arquivo_sessao(sessao: str) -> str:
+    nome = re.sub(r"[^A-Za-z0-9_-]", "", str(sessao))[:64] or "anonima"
+    return os.path.join(DIR_SESSOES, nome)
+
+
+@contextmanager
+def _travado(caminho: str):
+    """Lock exclusivo de arquivo enquanto o bloco roda (o open com "w" renova o mtime)."""
+    os.makedirs(DIR_SESSOES, exist_ok=True)
+    with open(caminho, "w") as trava:
+        fcntl.flock(trava, fcntl.LOCK_EX)
+        yield
+
+
+def limpar_sessoes_antigas(idade_maxima: float = IDADE_MAXIMA_SESSAO) -> int:
+    """Apaga os arquivos de sessões paradas há mais de 'idade_maxima' segundos."""
+    limite = time.time() - idade_maxima
+    apagados = 0
+    try:
+        nomes = os.listdir(DIR_SESSOES)
+    except OSError:
+        return 0
+    for nome in nomes:
+        caminho = os.path.join(DIR_SESSOES, nome)
+        try:
+            if os.path.getmtime(caminho) < limite:
+                os.remove(caminho)
+                apagados += 1
+        except OSError:
+            continue
+    if apagados:
+        logger.info("limpar_sessoes_antigas: %d arquivos apagados", apagados)
+    return apagados
+
+
+def geracao_atual(sessao: str) -> int:
+    """Maior geração já registrada para a sessão (0 se nenhuma)."""
+    try:
+        with open(_arquivo_sessao(sessao), encoding="utf-8") as f:
+            return int(f.read().strip() or 0)
+    except (OSError, ValueError):
+        return 0
+
+
+def registrar_geracao(sessao: str, geracao: int) -> bool:
+    """
+    Registra a geração como a mais nova da sessão. O registro fica em
+    arquivo e o ler-comparar-gravar roda sob flock, então vale para todos
+    os workers e threads. Retorna False se uma geração mais nova já foi
+    registrada — a chamada está obsoleta e pode ser descartada sem rodar.
+    """
+    destino = _arquivo_sessao(sessao)
+    if not os.path.exists(destino):
+        limpar_sessoes_antigas()
+
+    with _travado(f"{destino}.lock"):
+        if geracao < geracao_atual(sessao):
+            return False
+        temporario = f"{destino}.{uuid.uuid4().hex}"
+        with open(temporario, "w", encoding="utf-8") as f:
+            f.write(str(int(geracao)))
+        os.replace(temporario, destino)
+        return True
+
+
+@contextmanager
+def vez_da_sessao(sessao: str):
+    """
+    Uma avaliação por sessão de cada vez. Chamadas da mesma sessão que
+    chegam durante uma avaliação esperam aqui; depois da espera, a chamada
+    deve conferir avaliacao_obsoleta antes de trabalhar, para que as
+    gerações que ficaram na fila e já foram superadas sejam descartadas.
+    """
+    if not sessao:
+        yield
+        return
+    with _travado(f"{_arquivo_sessao(sessao)}.avaliacao"):
+        yield
+
+
+def avaliacao_obsoleta(sessao: str, geracao: int) -> bool:
+    """True se uma geração mais nova da mesma sessão já foi registrada."""
+    if not sessao or geracao is None:
+        return False
+    return geracao_atual(sessao) > geracao
@@ -0,0 +1,41 @@
+# test_blocos.py
+# Leitura em blocos de uploads gravados sem extensão
+
+import pandas as pd
+
+import blocos
+from blocos import TabelaEmBlocos, abrir_tabela, mapear_concatenado_em_blocos
+from execucao import mapear_concatenado_pandas
+
+
+def _mosaic(pasta):
+    """Mosaic com spotId numérico, gravado como um upload (sem extensão)."""
+    mosaic = pd.DataFrame({
+        "spotId": [10, 20, 10, 30, 20],
+        "Status": ["A", "B", "C", "A", None],
+    })
+    caminho = pasta / "arquivo"
+    mosaic.to_csv(caminho, index=False)
+    return mosaic, str(caminho)
+
+
+def test_chave_numerica_em_upload_sem_extensao(tmp_path):
+    mosaic, caminho = _mosaic(tmp_path)
+    chaves = pd.Series([20, 10, 40], index=[5, 6, 7])
+
+    tabela = TabelaEmBlocos(caminho, linhas_por_bloco=2, filename="mosaic.csv")
+    resultado = mapear_concatenado_em_blocos(chaves, tabela, "spotId", {"Status": "STATUS"})
+
+    esperado = mapear_concatenado_pandas(chaves, mosaic, "spotId", {"Status": "STATUS"})
+    pd.testing.assert_frame_equal(resultado, esperado)
+    assert resultado["STATUS"].tolist()[:2] == ["B", "A | C"]
+
+
+def test_abrir_tabela_guarda_o_nome_original(tmp_path, monkeypatch):
+    monkeypatch.setattr(blocos, "LIMITE_MB_EM_MEMORIA", 0)
+    _, caminho = _mosaic(tmp_path)
+
+    tabela = abrir_tabela(caminho, "mosaic.csv")
+
+    assert isinstance(tabela, TabelaEmBlocos)
+    assert tabela.carregar(["spotId"])["spotId"].tolist() == [10, 20, 10, 30, 20]
@@ -0,0 +1,91 @@
+# test_comparacao.py
+# Comparação da lista final com a anterior: novos, saíram, alterados e ida e volta pelo Excel
+
+import io
+
+import numpy as np
+import pandas as pd
+
+from comparacao import ALTERADO, NOVO, SAIU, comparar_listas, contar_mudancas
+
+
+def _lista(link_do_dia="2026-10-19"):
+    # M2/SUB-1/S1 repetido de propósito: casa pela ocorrência
+    return pd.DataFrame({
+        "ANALISTA RESPONSÁVEL": ["ANA", "ANA", "BRUNO", "BRUNO"],
+        "PRIORIDADE": [9.5, 9.5, 4.0, 4.0],
+        "LINK DO SPOT": [f"[Abrir](https://spot/{i}?data={link_do_dia})" for i in range(4)],
+        "MÁQUINA": ["M1", "M1", "M2", "M2"],
+        "SUBCONJUNTO": ["SUB-1", "SUB-2", "SUB-1", "SUB-1"],
+        "SPOTNAME": ["5000000", "S2", "S1", "S1"],
+        "INPUT": ["[🔴 A2 há 12 dias sem análise]", "[💡 Insights]", "[ℹ️ Mesma máquina]", "[ℹ️ Mesma máquina]"],
+        "STATUS DO PONTO DE MONITORAMENTO": ["A2", "Normal", "Normal", None],
+        "DATA DA ÚLTIMA ANÁLISE": ["01/10/2026", None, "02/10/2026", None],
+        "NOTA M4": ["123", None, None, None],
+        "DATA DA ÚLTIMA COLETA": ["2026-10-18T10:00:00Z", "", "", ""],
+    })
+
+
+def _mudancas_por_tipo(mudancas):
+    return {
+        tipo: mudancas.loc[mudancas["MUDANÇA"] == tipo, ["MÁQUINA", "SUBCONJUNTO", "SPOTNAME"]].values.tolist()
+        for tipo in (NOVO, SAIU, ALTERADO)
+    }
+
+
+def test_listas_iguais_sem_mudancas():
+    mudancas = comparar_listas(_lista(), _lista())
+
+    assert mudancas.empty
+    assert contar_mudancas(mudancas) == {NOVO: 0, SAIU: 0, ALTERADO: 0}
+
+
+def test_link_prioridade_e_dias_dos_badges_nao_contam():
+    atual = _lista(link_do_dia="2026-10-20")
+    atual["PRIORIDADE"] = [1.0, 1.0, 2.0, 2.0]
+    atual["DATA DA ÚLTIMA COLETA"] = "2026-10-20T08:00:00Z"
+    atual.loc[0, "INPUT"] = "[🔴 A2 há 13 dias sem análise]"
+
+    mudancas = comparar_listas(_lista(), atual)
+
+    assert mudancas.empty
+
+
+def test_novos_sairam_e_alterados():
+    anterior = _lista()
+    atual = pd.concat([
+        _lista().drop(index=1),
+        pd.DataFrame({"MÁQUINA": ["M3"], "SUBCONJUNTO": ["SUB-9"], "SPOTNAME": ["S9"], "INPUT": ["[💡 Insights]"]}),
+    ], ignore_index=True)
+    atual.loc[0, "INPUT"] = "[🔴 A2 há 12 dias sem análise] [📝 Nota M4 vencida há 3 dias]"
+    atual.loc[0, "NOTA M4"] = "456"
+    atual.loc[2, "STATUS DO PONTO DE MONITORAMENTO"] = "A1"
+
+    mudancas = comparar_listas(anterior, atual)
+
+    assert contar_mudancas(mudancas) == {NOVO: 1, SAIU: 1, ALTERADO: 2}
+    assert _mudancas_por_tipo(mudancas) == {
+        NOVO: [["M3", "SUB-9", "S9"]],
+        SAIU: [["M1", "SUB-2", "S2"]],
+        ALTERADO: [["M1", "SUB-1", "5000000"], ["M2", "SUB-1", "S1"]],
+    }
+    alterados = mudancas[mudancas["MUDANÇA"] == ALTERADO].set_index("SPOTNAME")
+    assert alterados.loc["5000000", "COLUNAS ALTERADAS"] == "INPUT, NOTA M4"
+    assert alterados.loc["5000000", "INPUT ANTERIOR"] == "[🔴 A2 há 12 dias sem análise]"
+    # Só a segunda ocorrência do ponto repetido mudou
+    assert alterados.loc["S1", "COLUNAS ALTERADAS"] == "STATUS DO PONTO DE MONITORAMENTO"
+    assert mudancas.loc[mudancas["MUDANÇA"] == SAIU, "INPUT ANTERIOR"].tolist() == ["[💡 Insights]"]
+
+
+def test_lista_lida_do_excel_compara_igual():
+    # SPOTNAME numérico e colunas com vazios voltam do Excel como float/NaN
+    anterior = _lista()
+    saida = io.BytesIO()
+    anterior.to_excel(saida, index=False)
+
+    lida = pd.read_excel(io.BytesIO(saida.getvalue()))
+    assert lida["SPOTNAME"].tolist()[0] in (5000000, "5000000")
+    assert lida["NOTA M4"].dtype == np.float64
+
+    assert comparar_listas(lida, _lista()).empty
+    assert comparar_listas(_lista(), lida).empty
@@ -0,0 +1,73 @@
+# test_cruzamentos.py
+# Etapas de cruzamento (execucao.py) com a saída do código anterior a elas
+#
+# A troca do groupby-apply pelos backends não muda a base processada: as
+# etapas são comparadas com o código antigo, copiado aqui como referência.
+# A única mudança de comportamento (status da ordem na linha da base) só
+# aparece quando a posição na tabela explodida difere da linha da base; o
+# caso está em test_status_ordem.py.
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from execucao import BACKENDS
+from helpers import concat_values
+
+
+def _mapear_antigo(chaves, tabela, chave, colunas):
+    """Um groupby-apply por coluna, como em mapear_mosaic antes dos backends."""
+    return pd.DataFrame(
+        {saida: chaves.map(tabela.groupby(chave)[coluna].apply(concat_values)) for coluna, saida in colunas.items()},
+        index=chaves.index,
+    )
+
+
+def _status_antigo(base, ordem_notas):
+    """resolver_status_ordem antes da correção: agrupa pela posição na tabela explodida."""
+    series = base["ORDEM DA NOTA M4"]
+    mask = series.notna() & (series.str.strip() != "")
+    exploded = series[mask].str.split(" | ").explode().str.strip().to_frame("Ordem")
+    merged = exploded.merge(ordem_notas[["Ordem", "Status do sistema"]], on="Ordem", how="left")
+    return merged.groupby(level=0)["Status do sistema"].apply(concat_values).reindex(base.index, fill_value="")
+
+
+def _tabela():
+    # Chaves repetidas fora de ordem, valores repetidos e nulos, grupo só com nulos
+    return pd.DataFrame({
+        "spotId": ["S2", "S1", "S2", "S1", "S3", "S2"],
+        "status": ["A1", "Normal", "A2", "Normal", None, "A1"],
+        "spotLastSync": ["2026-01-02", None, "2026-01-01", "2026-01-03", None, "2026-01-02"],
+    })
+
+
+@pytest.mark.parametrize("backend", sorted(BACKENDS))
+def test_mapear_concatenado_igual_ao_groupby_antigo(backend):
+    chaves = pd.Series(["S1", "S4", "S2", "S3", None, "S2"], index=[5, 3, 9, 1, 0, 2])
+    colunas = {"status": "STATUS", "spotLastSync": "COLETA"}
+
+    obtido = BACKENDS[backend].mapear_concatenado(chaves, _tabela(), "spotId", colunas)
+
+    esperado = _mapear_antigo(chaves, _tabela(), "spotId", colunas)
+    pd.testing.assert_frame_equal(
+        obtido.astype(object).where(obtido.notna(), np.nan),
+        esperado.astype(object).where(esperado.notna(), np.nan),
+    )
+    assert obtido.loc[9, "STATUS"] == "A1 | A2"
+    assert obtido.loc[1, "STATUS"] == ""
+
+
+@pytest.mark.parametrize("backend", sorted(BACKENDS))
+def test_status_igual_ao_antigo_com_uma_ordem_por_linha(backend):
+    # Índice 0..n-1, uma ordem por linha e ordens sem repetição em
+    # ordem_notas: a posição explodida é a linha da base, então a correção
+    # não muda nada e as etapas dão a saída antiga
+    base = pd.DataFrame({"ORDEM DA NOTA M4": ["100", "200", "999", "300"]})
+    ordem_notas = pd.DataFrame({
+        "Ordem": ["300", "100", "200"],
+        "Status do sistema": ["ENTE", "LIB", "CONF"],
+    })
+
+    status, _cobertura = BACKENDS[backend].status_das_ordens(base["ORDEM DA NOTA M4"], ordem_notas)
+
+    assert status.fillna("").to_dict() == _status_antigo(base, ordem_notas).to_dict()
@@ -0,0 +1,100 @@
+# test_fatos.py
+# Tabelas de fatos das notas/ordens e as reduções por subconjunto usadas pelas regras
+
+import numpy as np
+import pandas as pd
+
+from blocos import TabelaEmBlocos
+from fatos import (
+    COLUNA_CONCLUSAO, COLUNA_CONF, conclusao_mais_antiga, montar_fatos_notas, montar_fatos_ordens,
+    reduzir_por_spot, tem_ordem_conf,
+)
+
+
+def _notas():
+    # SUB-A: duas notas (a conclusão mais antiga vale), uma sem data;
+    # SUB-B: só notas sem data ou com data inválida; SUB-X: fora da base
+    return pd.DataFrame({
+        "Local de instalação": ["SUB-A", "SUB-B", "SUB-A", "SUB-X", "SUB-A", "SUB-B"],
+        "Nota": [1, 2, 3, 4, 5, 6],
+        "Ordem": [100.0, 200.0, 300.0, 400.0, np.nan, 200.0],
+        "Conclusão desejada": ["10/03/2026", None, "05/01/2026", "01/01/2020", "", "31/02/2026"],
+    })
+
+
+def _ordem_notas():
+    return pd.DataFrame({
+        "Ordem": ["100", "200", "300", "400"],
+        "Status do sistema": ["LIB", "ENTE CONF", "CONFX", "CONF"],
+    })
+
+
+def test_fatos_das_notas_so_dos_subconjuntos_da_base():
+    fatos = montar_fatos_notas(pd.Index(["SUB-A", "SUB-B", "SUB-C"]), _notas())
+
+    assert fatos["SUBCONJUNTO"].tolist() == [0, 1, 0, 0, 1]
+    assert fatos["ORDEM"].tolist()[:3] == ["100", "200", "300"]
+    assert fatos["CONCLUSAO"].isna().tolist() == [False, True, False, True, True]
+
+
+def test_fatos_das_notas_lidas_em_blocos(tmp_path):
+    caminho = tmp_path / "arquivo"
+    _notas().to_csv(caminho, index=False)
+    subconjuntos = pd.Index(["SUB-A", "SUB-B", "SUB-C"])
+
+    em_blocos = montar_fatos_notas(subconjuntos, TabelaEmBlocos(str(caminho), linhas_por_bloco=2, filename="notas.csv"))
+
+    pd.testing.assert_frame_equal(em_blocos, montar_fatos_notas(subconjuntos, pd.read_csv(caminho)))
+
+
+def test_conclusao_mais_antiga_com_nat_e_grupo_vazio():
+    fatos = montar_fatos_notas(pd.Index(["SUB-A", "SUB-B", "SUB-C"]), _notas())
+
+    conclusao = conclusao_mais_antiga(fatos, 3)
+
+    # SUB-A: a mais antiga das datadas (o texto concatenado "10/03/2026 |
+    # 05/01/2026" não era uma data e a nota não vencia); SUB-B: só NaT;
+    # SUB-C: sem notas
+    assert conclusao[0] == np.datetime64("2026-01-05")
+    assert np.isnat(conclusao[1]) and np.isnat(conclusao[2])
+
+
+def test_ordem_conf_por_subconjunto():
+    subconjuntos = pd.Index(["SUB-A", "SUB-B", "SUB-C"])
+    fatos_ordens = montar_fatos_ordens(montar_fatos_notas(subconjuntos, _notas()), _ordem_notas())
+
+    # CONF como palavra: "CONFX" (SUB-A) não conta; a ordem 200 aparece
+    # em duas notas do SUB-B, mas entra uma vez
+    assert len(fatos_ordens) == 3
+    assert tem_ordem_conf(fatos_ordens, 3).tolist() == [False, True, False]
+
+
+def test_sem_status_nas_ordens():
+    subconjuntos = pd.Index(["SUB-A", "SUB-B"])
+    ordem_notas = _ordem_notas().drop(columns="Status do sistema")
+    fatos_ordens = montar_fatos_ordens(montar_fatos_notas(subconjuntos, _notas()), ordem_notas)
+
+    assert fatos_ordens["STATUS"].isna().all()
+    assert tem_ordem_conf(fatos_ordens, 2).tolist() == [False, False]
+
+
+def test_reduzir_por_spot_alinhado_a_base():
+    spots = pd.Series(["SUB-B", None, "SUB-A", "SUB-C", "SUB-A"], index=[7, 3, 9, 1, 4])
+
+    reduzido = reduzir_por_spot(spots, _notas(), _ordem_notas())
+
+    assert reduzido.index.tolist() == [7, 3, 9, 1, 4]
+    assert reduzido[COLUNA_CONF].tolist() == [True, False, False, False, False]
+    conclusao = reduzido[COLUNA_CONCLUSAO]
+    assert conclusao[9] == conclusao[4] == pd.Timestamp("2026-01-05")
+    assert conclusao[[7, 3, 1]].isna().all()
+
+
+def test_reduzir_sem_notas():
+    spots = pd.Series(["SUB-A", None])
+    notas = _notas().iloc[0:0]
+
+    reduzido = reduzir_por_spot(spots, notas, _ordem_notas())
+
+    assert reduzido[COLUNA_CONCLUSAO].isna().all()
+    assert not reduzido[COLUNA_CONF].any()
@@ -0,0 +1,17 @@
+# test_orcamento_importacao.py
+# O orçamento de boot (orcamento_importacao.py) roda junto com os testes
+
+import os
+import subprocess
+import sys
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_boot_dentro_do_orcamento():
+    # Processo novo: os imports dos outros testes (pandas, pyarrow) não contam
+    processo = subprocess.run(
+        [sys.executable, os.path.join(RAIZ, "orcamento_importacao.py")],
+        cwd=RAIZ, capture_output=True, text=True, timeout=300,
+    )
+    assert processo.returncode == 0, processo.stdout + processo.stderr
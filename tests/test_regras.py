@@ -0,0 +1,141 @@
+# test_regras.py
+# Plano compilado das regras (regras.py) com o resultado das regras escritas à mão
+
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from fatos import COLUNA_CONCLUSAO, COLUNA_CONF
+from helpers import days_diff
+from pipeline import config_por_analista_de_filtros
+from regras import PLANO_REGRAS, REGRAS, Regra, compilar_regras
+
+
+def _data(dias_atras: int) -> str:
+    return (datetime.today() - timedelta(days=dias_atras)).strftime("%d/%m/%Y")
+
+
+def _base():
+    # Uma linha por caso: alarmes com e sem análise, insights, nota sem data,
+    # CONF como palavra (e não dentro de outra), ponto sem analista
+    conclusao = [_data(40), None, _data(5), _data(20), None, _data(100), _data(16)]
+    df = pd.DataFrame({
+        "ANALISTA RESPONSÁVEL": ["ANA", "ANA", "BRUNO", "BRUNO", "CARLA", None, "CARLA"],
+        "STATUS DO PONTO DE MONITORAMENTO": ["A1", "A2 | Normal", "Normal", "A2", "A1", "A2", None],
+        "DATA DA ÚLTIMA ANÁLISE": [_data(20), None, _data(3), _data(10), _data(1), None, _data(9)],
+        "INSIGHTS": ["NÃO", "SIM", "SIM", "NÃO", "SIM", "SIM", "NÃO"],
+        "NOTA M4": ["N1", None, "N3", "N4", "N5", "N6", "N7"],
+        "DATA DE CONCLUSÃO DESEJADA DA NOTA M4": conclusao,
+        "STATUS DO SISTEMA DA ORDEM M4": ["CONF", "", "LIB", "ENTE | CONF", "CONFX", "CONF", None],
+    }, index=[10, 11, 12, 13, 14, 15, 16])
+    # Fatos de uma nota por subconjunto: iguais aos textos acima
+    df[COLUNA_CONCLUSAO] = pd.to_datetime(pd.Series(conclusao, index=df.index), format="%d/%m/%Y")
+    df[COLUNA_CONF] = df["STATUS DO SISTEMA DA ORDEM M4"].str.contains(r"\bCONF\b", na=False).to_numpy()
+    return df
+
+
+FILTROS = {
+    "ANA": {"alarmes": ["A1", "A2"], "dias_alarmes": 15, "dias_insights": 7, "dias_notas": 30},
+    "BRUNO": {"alarmes": ["A2"], "dias_alarmes": 5, "dias_insights": 2, "dias_notas": 10},
+    "CARLA": {"alarmes": [], "dias_alarmes": None, "dias_insights": 0, "dias_notas": 15},
+}
+
+
+def _condicoes_a_mao(df, config_por_analista):
+    """As regras como eram escritas em avaliar_regras, um analista por vez."""
+    dias_col = df["DATA DA ÚLTIMA ANÁLISE"].apply(days_diff)
+    dias_nota_col = df["DATA DE CONCLUSÃO DESEJADA DA NOTA M4"].apply(days_diff)
+    condicoes = pd.DataFrame(False, index=df.index, columns=["cond1", "cond2", "cond3", "cond4"])
+    for analista in df["ANALISTA RESPONSÁVEL"].dropna().unique():
+        linhas = df.index[df["ANALISTA RESPONSÁVEL"] == analista]
+        config = config_por_analista[analista]
+        status = df.loc[linhas, "STATUS DO PONTO DE MONITORAMENTO"]
+        dias = dias_col.loc[linhas]
+        dias_nota = dias_nota_col.loc[linhas]
+        if config["filtro_alarme"]:
+            condicoes.loc[linhas, "cond1"] = (
+                status.str.contains("|".join(config["filtro_alarme"]), case=False, na=False)
+                & (dias.isna() | (dias > config["dias_alarmes"]))
+            )
+        condicoes.loc[linhas, "cond2"] = (
+            (df.loc[linhas, "INSIGHTS"] == "SIM") & (dias.isna() | (dias > config["dias_insights"]))
+        )
+        condicoes.loc[linhas, "cond3"] = (
+            df.loc[linhas, "NOTA M4"].notna() & dias_nota.notna() & (dias_nota > config["dias_notas"])
+        )
+        condicoes.loc[linhas, "cond4"] = df.loc[linhas, "STATUS DO SISTEMA DA ORDEM M4"].str.contains(
+            r"\bCONF\b", case=False, na=False, regex=True
+        )
+    return condicoes.astype(bool), dias_col, dias_nota_col
+
+
+def _badge_a_mao(status, dias, dias_nota, cond1, cond2, cond3, cond4):
+    """Como gerar_badge_input montava o INPUT de uma linha."""
+    badges = []
+    status = str(status).lower()
+    if cond1:
+        for trecho, rotulo in (("a2", "🔴 A2"), ("a1", "🟡 A1")):
+            if trecho in status:
+                badges.append(f"[{rotulo} - nunca analisado]" if pd.isna(dias) else f"[{rotulo} há {int(dias)} dias sem análise]")
+                break
+    if cond2:
+        badges.append("[💡 Insights]")
+    if cond3:
+        badges.append("[📝 Nota M4 vencida]" if pd.isna(dias_nota) else f"[📝 Nota M4 vencida há {int(dias_nota)} dias]")
+    if cond4:
+        badges.append("[✅ Ordem M4 executada]")
+    return " ".join(badges) or "[ℹ️ Mesma máquina]"
+
+
+def test_plano_da_as_mesmas_condicoes():
+    df = _base()
+    config = config_por_analista_de_filtros(FILTROS, df["ANALISTA RESPONSÁVEL"].dropna().unique())
+
+    avaliacao = PLANO_REGRAS.avaliar(df, config)
+
+    esperado, _dias, _dias_nota = _condicoes_a_mao(df, config)
+    pd.testing.assert_frame_equal(avaliacao.condicoes, esperado)
+    # Cada regra dispara em algum ponto do exemplo, e o ponto sem analista em nenhuma
+    assert esperado.any().all()
+    assert not avaliacao.condicoes.loc[15].any()
+
+
+def test_plano_da_os_mesmos_badges():
+    df = _base()
+    config = config_por_analista_de_filtros(FILTROS, df["ANALISTA RESPONSÁVEL"].dropna().unique())
+    avaliacao = PLANO_REGRAS.avaliar(df, config)
+    indices = [16, 10, 13, 11, 14]
+
+    obtido = PLANO_REGRAS.badges(df, avaliacao, indices)
+
+    condicoes, dias, dias_nota = _condicoes_a_mao(df, config)
+    esperado = [
+        _badge_a_mao(df.loc[i, "STATUS DO PONTO DE MONITORAMENTO"], dias[i], dias_nota[i], *condicoes.loc[i])
+        for i in indices
+    ]
+    assert list(obtido) == esperado
+
+
+@pytest.mark.parametrize("regras, mensagem", [
+    (REGRAS + [REGRAS[0]], "nome repetido"),
+    (REGRAS[:3] + [REGRAS[3]._replace(predicado=("parecido", None))], "predicado"),
+    (REGRAS[:3] + [REGRAS[3]._replace(prazo="dias_coleta")], "prazo"),
+    (REGRAS[:3] + [REGRAS[3]._replace(limite="dias_notas")], "sem prazo"),
+])
+def test_compilar_rejeita_regra_invalida(regras, mensagem):
+    with pytest.raises(ValueError, match=mensagem):
+        compilar_regras(regras)
+
+
+def test_regra_nova_entra_no_plano():
+    alarme_a2 = Regra("cond5", "STATUS DO PONTO DE MONITORAMENTO", ("contem", "A2"), None, None, False, REGRAS[3].badge)
+    df = _base()
+    config = config_por_analista_de_filtros(FILTROS, df["ANALISTA RESPONSÁVEL"].dropna().unique())
+
+    condicoes = compilar_regras(REGRAS + [alarme_a2]).avaliar(df, config).condicoes
+
+    assert list(condicoes.columns) == ["cond1", "cond2", "cond3", "cond4", "cond5"]
+    assert condicoes["cond5"].to_dict() == {10: False, 11: True, 12: False, 13: True, 14: False, 15: False, 16: False}
+    np.testing.assert_array_equal(condicoes[["cond1", "cond2", "cond3", "cond4"]], PLANO_REGRAS.avaliar(df, config).condicoes)
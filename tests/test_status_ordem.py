@@ -0,0 +1,47 @@
+# test_status_ordem.py
+# Status das ordens M4 atribuído à linha certa da base
+
+import pandas as pd
+import pytest
+
+from execucao import BACKENDS
+from helpers import resolver_status_ordem
+
+
+def _base():
+    # Índice que não começa em 0, linhas sem ordem no meio e linhas com
+    # várias ordens: a posição na tabela explodida difere da linha da base
+    return pd.DataFrame(
+        {"ORDEM DA NOTA M4": ["300 | 100", None, "200", "", "100 | 400"]},
+        index=[10, 11, 12, 13, 14],
+    )
+
+
+def _ordem_notas():
+    return pd.DataFrame({
+        "Ordem": ["100", "200", "300"],
+        "Status do sistema": ["LIB", "CONF", "ENTE"],
+    })
+
+
+def test_status_fica_na_linha_da_ordem():
+    status, cobertura = resolver_status_ordem(_base(), _ordem_notas())
+
+    assert status.to_dict() == {
+        10: "ENTE | LIB",
+        11: "",
+        12: "CONF",
+        13: "",
+        14: "LIB",
+    }
+    assert cobertura["sem_correspondencia"] == 1
+    assert cobertura["amostra"] == ["400"]
+
+
+@pytest.mark.parametrize("backend", sorted(BACKENDS))
+def test_backends_atribuem_o_mesmo_status(backend):
+    base = _base()
+    status, _cobertura = BACKENDS[backend].status_das_ordens(base["ORDEM DA NOTA M4"], _ordem_notas())
+
+    esperado, _ = resolver_status_ordem(base, _ordem_notas())
+    assert status.fillna("").to_dict() == esperado.to_dict()
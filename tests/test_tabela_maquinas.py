@@ -0,0 +1,41 @@
+# test_tabela_maquinas.py
+# Dias desde a coleta contados na avaliação, não na carga
+
+import numpy as np
+import pandas as pd
+
+from helpers import dias_desde_sincronizacao, montar_tabela_maquinas
+
+
+def _iso(dias_atras: float) -> str:
+    return (pd.Timestamp.now(tz="UTC") - pd.Timedelta(days=dias_atras)).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+
+def _base():
+    return pd.DataFrame({
+        "MÁQUINA": ["M1", "M1", "M2", "M3"],
+        "STATUS DO PONTO DE MONITORAMENTO": ["A1", "Normal", "A2", None],
+        "DATA DA ÚLTIMA COLETA": [_iso(10.5), _iso(2.5), "-", _iso(-3)],
+    })
+
+
+def test_tabela_guarda_a_primeira_e_a_ultima_coleta():
+    maquinas = montar_tabela_maquinas(_base())
+
+    assert "MENOR DIAS COLETA" not in maquinas.columns
+    m1 = maquinas.iloc[0]
+    assert m1["ÚLTIMA COLETA"] > m1["PRIMEIRA COLETA"]
+    assert pd.isna(maquinas.iloc[1]["ÚLTIMA COLETA"])
+
+
+def test_dias_contados_a_partir_de_agora():
+    maquinas = montar_tabela_maquinas(_base())
+
+    # M1: a coleta mais recente; M2 sem coleta válida; M3 com data futura
+    dias = dias_desde_sincronizacao(maquinas["ÚLTIMA COLETA"])
+    assert dias[0] == 2
+    assert np.isnan(dias[1]) and np.isnan(dias[2])
+
+    # A mesma tabela avaliada dias depois (dataset restaurado do disco)
+    cinco_dias_depois = maquinas["ÚLTIMA COLETA"] - pd.Timedelta(days=5)
+    assert dias_desde_sincronizacao(cinco_dias_depois)[0] == 7
@@ -0,0 +1,72 @@
+# test_uploads.py
+# Limites do recebimento em partes: offset, tamanho declarado e lacunas
+
+import gzip
+import uuid
+
+import pytest
+from flask import Flask
+
+import uploads
+
+
+@pytest.fixture
+def cliente(tmp_path, monkeypatch):
+    monkeypatch.setattr(uploads, "DIR_UPLOADS", str(tmp_path))
+    monkeypatch.setattr(uploads, "MAX_BYTES_UPLOAD", 1000)
+    app = Flask(__name__)
+    uploads.register_uploads(app)
+    return app.test_client()
+
+
+def _enviar(cliente, upload_id, offset, conteudo, comprimir=False):
+    cabecalhos = {"Content-Encoding": "gzip"} if comprimir else {}
+    corpo = gzip.compress(conteudo) if comprimir else conteudo
+    return cliente.put(f"/api/uploads/{upload_id}/partes?offset={offset}", data=corpo, headers=cabecalhos)
+
+
+def _concluir(cliente, upload_id, tamanho):
+    return cliente.post(f"/api/uploads/{upload_id}/concluir", json={"nome": "base.csv", "tamanho": tamanho})
+
+
+def test_upload_completo(cliente):
+    upload_id = uuid.uuid4().hex
+    assert _enviar(cliente, upload_id, 0, b"a" * 300).status_code == 200
+    assert _enviar(cliente, upload_id, 300, b"b" * 200, comprimir=True).status_code == 200
+    # Reenviar uma parte não muda o resultado
+    assert _enviar(cliente, upload_id, 0, b"a" * 300).status_code == 200
+
+    resposta = _concluir(cliente, upload_id, 500)
+    assert resposta.status_code == 200
+    assert resposta.get_json()["tamanho"] == 500
+    assert resposta.get_json()["nome"] == "base.csv"
+
+
+@pytest.mark.parametrize("offset", [-1, 1000, 10 ** 12])
+def test_offset_fora_do_limite(cliente, offset):
+    assert _enviar(cliente, uuid.uuid4().hex, offset, b"x").status_code == 400
+
+
+def test_parte_que_passa_do_limite(cliente):
+    upload_id = uuid.uuid4().hex
+    assert _enviar(cliente, upload_id, 900, b"x" * 101).status_code == 400
+    assert _enviar(cliente, upload_id, 900, b"x" * 101, comprimir=True).status_code == 400
+    assert _enviar(cliente, upload_id, 900, b"x" * 100).status_code == 200
+
+
+def test_lacuna_entre_partes(cliente):
+    upload_id = uuid.uuid4().hex
+    _enviar(cliente, upload_id, 0, b"a" * 100)
+    _enviar(cliente, upload_id, 200, b"c" * 100)
+
+    # O arquivo tem 300 bytes, mas o trecho 100-200 nunca foi enviado
+    resposta = _concluir(cliente, upload_id, 300)
+    assert resposta.status_code == 400
+    assert "recebidos 100 de 300" in resposta.get_json()["erro"]
+
+
+@pytest.mark.parametrize("tamanho", [None, "x", -1, 5000, 99])
+def test_tamanho_declarado_invalido(cliente, tamanho):
+    upload_id = uuid.uuid4().hex
+    _enviar(cliente, upload_id, 0, b"a" * 100)
+    assert _concluir(cliente, upload_id, tamanho).status_code == 400
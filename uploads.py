@@ -0,0 +1,187 @@
+# uploads.py
+# Recebimento dos arquivos em partes (opcionalmente gzip), gravadas direto em disco
+
+import json
+import os
+import re
+import shutil
+import time
+import zlib
+from datetime import datetime
+
+from flask import jsonify, request
+
+from armazenamento import DIR_DADOS
+
+DIR_UPLOADS = os.path.join(DIR_DADOS, "uploads")
+
+# Tamanho máximo de uma parte já descomprimida (o navegador envia 4 MB)
+MAX_BYTES_PARTE = 32 * 1024 * 1024
+# Tamanho máximo de um arquivo (MB): limita o offset das partes e o tamanho declarado
+MAX_BYTES_UPLOAD = int(float(os.environ.get("PRIORIZACAO_MAX_MB_UPLOAD", 2048)) * 1024 * 1024)
+BLOCO_LEITURA = 1024 * 1024
+
+# Uploads mais antigos que isso são apagados ao iniciar um novo
+HORAS_RETENCAO_UPLOADS = 24
+
+
+class ParteInvalida(Exception):
+    """Parte rejeitada (vira resposta 400)."""
+
+
+def _pasta_upload(upload_id: str) -> str:
+    if not re.fullmatch(r"[0-9a-f]{32}", str(upload_id)):
+        raise ParteInvalida("upload_id inválido")
+    return os.path.join(DIR_UPLOADS, upload_id)
+
+
+def _limpar_antigos():
+    limite = time.time() - HORAS_RETENCAO_UPLOADS * 3600
+    if not os.path.isdir(DIR_UPLOADS):
+        return
+    for nome in os.listdir(DIR_UPLOADS):
+        pasta = os.path.join(DIR_UPLOADS, nome)
+        try:
+            if os.path.getmtime(pasta) < limite:
+                shutil.rmtree(pasta, ignore_errors=True)
+        except OSError:
+            pass
+
+
+def _copiar_corpo(origem, destino, gzip: bool, limite: int = MAX_BYTES_PARTE) -> int:
+    """
+    Copia o corpo da requisição para o arquivo em blocos, descomprimindo o
+    gzip no caminho. Retorna os bytes gravados (já descomprimidos); mais de
+    'limite' bytes rejeitam a parte.
+    """
+    descompressor = zlib.decompressobj(16 + zlib.MAX_WBITS) if gzip else None
+    gravados = 0
+    while True:
+        bloco = origem.read(BLOCO_LEITURA)
+        if not bloco:
+            break
+        if descompressor:
+            bloco = descompressor.decompress(bloco, limite + 1 - gravados)
+            if descompressor.unconsumed_tail:
+                raise ParteInvalida("parte maior que o permitido")
+        gravados += len(bloco)
+        if gravados > limite:
+            raise ParteInvalida("parte maior que o permitido")
+        destino.write(bloco)
+    if descompressor:
+        if not descompressor.eof:
+            raise ParteInvalida("gzip incompleto")
+        resto = descompressor.flush()
+        gravados += len(resto)
+        if gravados > limite:
+            raise ParteInvalida("parte maior que o permitido")
+        destino.write(resto)
+    return gravados
+
+
+def _registrar_parte(pasta: str, offset: int, recebidos: int):
+    """Guarda quantos bytes a parte gravou a partir de 'offset' (reenvios sobrescrevem)."""
+    with open(os.path.join(pasta, f"parte-{offset}"), "w", encoding="utf-8") as f:
+        f.write(str(recebidos))
+
+
+def _bytes_contiguos(pasta: str) -> int:
+    """Bytes gravados desde o início do arquivo sem lacunas, pelas partes registradas."""
+    partes = []
+    for nome in os.listdir(pasta):
+        if nome.startswith("parte-"):
+            with open(os.path.join(pasta, nome), encoding="utf-8") as f:
+                partes.append((int(nome[len("parte-"):]), int(f.read())))
+    fim = 0
+    for offset, recebidos in sorted(partes):
+        if offset > fim:
+            break
+        fim = max(fim, offset + recebidos)
+    return fim
+
+
+def caminho_upload(arquivo: dict) -> str:
+    """Caminho em disco de um arquivo recebido ({"upload_id", "nome", ...})."""
+    caminho = os.path.join(_pasta_upload(arquivo["upload_id"]), "arquivo")
+    if not os.path.isfile(caminho):
+        raise FileNotFoundError(f"Upload de '{arquivo.get('nome')}' não encontrado; envie o arquivo novamente")
+    return caminho
+
+
+def ler_upload(arquivo: dict):
+    """Lê como DataFrame um arquivo recebido pelo endpoint de uploads."""
+    from helpers import ler_tabela
+
+    return ler_tabela(caminho_upload(arquivo), arquivo["nome"])
+
+
+def abrir_upload(arquivo: dict):
+    """Como ler_upload, mas .csv grandes voltam como TabelaEmBlocos (ver blocos.py)."""
+    from blocos import abrir_tabela
+
+    return abrir_tabela(caminho_upload(arquivo), arquivo["nome"])
+
+
+def register_uploads(server):
+    """Registra as rotas de upload no servidor Flask do app."""
+
+    @server.route("/api/uploads/<upload_id>/partes", methods=["PUT"])
+    def receber_parte(upload_id):
+        try:
+            pasta = _pasta_upload(upload_id)
+            offset = int(request.args.get("offset", 0))
+            if not 0 <= offset < MAX_BYTES_UPLOAD:
+                raise ParteInvalida("offset inválido")
+
+            if not os.path.isdir(pasta):
+                _limpar_antigos()
+                os.makedirs(pasta, exist_ok=True)
+
+            # Cada parte vai para a sua posição; reenviar uma parte é seguro
+            parcial = os.path.join(pasta, "arquivo.parcial")
+            with open(parcial, "r+b" if os.path.exists(parcial) else "wb") as destino:
+                destino.seek(offset)
+                gzip = request.headers.get("Content-Encoding", "").lower() == "gzip"
+                recebidos = _copiar_corpo(
+                    request.stream, destino, gzip, min(MAX_BYTES_PARTE, MAX_BYTES_UPLOAD - offset)
+                )
+            _registrar_parte(pasta, offset, recebidos)
+        except (ParteInvalida, ValueError, zlib.error) as e:
+            return jsonify({"erro": str(e)}), 400
+
+        return jsonify({"offset": offset, "recebidos": recebidos})
+
+    @server.route("/api/uploads/<upload_id>/concluir", methods=["POST"])
+    def concluir_upload(upload_id):
+        dados = request.get_json(silent=True) or {}
+        try:
+            pasta = _pasta_upload(upload_id)
+        except ParteInvalida as e:
+            return jsonify({"erro": str(e)}), 400
+
+        nome = os.path.basename(str(dados.get("nome") or "arquivo"))
+        parcial = os.path.join(pasta, "arquivo.parcial")
+        final = os.path.join(pasta, "arquivo")
+        if not os.path.isfile(parcial) and not os.path.isfile(final):
+            return jsonify({"erro": "nenhuma parte recebida"}), 404
+        if os.path.isfile(parcial):
+            try:
+                declarado = int(dados.get("tamanho"))
+            except (TypeError, ValueError):
+                return jsonify({"erro": "tamanho inválido"}), 400
+            if not 0 <= declarado <= MAX_BYTES_UPLOAD:
+                return jsonify({"erro": "tamanho inválido"}), 400
+            # O arquivo precisa ter exatamente as partes recebidas, sem lacunas
+            # (um offset adiantado deixaria um trecho nunca enviado)
+            gravados = _bytes_contiguos(pasta)
+            if gravados != declarado or os.path.getsize(parcial) != declarado:
+                return jsonify({"erro": f"recebidos {gravados} de {declarado} bytes"}), 400
+            os.replace(parcial, final)
+            for registro in os.listdir(pasta):
+                if registro.startswith("parte-"):
+                    os.remove(os.path.join(pasta, registro))
+
+        arquivo = {"upload_id": upload_id, "nome": nome, "tamanho": os.path.getsize(final)}
+        with open(os.path.join(pasta, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({**arquivo, "recebido_em": datetime.now().isoformat(timespec="seconds")}, f)
+        return jsonify(arquivo)